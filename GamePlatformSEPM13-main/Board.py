@@ -1,11 +1,21 @@
 from Stack import Stack
 from Piece import Piece
+from RoadTracker import RoadTracker
 
 ## Added a few changes to try and implement it with UI // Ludvig
 
 class Board:
     def __init__(self):
         self.grid = [[Stack() for _ in range(6)] for _ in range(6)]
+        # Road groups per color, updated whenever a top piece changes
+        self.roads = RoadTracker(6)
+        # Told about every piece placed or moved, see add_listener
+        self.listeners = []
+
+    # listener.on_place(x, y, place) and listener.on_move(x1, y1, x2, y2, count)
+    # are called after each successful place_piece / move_piece
+    def add_listener(self, listener):
+        self.listeners.append(listener)
     
     def current_placement(self):
         return [[stack.size() for stack in row] for row in self.grid]
@@ -15,6 +25,9 @@ class Board:
         # Places a piece on the board
         if isinstance(place, Piece) or isinstance(place, Stack):
             self.grid[y][x].push(place)
+            self._track(x, y)
+            for listener in self.listeners:
+                listener.on_place(x, y, place)
         else:
             raise TypeError("Invalid type for placing.")
     
@@ -33,49 +46,23 @@ class Board:
         except Exception as e:
             self.grid[y1][x1].push(moved_stack)
             raise e
+        self._track(x1, y1)
+        self._track(x2, y2)
+        for listener in self.listeners:
+            listener.on_move(x1, y1, x2, y2, count)
+
+    # Update the road groups after the stack on (x, y) changed
+    def _track(self, x, y):
+        top = self.grid[y][x].top()
+        owner = top.color if top is not None and not top.is_standing() else None
+        self.roads.set_top(x * len(self.grid) + y, owner)
     
     def get_stack(self, x, y):
         return self.grid[y][x]
     
     def check_winning_condition(self, color):
-        def dfs(x, y, visited, vertical):
-            if (x, y) in visited:
-                return False
-            visited.add((x, y))
-
-            # Check if we reached the opposite side
-            if vertical and y == len(self.grid) - 1:  #len(self.grid) is for rows
-                return True
-            elif not vertical and x == len(self.grid[0]) - 1:  # len(self.grid[0]) is for columns
-                return True
-
-            # Directions: up, down, left, right
-            directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-            for dx, dy in directions:
-                nx, ny = x + dx, y + dy
-                
-                if 0 <= nx < len(self.grid) and 0 <= ny < len(self.grid[0]):
-                    stack = self.get_stack(nx, ny)
-                    if stack and not stack.is_empty() and stack.top().color == color and not stack.top().is_standing():
-                        if dfs(nx, ny, visited, vertical):
-                            return True
-            return False
-
-        # Check from top to bottom (vertical win condition)
-        for x in range(len(self.grid)):  # len(self.grid) for rows
-            stack = self.get_stack(x, 0)
-            if stack and not stack.is_empty() and stack.top().color == color and not stack.top().is_standing():
-                if dfs(x, 0, set(), vertical=True):
-                    return True
-
-        # Check from left to right (horizontal win condition)
-        for y in range(len(self.grid[0])):  #len(self.grid[0]) for columns
-            stack = self.get_stack(0, y)
-            if stack and not stack.is_empty() and stack.top().color == color and not stack.top().is_standing():
-                if dfs(0, y, set(), vertical=False):
-                    return True
-
-        return False
+        # Roads are tracked as pieces move, so this is just a lookup
+        return self.roads.has_road(color)
     
 
     
@@ -1,12 +1,43 @@
+COLORS = ('black', 'white')
+
+
 class Piece:
-    def __init__(self, color, standing: bool = False):
-        self.color = color
-        self.standing = standing  
+    # There are only four kinds of piece (black/white, flat/standing), so
+    # Piece(color, standing) always hands out one shared instance per kind.
+    # Pieces never change after creation.
+    # kind packs the piece into 2 bits: bit 0 is the color (0 black, 1 white),
+    # bit 1 is set for standing pieces. Stack and the AI boards use the same bits.
+    __slots__ = ('color', 'standing', 'kind')
+    _interned = {}
+
+    def __new__(cls, color, standing: bool = False):
+        standing = bool(standing)
+        piece = cls._interned.get((color, standing))
+        if piece is None:
+            if color not in COLORS:
+                raise ValueError(f"Unknown color: {color}")
+            piece = super().__new__(cls)
+            object.__setattr__(piece, 'color', color)
+            object.__setattr__(piece, 'standing', standing)
+            object.__setattr__(piece, 'kind', COLORS.index(color) | (2 if standing else 0))
+            cls._interned[(color, standing)] = piece
+        return piece
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Pieces cannot be changed.")
+
+    # Unpickling and copying give back the shared instance
+    def __reduce__(self):
+        return Piece, (self.color, self.standing)
 
     def is_standing(self):
         return self.standing
-    
+
     # Representation of the piece
     def __repr__(self):
         piece_type = 'flat' if not self.standing else 'standing'
         return f"{piece_type} piece"
+
+
+# The shared pieces indexed by kind
+PIECES = tuple(Piece(COLORS[kind & 1], standing=bool(kind & 2)) for kind in range(4))
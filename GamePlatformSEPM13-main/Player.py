@@ -78,4 +78,5 @@ def test_game_scenario(player1, player2, total_moves=32):
 
 
 # Run the game scenario
-test_game_scenario(Player('black'), Player('white'))
+if __name__ == "__main__":
+    test_game_scenario(Player('black'), Player('white'))
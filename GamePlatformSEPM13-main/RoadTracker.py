@@ -0,0 +1,104 @@
+# Keeps track of connected road groups so that win checks don't need a DFS
+
+# Edge bits of a group: which sides of the board it touches
+EDGE_X_FIRST = 1
+EDGE_X_LAST = 2
+EDGE_Y_FIRST = 4
+EDGE_Y_LAST = 8
+
+
+class RoadTracker:
+    def __init__(self, size):
+        # Square (x, y) is index x * size + y
+        self.size = size
+        squares = size * size
+        # Owner of the flat piece on top of each square, None if empty or standing
+        self.owner = [None] * squares
+        # Union-find forest over road squares, plus the edges each group touches
+        self.parent = list(range(squares))
+        self.edges = [0] * squares
+        # Owners that currently have a road between two opposite edges
+        self.roads = set()
+
+        self.edge_bits = []
+        self.neighbours = []
+        for x in range(size):
+            for y in range(size):
+                bits = 0
+                if x == 0:
+                    bits |= EDGE_X_FIRST
+                if x == size - 1:
+                    bits |= EDGE_X_LAST
+                if y == 0:
+                    bits |= EDGE_Y_FIRST
+                if y == size - 1:
+                    bits |= EDGE_Y_LAST
+                self.edge_bits.append(bits)
+                self.neighbours.append([
+                    nx * size + ny
+                    for nx, ny in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y))
+                    if 0 <= nx < size and 0 <= ny < size
+                ])
+
+    # Root of the group containing sq (with path halving)
+    def find(self, sq):
+        parent = self.parent
+        while parent[sq] != sq:
+            parent[sq] = parent[parent[sq]]
+            sq = parent[sq]
+        return sq
+
+    def _union(self, a, b):
+        root_a = self.find(a)
+        root_b = self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+            self.edges[root_a] |= self.edges[root_b]
+        return root_a
+
+    def _check_road(self, root, owner):
+        edges = self.edges[root]
+        if (edges & 3) == 3 or (edges & 12) == 12:
+            self.roads.add(owner)
+
+    # A new road square only ever merges groups
+    def _add(self, sq, owner):
+        self.parent[sq] = sq
+        self.edges[sq] = self.edge_bits[sq]
+        root = sq
+        for neighbour in self.neighbours[sq]:
+            if self.owner[neighbour] == owner:
+                root = self._union(root, neighbour)
+        self._check_road(root, owner)
+
+    # Losing a road square can split a group, so regroup that owner's squares
+    def rebuild(self, owner):
+        self.roads.discard(owner)
+        squares = [sq for sq, o in enumerate(self.owner) if o == owner]
+        for sq in squares:
+            self.parent[sq] = sq
+            self.edges[sq] = self.edge_bits[sq]
+        size = self.size
+        for sq in squares:
+            # only look right and down, every pair is seen once
+            if sq % size != size - 1 and self.owner[sq + 1] == owner:
+                self._union(sq, sq + 1)
+            if sq + size < size * size and self.owner[sq + size] == owner:
+                self._union(sq, sq + size)
+        for sq in squares:
+            if self.parent[sq] == sq:
+                self._check_road(sq, owner)
+
+    # Tell the tracker what is on top of a square after it changed
+    def set_top(self, sq, owner):
+        old = self.owner[sq]
+        if old == owner:
+            return
+        self.owner[sq] = owner
+        if old is not None:
+            self.rebuild(old)
+        if owner is not None:
+            self._add(sq, owner)
+
+    def has_road(self, owner):
+        return owner in self.roads
@@ -1,22 +1,31 @@
-from Piece import Piece
-from collections import deque
+from Piece import Piece, PIECES
 
 class Stack:
+    # The pieces are packed into one int, 2 bits per piece from the bottom up
+    # (see Piece.kind), the same layout as the AI's BitBoard stacks. A Stack is
+    # two small ints, so copying a board or sending it to another process is cheap.
+    __slots__ = ('packed', 'height')
+
     def __init__(self):
-        # Stack of pieces
-        self.stack = deque()
+        self.packed = 0
+        self.height = 0
+
+    # The pieces bottom to top, as a tuple of the shared Piece instances
+    @property
+    def stack(self):
+        return tuple(PIECES[(self.packed >> (2 * i)) & 3] for i in range(self.height))
 
     # Push a piece or stack of pieces onto the stack
     def push(self, item):
         # Check if item is a piece or stack
         if isinstance(item, Piece) or isinstance(item, Stack):
+            count = item.height if isinstance(item, Stack) else 1
             # Check if stack is full
-            if len(self.stack) + (len(item.stack) if isinstance(item, Stack) else 1) <= 5:
+            if self.height + count <= 5:
                 # Add piece or stack to the stack
-                if isinstance(item, Stack):
-                    self.stack.extend(item.stack)
-                else:
-                    self.stack.append(item)
+                bits = item.packed if isinstance(item, Stack) else item.kind
+                self.packed |= bits << (2 * self.height)
+                self.height += count
             else:
                 raise ValueError("Stack can only hold up to 5 pieces.")
         else:
@@ -25,34 +34,45 @@ class Stack:
     # Pop a piece or stack of n pieces from the stack
     def pop(self, n=1):
         # Check if stack is empty or n is greater than the number of elements in the stack
-        if n > len(self.stack):
+        if n > self.height:
             raise IndexError("Pop from an empty stack or not enough elements.")
 
+        shift = 2 * (self.height - n)
+        popped = self.packed >> shift
+        self.packed &= (1 << shift) - 1
+        self.height -= n
+
         # Pop a piece or stack of n pieces from the stack
         if n == 1:
-            return self.stack.pop()
+            return PIECES[popped]
         else:
             new_stack = Stack()
-            for _ in range(n):
-                new_stack.stack.appendleft(self.stack.pop())
+            new_stack.packed = popped
+            new_stack.height = n
             return new_stack
+
+    def copy(self):
+        new_stack = Stack()
+        new_stack.packed = self.packed
+        new_stack.height = self.height
+        return new_stack
         
     # Check if the stack is empty
     def is_empty(self):
-        return len(self.stack) == 0
+        return self.height == 0
     
     # Check if the stack is full
     def is_full(self):
-        return len(self.stack) == 5
+        return self.height == 5
     
     def top(self):
         if self.is_empty():
             return None  # or raise an exception
-        return self.stack[-1]
+        return PIECES[self.packed >> (2 * (self.height - 1))]
     
     # Get the size of the stack
     def size(self):
-        return len(self.stack)
+        return self.height
     
     # Representation of the stack
     def __repr__(self):
@@ -1,9 +1,13 @@
+import os
 import pygame
 import sys
 from Board import Board
 from Piece import Piece
 from Player import Player
-from ai import converter, AI, Difficulty, Color
+from ai import AI, Difficulty, Color
+from ai_session import AISession
+from ai_worker import AIWorker
+from tracing import Tracer
 
 pygame.init()
 
@@ -25,6 +29,9 @@ BORDER_RADIUS = 4
 OFFSET = (SCREEN_SIZE - BOARD_SCREEN_SIZE) // 2  
 RED = (255, 0, 0)  
 BLUE = (0, 0, 255)  
+FPS = 30  # frame rate cap, the AI searches on a background thread meanwhile
+OPENING_BOOK = "opening_book.bin"  # built by opening_book.py, used if present
+TRACE_FILE = "ui_trace.json"  # F12 writes the recent frames and AI turns here, for chrome://tracing
 
 
 
@@ -42,56 +49,103 @@ selected_row = -1
 selected_col = -1
 selected_pieces_to_move = 0  # Variable to store the number of pieces to move
 error_message = ""  # Global variable to hold error messages
+# Frames, AI turns and win checks are timed into a ring buffer. F12 dumps it
+# to TRACE_FILE; with UU_TRACE=path set it is also dumped to path on exit.
+tracer = Tracer()
+if os.environ.get("UU_TRACE"):
+    tracer.dump_at_exit(os.environ["UU_TRACE"])
+ai_worker = AIWorker(tracer)  # computes the AI's move while the window keeps drawing
+ai_session = None  # the AI for this game, created once the difficulty is chosen
+clock = pygame.time.Clock()
+
+# Rendering caches. Fonts are created once, text surfaces are kept per
+# (text, size, colour) and board cells per stack contents, so a frame mostly
+# blits ready surfaces. main_game draws through draw_frame, which redraws and
+# updates only the screen regions whose contents changed since the last frame.
+fonts = {}
+text_cache = {}
+cell_cache = {}
+drawn_regions = {}  # region name -> key of what is on screen there
+MAX_CACHED_SURFACES = 1024
+
+def get_font(size):
+    if size not in fonts:
+        fonts[size] = pygame.font.Font(None, size)
+    return fonts[size]
+
+def render_text(text, size, color):
+    key = (text, size, color)
+    surface = text_cache.get(key)
+    if surface is None:
+        if len(text_cache) >= MAX_CACHED_SURFACES:
+            text_cache.clear()
+        surface = text_cache[key] = get_font(size).render(text, True, color)
+    return surface
+
+def cell_key(row, col):
+    stack = board.get_stack(col, row)
+    pieces = tuple((piece.color, piece.standing) for piece in stack.stack)
+    return pieces, row == selected_row and col == selected_col
+
+def cell_surface(key):
+    surface = cell_cache.get(key)
+    if surface is None:
+        if len(cell_cache) >= MAX_CACHED_SURFACES:
+            cell_cache.clear()
+        pieces, selected = key
+        surface = pygame.Surface((CELL_SIZE, CELL_SIZE))
+        # Draw cells and cell borders
+        rect_border = pygame.Rect(0, 0, CELL_SIZE, CELL_SIZE)
+        rect = pygame.Rect(LINE_WIDTH, LINE_WIDTH, CELL_SIZE - LINE_WIDTH, CELL_SIZE - LINE_WIDTH)
+        pygame.draw.rect(surface, BLACK, rect_border)
+        pygame.draw.rect(surface, GRAY, rect)
+
+        # Draw highlighted blue border if cell is selected
+        if selected:
+            pygame.draw.rect(surface, BLUE, rect_border, LINE_WIDTH)
+
+        for i, (piece_color, standing) in enumerate(pieces):
+            stack_piece = pygame.Rect(
+                10,
+                CELL_SIZE - (TILE_HEIGHT * (i + 1)) - LINE_WIDTH,
+                CELL_SIZE - 20,
+                TILE_HEIGHT
+            )
+            standing_piece = pygame.Rect(
+                    40,
+                    CELL_SIZE - (TILE_HEIGHT * (i + 1)) - LINE_WIDTH,
+                    CELL_SIZE - 80,
+                    TILE_HEIGHT
+                )
+            color = WHITE if piece_color == 'white' else BLACK
+            # Draw either standing or flat piece
+            if standing:
+                pygame.draw.rect(surface, color, standing_piece, border_radius=BORDER_RADIUS)
+            else:
+                pygame.draw.rect(surface, color, stack_piece, border_radius=BORDER_RADIUS)
+        cell_cache[key] = surface
+    return surface
+
+def cell_rect(row, col):
+    return pygame.Rect(col * CELL_SIZE + OFFSET, OFFSET + row * CELL_SIZE, CELL_SIZE, CELL_SIZE)
 
 def draw_board():
     for row in range(BOARD_SIZE):
         for col in range(BOARD_SIZE):
-            # Draw cells and cell borders
-            rect_border = pygame.Rect(col * CELL_SIZE + OFFSET, OFFSET + row * CELL_SIZE, CELL_SIZE, CELL_SIZE)
-            rect = pygame.Rect(col * CELL_SIZE + OFFSET + LINE_WIDTH, OFFSET + row * CELL_SIZE + LINE_WIDTH, CELL_SIZE - LINE_WIDTH, CELL_SIZE - LINE_WIDTH)
-            
-            pygame.draw.rect(screen, BLACK, rect_border)
-            pygame.draw.rect(screen, GRAY, rect)
-            
-            # Draw highlighted blue border if cell is selected
-            if row == selected_row and col == selected_col:
-                pygame.draw.rect(screen, BLUE, rect_border, LINE_WIDTH)
-            
-            stack = board.get_stack(col, row)
-            for i, piece in enumerate(stack.stack):
-                stack_piece = pygame.Rect(
-                    OFFSET + col * CELL_SIZE + 10,
-                    OFFSET + row * CELL_SIZE + CELL_SIZE - (TILE_HEIGHT * (i + 1)) - LINE_WIDTH,
-                    CELL_SIZE - 20,
-                    TILE_HEIGHT
-                )
-                standing_piece = pygame.Rect(
-                        OFFSET + col * CELL_SIZE + 40,
-                        OFFSET + row * CELL_SIZE + CELL_SIZE - (TILE_HEIGHT * (i + 1)) - LINE_WIDTH,
-                        CELL_SIZE - 80,
-                        TILE_HEIGHT
-                    )
-                color = WHITE if piece.color == 'white' else BLACK
-                # Draw either standing or flat piece
-                if piece.standing:
-                    pygame.draw.rect(screen, color, standing_piece, border_radius=BORDER_RADIUS)
-                else:
-                    pygame.draw.rect(screen, color, stack_piece, border_radius=BORDER_RADIUS)
+            screen.blit(cell_surface(cell_key(row, col)), cell_rect(row, col))
                 
 
 def draw_game_info():
-    font = pygame.font.Font(None, 24)
-    
     if(DIFFICULTY == Difficulty.EASY):
         diff = "Easy"
     elif(DIFFICULTY == Difficulty.MEDIUM):
         diff = "Medium"
     else:
         diff = "Hard"
-    player1_text = font.render(f"Black: {player1.pieces_in_hand} in hand", True, BLACK)
-    player2_text = font.render(f"White: {player2.pieces_in_hand} in hand", True, BLACK)
-    current_player_text = font.render(f"Current Turn: {'Black' if player1.turn else 'White'}", True, BLUE)
-    ai_difficulty_text = font.render(f"AI Difficulty: {diff}", True, BLACK)
+    player1_text = render_text(f"Black: {player1.pieces_in_hand} in hand", 24, BLACK)
+    player2_text = render_text(f"White: {player2.pieces_in_hand} in hand", 24, BLACK)
+    current_player_text = render_text(f"Current Turn: {'Black' if player1.turn else 'White'}", 24, BLUE)
+    ai_difficulty_text = render_text(f"AI Difficulty: {diff}", 24, BLACK)
   
     ai_text_width = ai_difficulty_text.get_width()
     screen.blit(player1_text, (10, 10))
@@ -100,21 +154,30 @@ def draw_game_info():
     screen.blit(ai_difficulty_text, ((SCREEN_WIDTH - ai_text_width) // 2, 20))
 
 
+def thinking_dots():
+    # None when the AI is not thinking, else how many dots to show
+    if not ai_worker.busy:
+        return None
+    return int(ai_worker.thinking_time() * 3) % 4
+
+def draw_thinking_indicator():
+    dots = thinking_dots()
+    if dots is not None:
+        thinking = render_text("AI is thinking" + "." * dots, 24, BLUE)
+        screen.blit(thinking, (SCREEN_WIDTH - 200, 40))
+
+
 def draw_invalid_move_info():
     if error_message:
-        font = pygame.font.Font(None, 24)
-        invalid_move = font.render(error_message, True, RED)
+        invalid_move = render_text(error_message, 24, RED)
         screen.blit(invalid_move, (10, SCREEN_HEIGHT - 60))  # Adjust position as needed
 
 def draw_commands_info():
-    font = pygame.font.Font(None, 20)  # Same size as rules text
-    header_font = pygame.font.Font(None, 28)  # Same size as rules header
-
-    header = header_font.render("Commands:", True, BLACK)
-    command1 = font.render("1. Click on a cell to select piece(s) (press 1-5) or place a new one", True, BLACK)
-    command2 = font.render("2. Click on another cell to move the selected piece(s)", True, BLACK)
-    command3 = font.render("3. Hold Shift to place a standing piece", True, BLACK)
-    command4 = font.render("4. Hold Ctrl to stack a new piece on a stack", True, BLACK)
+    header = render_text("Commands:", 28, BLACK)  # Same size as rules header
+    command1 = render_text("1. Click on a cell to select piece(s) (press 1-5) or place a new one", 20, BLACK)
+    command2 = render_text("2. Click on another cell to move the selected piece(s)", 20, BLACK)
+    command3 = render_text("3. Hold Shift to place a standing piece", 20, BLACK)
+    command4 = render_text("4. Hold Ctrl to stack a new piece on a stack", 20, BLACK)
     SCREEN_HEIGHT = 690
     # Positioning commands even higher up
     screen.blit(header, (650, SCREEN_HEIGHT - 440))  # Position header higher up
@@ -123,38 +186,30 @@ def draw_commands_info():
     screen.blit(command3, (650, SCREEN_HEIGHT - 365))  # Third command
     screen.blit(command4, (650, SCREEN_HEIGHT - 340))  # Fourth command
 
-def draw_surrender_button():
-    header_font = pygame.font.Font(None, 40)  # Same size as rules header
+SURRENDER_BUTTON = pygame.Rect(650, 690 - 101, 150, 50)
 
-    header = header_font.render("SURRENDER", True, BLACK)
+def surrender_hovered():
+    return SURRENDER_BUTTON.collidepoint(pygame.mouse.get_pos())
 
-    SCREEN_HEIGHT = 690
-    button_x = 650
-    button_y = SCREEN_HEIGHT - 101
-    button_width = 150
-    button_height = 50
-
-    mouse_x, mouse_y = pygame.mouse.get_pos()
+def draw_surrender_button():
+    header = render_text("SURRENDER", 40, BLACK)
 
     # Check if the mouse is hovering over the button
-    if button_x <= mouse_x <= button_x + button_width and button_y <= mouse_y <= button_y + button_height:
-        pygame.draw.rect(screen, (211, 211, 211), (button_x, button_y, button_width, button_height))  # Light gray background
+    if surrender_hovered():
+        pygame.draw.rect(screen, (211, 211, 211), SURRENDER_BUTTON)  # Light gray background
     else:
-        pygame.draw.rect(screen, WHITE, (button_x, button_y, button_width, button_height))  # Default background
+        pygame.draw.rect(screen, WHITE, SURRENDER_BUTTON)  # Default background
 
-    screen.blit(header, (button_x + (button_width - header.get_width()) // 2, button_y + (button_height - header.get_height()) // 2))
+    screen.blit(header, (SURRENDER_BUTTON.x + (SURRENDER_BUTTON.width - header.get_width()) // 2, SURRENDER_BUTTON.y + (SURRENDER_BUTTON.height - header.get_height()) // 2))
 
 def draw_rules_info():
-    font = pygame.font.Font(None, 20)  # Same size as command text
-    header_font = pygame.font.Font(None, 28)  # Same size as command header
+    header = render_text("Rules:", 28, BLACK)  # Same size as command header
     
-    header = header_font.render("Rules:", True, BLACK)
-    
-    rule1 = font.render("1. Only flat pieces count towards winning", True, BLACK)
-    rule2 = font.render("2. Pieces can move in any direction", True, BLACK)
-    rule3 = font.render("3. Standing pieces cannot be stacked upon", True, BLACK)
-    rule4 = font.render("4. Maximum stack size is 5 pieces", True, BLACK)
-    rule5 = font.render("5. Only the top piece of a stack can move", True, BLACK)
+    rule1 = render_text("1. Only flat pieces count towards winning", 20, BLACK)
+    rule2 = render_text("2. Pieces can move in any direction", 20, BLACK)
+    rule3 = render_text("3. Standing pieces cannot be stacked upon", 20, BLACK)
+    rule4 = render_text("4. Maximum stack size is 5 pieces", 20, BLACK)
+    rule5 = render_text("5. Only the top piece of a stack can move", 20, BLACK)
 
     # Set vertical positioning for rules, moving them up
     rules_bottom_offset = 690 - 80  # Adjusted position for rules
@@ -169,11 +224,58 @@ def draw_rules_info():
     screen.blit(rule5, (650, rules_bottom_offset - 75))   # Move rule5 up
 
 
+# Screen regions that change during a game. The text regions are cleared
+# to white before they are drawn again.
+HAND_REGION = pygame.Rect(0, 0, 300, 65)
+TURN_REGION = pygame.Rect(SCREEN_WIDTH - 200, 0, 200, 65)
+ERROR_REGION = pygame.Rect(0, SCREEN_HEIGHT - 65, 640, 35)
+
+def invalidate_screen():
+    # Everything is redrawn on the next frame, e.g. after an overlay
+    drawn_regions.clear()
+
+def update_region(name, key, rect, draw, dirty_rects, clear=True):
+    if drawn_regions.get(name) == key:
+        return
+    screen.set_clip(rect)
+    if clear:
+        screen.fill(WHITE, rect)
+    draw()
+    screen.set_clip(None)
+    drawn_regions[name] = key
+    dirty_rects.append(rect)
+
+def draw_frame():
+    # Draw what changed since the last frame and update only those rects
+    dirty_rects = []
+    if not drawn_regions:
+        screen.fill(WHITE)
+        draw_game_info()
+        draw_commands_info()
+        draw_rules_info()
+        drawn_regions["static"] = True
+        dirty_rects.append(screen.get_rect())
+    with tracer.span("draw_board"):
+        for row in range(BOARD_SIZE):
+            for col in range(BOARD_SIZE):
+                key = cell_key(row, col)
+                rect = cell_rect(row, col)
+                update_region(("cell", row, col), key, rect, lambda: screen.blit(cell_surface(key), rect), dirty_rects, clear=False)
+    with tracer.span("text_panels"):
+        update_region("hand", (player1.pieces_in_hand, player2.pieces_in_hand), HAND_REGION, draw_game_info, dirty_rects)
+        update_region("turn", (player1.turn, thinking_dots()), TURN_REGION, lambda: (draw_game_info(), draw_thinking_indicator()), dirty_rects)
+        update_region("error", error_message, ERROR_REGION, draw_invalid_move_info, dirty_rects)
+        update_region("surrender", surrender_hovered(), SURRENDER_BUTTON, draw_surrender_button, dirty_rects)
+    if dirty_rects:
+        with tracer.span("flip", rects=len(dirty_rects)):
+            pygame.display.update(dirty_rects)
+
 
     
 # Function to wait for a number between 1 and 5
 def wait_for_input_1_to_5():
     while True:
+        clock.tick(FPS)  # wait for input without spinning
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -200,6 +302,7 @@ def wait_for_input_1_to_5():
                     draw_commands_info()
                     draw_rules_info()
                     pygame.display.flip()
+                    invalidate_screen()
         
 def handle_click(pos):
     global selected_row, selected_col, selected_pieces_to_move, error_message
@@ -218,6 +321,11 @@ def handle_click(pos):
 
     if(button_x <= x <= button_x + button_width and button_y <= y <= button_y + button_height):
         show_surrender_overlay()
+        return
+
+    if ai_worker.busy:
+        error_message = "Wait for the AI to move."
+        return
 
     if 0 <= row < BOARD_SIZE and 0 <= col < BOARD_SIZE:
         current_player = player1 if player1.turn else player2
@@ -287,39 +395,61 @@ def handle_click(pos):
         error_message = "Clicked outside the board."
     print(f"Clicked on cell {row}, {col}")
 
-def handle_ai_move():
-    ai = AI(difficulty=DIFFICULTY, player=Color.WHITE, grid_rows=BOARD_SIZE, grid_columns=BOARD_SIZE, max_height=5) 
-    game_state = converter(board, player1, player2, TOTAL_MOVES, BOARD_SIZE)
-    ai_move = ai.get_best_move(game_state)
+def new_ai_session():
+    # One AI for the whole game; it follows the board through add_listener
+    global ai_session
+    book = OPENING_BOOK if os.path.exists(OPENING_BOOK) else None
+    ai = AI(difficulty=DIFFICULTY, player=Color.WHITE, grid_rows=BOARD_SIZE, grid_columns=BOARD_SIZE, max_height=5, opening_book=book)
+    ai_session = AISession(ai, max_turn=MAX_MOVES)
+    board.add_listener(ai_session)
 
+def start_ai_turn():
+    # The search runs on ai_worker's thread, main_game applies the move when it is ready
+    ai_worker.start(ai_session.ai, ai_session.game_state)
+
+def handle_ai_move(ai_move):
     current_player = player2
 
+    # apply includes the AI session's update through the board listener
     if ai_move.is_placement:
-        piece = current_player.place_piece(ai_move.piece.is_vertical)
+        with tracer.span("apply", "ai"):
+            piece = current_player.place_piece(ai_move.piece.is_vertical)
+            if piece:
+                board.place_piece(ai_move.x, ai_move.y, piece)
         if piece:
-            board.place_piece(ai_move.x, ai_move.y, piece)
             switch_turns()
     else:
-        board.move_piece(ai_move.x, ai_move.y, ai_move.to_x, ai_move.to_y, ai_move.count)
+        with tracer.span("apply", "ai"):
+            board.move_piece(ai_move.x, ai_move.y, ai_move.to_x, ai_move.to_y, ai_move.count)
         switch_turns()
 
+    # Ponder on the player's time, unless the game just ended and restarted
+    if player1.turn and TOTAL_MOVES > 0:
+        ai_worker.ponder(ai_session.ai, ai_session.game_state)
+
 def switch_turns():
     """Switch turns and check for win/draw conditions."""
     global TOTAL_MOVES
     player1.toggle_turn()
     player2.toggle_turn()
-    if player2.turn:
-        handle_ai_move() #Call ai move function here instead of player2 
     TOTAL_MOVES += 1  # Increment the move counter
-    check_win()  # Check if anyone has won
-    check_draw()  # Check for the draw condition
-
-    flat_winner = board.check_flat_win_condition()
+    # The spans include the time an overlay waits for R or Q
+    with tracer.span("check_win", turn=TOTAL_MOVES):
+        check_win()  # Check if anyone has won
+    with tracer.span("check_draw"):
+        check_draw()  # Check for the draw condition
+
+    with tracer.span("check_flat_win"):
+        flat_winner = board.check_flat_win_condition()
     if flat_winner == "Draw":
         show_draw_overlay()
     elif flat_winner:
         show_flat_win_overlay(flat_winner)
 
+    # The overlays restart the game, after which it is Black's turn again
+    if player2.turn:
+        start_ai_turn() #AI plays player2, main_game picks up its move
+
 def show_winner_overlay(winner):
     font = pygame.font.Font(None, 60)
     sub_font = pygame.font.Font(None, 36)
@@ -339,6 +469,7 @@ def show_winner_overlay(winner):
     
     # handle restart or quit
     while True:
+        clock.tick(FPS)  # wait for input without spinning
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -398,6 +529,7 @@ def show_difficulty_selection():
                         running = False
 
         pygame.display.update()
+        clock.tick(FPS)
 
 def show_flat_win_overlay(winner):
     font = pygame.font.Font(None, 60)
@@ -418,6 +550,7 @@ def show_flat_win_overlay(winner):
 
     # handle restart or quit
     while True:
+        clock.tick(FPS)  # wait for input without spinning
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -449,6 +582,7 @@ def show_draw_overlay():
 
     # handle restart or quit
     while True:
+        clock.tick(FPS)  # wait for input without spinning
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -462,6 +596,7 @@ def show_draw_overlay():
                     sys.exit()
 
 def show_surrender_overlay():
+    ai_worker.cancel()
     font = pygame.font.Font(None, 60)
     sub_font = pygame.font.Font(None, 36)
     draw_text = font.render("Surrendered", True, BLUE)
@@ -480,6 +615,7 @@ def show_surrender_overlay():
 
     # handle restart or quit
     while True:
+        clock.tick(FPS)  # wait for input without spinning
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
@@ -509,6 +645,7 @@ def check_draw():
 def reset_game():
     # Restarts the game
     global board, player1, player2, selected_row, selected_col, selected_pieces_to_move, error_message, TOTAL_MOVES
+    ai_worker.cancel()
     board = Board()  
     player1 = Player('black') 
     player2 = Player('white')  
@@ -517,28 +654,44 @@ def reset_game():
     selected_pieces_to_move = 0
     error_message = "" 
     TOTAL_MOVES = 0
+    invalidate_screen()  # the overlay covered the board
+    if ai_session is not None:
+        ai_session.reset()
+        board.add_listener(ai_session)
 
 
 def main_game():
     show_difficulty_selection()
+    new_ai_session()
     
     running = True
+    frame = 0
     while running:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.MOUSEBUTTONDOWN:
-                handle_click(pygame.mouse.get_pos())
-        
-        screen.fill(WHITE)
-        draw_board()
-        draw_game_info()
-        draw_invalid_move_info() 
-        draw_commands_info()
-        draw_surrender_button()
-        draw_rules_info()
-        pygame.display.flip()
-
+        with tracer.span("frame", frame=frame):
+            with tracer.span("events"):
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    elif event.type == pygame.MOUSEBUTTONDOWN:
+                        handle_click(pygame.mouse.get_pos())
+                    elif event.type == pygame.VIDEOEXPOSE:
+                        invalidate_screen()  # the window was uncovered, draw it all again
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_F12:
+                        count = tracer.dump(TRACE_FILE)
+                        print(f"Wrote {count} trace events to {TRACE_FILE}")
+
+            ai_move = ai_worker.poll()
+            if ai_move is not None:
+                with tracer.span("handle_ai_move", "ai"):
+                    handle_ai_move(ai_move)
+
+            with tracer.span("draw_frame"):
+                draw_frame()
+            with tracer.span("tick"):
+                clock.tick(FPS)
+        frame += 1
+
+    ai_worker.cancel()
     pygame.quit()
     sys.exit()
     
@@ -1,9 +1,15 @@
 from enum import Enum
 import random
-from typing import Dict, List
+import time
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Tuple
+import itertools
 import math
+import operator
 from Board import Board as OtherBoard
 from Player import Player as OtherPlayer
+from RoadTracker import RoadTracker
 
 """ How to use the AI?
 Step 1: You need file "ai.py" and then import as follows
@@ -11,12 +17,31 @@ from ai import converter, AI, Difficulty, Color
 
 Step 2: Create the AI object with parameters like this:
 ai = AI(difficulty=ai_difficulty, player=ai_color, grid_rows=board_size, grid_columns=board_size, max_height=stack_max_height)
+# Keep the same AI object for the whole game: its transposition table (size set
+# with tt_memory_mb, 0 to disable) is reused between moves.
+# Pass time_limit_ms=... to search as deep as the time budget allows instead of
+# the fixed depth of the difficulty.
+# Pass workers=N to search the root moves on N processes; call ai.close() when
+# the game is over to stop them.
+# Pass engine=Engine.MCTS (with playouts=... or time_limit_ms=...) to use Monte
+# Carlo Tree Search instead of minimax.
+# Pass opening_book="opening_book.bin" to play the first moves from a book
+# built by opening_book.py.
+# get_best_move can run on another thread (see ai_worker.py); ai.stop() makes
+# it return early.
+# ai.analyze(game_state) searches like get_best_move and returns a SearchStats
+# with the move, nodes, cutoffs, TT hit rate, time spent and more. Pass
+# instrument=True or on_search=callback to collect one for every search.
+# For a whole game, ai_session.AISession follows the Board move by move so
+# that converter is not needed every turn.
 
 Step 3: Use the AI
 # first, we need to create the input parameter:
 ai_game_state = converter(
     other_board, player_black, player_white, current_turn, board_size
 )
+# (pass use_bitboard=True to search on the BitBoard representation, which is
+# much faster than the object based AIBoard and gives the same moves)
 
 # Then, call the API:
 ai_move = ai.get_best_move(ai_game_state)
@@ -35,9 +60,29 @@ class Color(Enum):
 
 
 class AIPiece:
-    def __init__(self, color: Color, is_vertical: bool) -> None:
-        self.color = color
-        self.is_vertical = is_vertical
+    """A piece value, one shared instance per kind (see PIECE_KINDS).
+
+    AIPiece(color, is_vertical) returns the interned instance, so boards and
+    moves hold references instead of their own objects. Never change one.
+    """
+
+    __slots__ = ("color", "is_vertical", "kind")
+    _interned: Dict[Tuple[Color, bool], "AIPiece"] = {}
+
+    def __new__(cls, color: Color, is_vertical: bool) -> "AIPiece":
+        is_vertical = bool(is_vertical)
+        piece = cls._interned.get((color, is_vertical))
+        if piece is None:
+            piece = super().__new__(cls)
+            piece.color = color
+            piece.is_vertical = is_vertical
+            piece.kind = color.value | (2 if is_vertical else 0)
+            cls._interned[(color, is_vertical)] = piece
+        return piece
+
+    def __reduce__(self):
+        # unpickling and copying give back the interned instance
+        return AIPiece, (self.color, self.is_vertical)
 
 
 class Winner(Enum):
@@ -48,6 +93,8 @@ class Winner(Enum):
 
 
 class Field:
+    __slots__ = ("pieces",)
+
     def __init__(self) -> None:
         self.pieces: List[AIPiece] = []
 
@@ -74,16 +121,169 @@ class Field:
         return len(self.pieces) == 0
 
 
+# Packed piece kinds: bit 0 is the colour (Color.value), bit 1 is set for standing pieces.
+PIECE_KINDS = (
+    AIPiece(Color.BLACK, is_vertical=False),
+    AIPiece(Color.WHITE, is_vertical=False),
+    AIPiece(Color.BLACK, is_vertical=True),
+    AIPiece(Color.WHITE, is_vertical=True),
+)
+
+
+def piece_kind(piece: AIPiece) -> int:
+    return piece.kind
+
+
+def unpack_pieces(packed: int, height: int) -> List[AIPiece]:
+    """The pieces of a stack packed 2 bits per piece (BitBoard.stacks, Stack.packed), bottom up."""
+    return [PIECE_KINDS[(packed >> (2 * i)) & 3] for i in range(height)]
+
+
+# Zobrist keys for (square, level, piece kind), shared by AIBoard and BitBoard.
+# Seeded so that hashes are identical across processes and runs.
+ZOBRIST_MAX_SQUARES = 64
+ZOBRIST_MAX_HEIGHT = 48
+_zobrist_rng = random.Random(0x5EED13)
+ZOBRIST_KEYS: List[int] = [
+    _zobrist_rng.getrandbits(64)
+    for _ in range(ZOBRIST_MAX_SQUARES * ZOBRIST_MAX_HEIGHT * 4)
+]
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)  # xor-ed in when turn is odd
+
+
+def zobrist_key(sq: int, level: int, kind: int) -> int:
+    return ZOBRIST_KEYS[(sq * ZOBRIST_MAX_HEIGHT + level) * 4 + kind]
+
+
+# Symmetries of a square board: bit 0 mirrors x, bit 1 mirrors y, bit 2 then
+# swaps x and y, giving the 8 rotations and reflections (0 is the identity).
+# SYMMETRY_COLORS (bit 3) also swaps black and white, and with them the side
+# to move. Of all transforms of a position, the canonical one is the one whose
+# side to move and stacks, in square order, compare smallest; see canonical_hash.
+SYMMETRIES = 8
+SYMMETRY_COLORS = 8
+# COLOR_FLIPS[height] flips the colour bit of every piece in a packed stack
+COLOR_FLIPS = [sum(1 << (2 * i) for i in range(height)) for height in range(ZOBRIST_MAX_HEIGHT + 1)]
+_symmetry_tables: Dict[int, tuple] = {}
+
+
+def symmetry_tables(size: int) -> tuple:
+    """(squares, inverse, gathers) for a size x size board: squares[s][sq] is
+    where symmetry s takes square sq, symmetry inverse[s] undoes s, and
+    gathers[s](values) rearranges a per-square sequence as s would."""
+    tables = _symmetry_tables.get(size)
+    if tables is None:
+        squares = []
+        for symmetry in range(SYMMETRIES):
+            table = []
+            for sq in range(size * size):
+                x, y = divmod(sq, size)
+                if symmetry & 1:
+                    x = size - 1 - x
+                if symmetry & 2:
+                    y = size - 1 - y
+                if symmetry & 4:
+                    x, y = y, x
+                table.append(x * size + y)
+            squares.append(table)
+        inverse = [
+            next(
+                t for t in range(SYMMETRIES)
+                if all(squares[t][squares[s][sq]] == sq for sq in range(size * size))
+            )
+            for s in range(SYMMETRIES)
+        ]
+        gathers = [operator.itemgetter(*squares[inverse[s]]) for s in range(SYMMETRIES)]
+        inverse += [s | SYMMETRY_COLORS for s in inverse]
+        tables = _symmetry_tables[size] = (squares, inverse, gathers)
+    return tables
+
+
+def inverse_symmetry(symmetry: int, size: int) -> int:
+    return symmetry_tables(size)[1][symmetry]
+
+
+def canonical_hash(
+    stacks: List[int],
+    heights: List[int],
+    size: int,
+    side: int = 0,
+    colors: bool = False,
+    zobrist: int = None,
+) -> Tuple[int, int]:
+    """(hash, symmetry) of the canonical form of a position given as packed stacks.
+
+    The hash is the Zobrist hash of the position after `symmetry`, with the
+    side to move (0 or 1) folded in like GameState.hash. With colors the
+    colour-swapped transforms are candidates too. Pass the board's zobrist to
+    save rehashing when the position is already canonical.
+    """
+    gathers = symmetry_tables(size)[2]
+    # one int per square holding its whole stack; height < 64 (ZOBRIST_MAX_HEIGHT)
+    codes = list(map(operator.or_, map(operator.lshift, stacks, itertools.repeat(6)), heights))
+    candidates = [(side, codes, 0)]
+    if colors:
+        flips = [COLOR_FLIPS[height] << 6 for height in heights]
+        candidates.append((side ^ 1, list(map(operator.xor, codes, flips)), SYMMETRY_COLORS))
+    best = None
+    best_symmetry = 0
+    for to_move, values, swap in candidates:
+        for symmetry in range(SYMMETRIES):
+            key = (to_move, gathers[symmetry](values))
+            if best is None or key < best:
+                best = key
+                best_symmetry = symmetry | swap
+    to_move, codes = best
+    h = ZOBRIST_SIDE if to_move else 0
+    if best_symmetry == 0 and zobrist is not None:
+        return zobrist ^ h, 0
+    keys = ZOBRIST_KEYS
+    for sq, code in enumerate(codes):
+        if code:
+            base = sq * ZOBRIST_MAX_HEIGHT
+            packed = code >> 6
+            for level in range(code & 63):
+                h ^= keys[(base + level) * 4 + ((packed >> (2 * level)) & 3)]
+    return h, best_symmetry
+
+
 class AIBoard:
     def __init__(self, size: int = 5) -> None:
         self.size = size
         self.fields: List[List[Field]] = [
             [Field() for _ in range(size)] for _ in range(size)
         ]
+        self.zobrist = 0  # kept up to date by every place/move below
+        # road groups per Color.value, also kept up to date by place/move, so
+        # change fields through these methods only
+        self.roads = RoadTracker(size)
+
+    def _track(self, x: int, y: int) -> None:
+        pieces = self.fields[x][y].pieces
+        owner = None
+        if pieces and not pieces[-1].is_vertical:
+            owner = pieces[-1].color.value
+        self.roads.set_top(x * self.size + y, owner)
+
+    def _hash_pieces(self, x: int, y: int, level: int, pieces: List[AIPiece]) -> None:
+        base = (x * self.size + y) * ZOBRIST_MAX_HEIGHT
+        for i, piece in enumerate(pieces):
+            self.zobrist ^= ZOBRIST_KEYS[(base + level + i) * 4 + piece_kind(piece)]
+
+    def compute_zobrist(self) -> int:
+        """Hash the board from scratch; should always equal self.zobrist."""
+        h = 0
+        for x in range(self.size):
+            for y in range(self.size):
+                for level, piece in enumerate(self.fields[x][y].pieces):
+                    h ^= zobrist_key(x * self.size + y, level, piece_kind(piece))
+        return h
 
     def place_piece(self, x: int, y: int, pieces: List[AIPiece]) -> None:
         if 0 <= x < self.size and 0 <= y < self.size:
+            self._hash_pieces(x, y, self.fields[x][y].get_piece_count(), pieces)
             self.fields[x][y].add_piece(pieces)
+            self._track(x, y)
 
     def move_piece(
         self, x: int, y: int, new_x: int, new_y: int, count: int = 1
@@ -95,7 +295,13 @@ class AIBoard:
             and 0 <= new_y < self.size
         ):
             pieces_to_move = self.fields[x][y].remove_piece(count)
+            self._hash_pieces(x, y, self.fields[x][y].get_piece_count(), pieces_to_move)
+            self._hash_pieces(
+                new_x, new_y, self.fields[new_x][new_y].get_piece_count(), pieces_to_move
+            )
             self.fields[new_x][new_y].add_piece(pieces_to_move)
+            self._track(x, y)
+            self._track(new_x, new_y)
             return pieces_to_move
         return []
 
@@ -103,13 +309,83 @@ class AIBoard:
         self, x: int, y: int, new_x: int, new_y: int, count: int
     ) -> None:
         pieces_to_move_back = self.fields[new_x][new_y].remove_piece(count)
+        self._hash_pieces(
+            new_x, new_y, self.fields[new_x][new_y].get_piece_count(), pieces_to_move_back
+        )
+        self._hash_pieces(x, y, self.fields[x][y].get_piece_count(), pieces_to_move_back)
         self.fields[x][y].add_piece(pieces_to_move_back)
+        self._track(new_x, new_y)
+        self._track(x, y)
+
+    def undo_place_piece(self, x: int, y: int) -> None:
+        removed = self.fields[x][y].remove_piece(1)
+        self._hash_pieces(x, y, self.fields[x][y].get_piece_count(), removed)
+        self._track(x, y)
+
+    # Square-index versions of the above, used by GameState.apply_packed
+    def place_kind(self, sq: int, kind: int) -> None:
+        self.place_piece(sq // self.size, sq % self.size, [PIECE_KINDS[kind]])
+
+    def remove_top(self, sq: int) -> None:
+        self.undo_place_piece(sq // self.size, sq % self.size)
+
+    def transfer(self, src: int, dst: int, count: int) -> None:
+        size = self.size
+        self.move_piece(src // size, src % size, dst // size, dst % size, count)
+
+    @property
+    def heights(self) -> List[int]:
+        return [
+            len(self.fields[x][y].pieces)
+            for x in range(self.size)
+            for y in range(self.size)
+        ]
 
     def get_field(self, x: int, y: int) -> Field:
         if 0 <= x < self.size and 0 <= y < self.size:
             return self.fields[x][y]
         return None
 
+    def height(self, x: int, y: int) -> int:
+        return len(self.fields[x][y].pieces)
+
+    def top_color(self, x: int, y: int) -> Color:
+        pieces = self.fields[x][y].pieces
+        return pieces[-1].color if pieces else None
+
+    def top_is_standing(self, x: int, y: int) -> bool:
+        pieces = self.fields[x][y].pieces
+        return bool(pieces) and pieces[-1].is_vertical
+
+    def _top_masks(self, vertical: bool) -> List[int]:
+        masks = [0, 0]
+        for x in range(self.size):
+            for y in range(self.size):
+                pieces = self.fields[x][y].pieces
+                if pieces and pieces[-1].is_vertical == vertical:
+                    masks[pieces[-1].color.value] |= 1 << (x * self.size + y)
+        return masks
+
+    @property
+    def flats(self) -> List[int]:
+        """Bitmask of squares topped by a flat piece, per Color.value (see BitBoard)."""
+        return self._top_masks(False)
+
+    @property
+    def walls(self) -> List[int]:
+        """Bitmask of squares topped by a standing piece, per Color.value."""
+        return self._top_masks(True)
+
+    def count_flats(self, color: Color) -> int:
+        count = 0
+        for row in self.fields:
+            for field in row:
+                if field.pieces:
+                    top_piece = field.pieces[-1]
+                    if not top_piece.is_vertical and top_piece.color == color:
+                        count += 1
+        return count
+
     def is_field_full(self, x: int, y: int, max_height: int) -> bool:
         field = self.get_field(x, y)
         return field.get_piece_count() >= max_height if field else False
@@ -180,50 +456,287 @@ class AIBoard:
                     return False
         return True
 
-    def dfs(
-        self, x: int, y: int, player_color: Color, visited: set, direction: str
-    ) -> bool:
-        if direction == "horizontal" and y == self.size - 1:  # 水平连接到最后一列
-            return True
-        if direction == "vertical" and x == self.size - 1:  # 垂直连接到最后一行
-            return True
-
-        visited.add((x, y))
-
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < self.size and 0 <= ny < self.size and (nx, ny) not in visited:
-                field = self.fields[nx][ny]
-                if (
-                    field.get_piece_count() > 0
-                    and field.get_piece(1)[0].color.value == player_color.value
-                    and not field.get_piece(1)[0].is_vertical
-                ):
-                    if self.dfs(nx, ny, player_color, visited, direction):
-                        return True
-        return False
-
     def check_full_path(self, player_color: Color) -> bool:
-        # From left to right
+        return self.roads.has_road(player_color.value)
+
+    def packed_stacks(self) -> Tuple[List[int], List[int]]:
+        """Every square's stack packed like BitBoard.stacks, plus a height list."""
+        stacks = []
+        heights = []
         for x in range(self.size):
-            if (
-                self.fields[x][0].get_piece_count() > 0
-                and self.fields[x][0].get_piece(1)[0].color.value == player_color.value
-            ):
-                if self.dfs(x, 0, player_color, set(), "horizontal"):
-                    return True
-
-        # From up to bottom
+            for y in range(self.size):
+                packed = 0
+                for level, piece in enumerate(self.fields[x][y].pieces):
+                    packed |= piece_kind(piece) << (2 * level)
+                stacks.append(packed)
+                heights.append(len(self.fields[x][y].pieces))
+        return stacks, heights
+
+    def canonical(self, side: int = 0, colors: bool = False) -> Tuple[int, int]:
+        """(hash, symmetry) of the board's canonical form, see canonical_hash."""
+        stacks, heights = self.packed_stacks()
+        return canonical_hash(stacks, heights, self.size, side, colors, self.zobrist)
+
+
+class BitBoard:
+    """Drop-in replacement for AIBoard backed by integer bitmasks.
+
+    Square (x, y) is bit ``x * size + y``. Every stack is packed into one int,
+    two bits per piece from the bottom up (see PIECE_KINDS), with its height
+    kept next to it. The masks below always describe the top of each square, so
+    win checks, flat counts and move generation never touch piece objects.
+    """
+
+    def __init__(self, size: int = 5) -> None:
+        self.size = size
+        squares = size * size
+        self.full_mask = (1 << squares) - 1
+        self.stacks: List[int] = [0] * squares
+        self.heights: List[int] = [0] * squares
+        self.flats: List[int] = [0, 0]  # top is a flat piece, indexed by Color.value
+        self.walls: List[int] = [0, 0]  # top is a standing piece, indexed by Color.value
+        self.occupied = 0
+        self.zobrist = 0
+        # last (flats mask, has road) per colour: a move changes at most one
+        # colour's flats in most positions, so the other answer is reused
+        self.road_cache: List[List] = [[0, False], [0, False]]
+
+        self.edge_x0 = 0
+        self.edge_x_last = 0
+        self.edge_y0 = 0
+        self.edge_y_last = 0
+        for i in range(size):
+            self.edge_x0 |= 1 << i
+            self.edge_x_last |= 1 << ((size - 1) * size + i)
+            self.edge_y0 |= 1 << (i * size)
+            self.edge_y_last |= 1 << (i * size + size - 1)
+        self.not_y0 = self.full_mask & ~self.edge_y0
+        self.not_y_last = self.full_mask & ~self.edge_y_last
+
+    @property
+    def black_flat(self) -> int:
+        return self.flats[Color.BLACK.value]
+
+    @property
+    def white_flat(self) -> int:
+        return self.flats[Color.WHITE.value]
+
+    @property
+    def standing(self) -> int:
+        return self.walls[0] | self.walls[1]
+
+    def _refresh(self, sq: int) -> None:
+        keep = ~(1 << sq)
+        flats = self.flats
+        walls = self.walls
+        flats[0] &= keep
+        flats[1] &= keep
+        walls[0] &= keep
+        walls[1] &= keep
+        height = self.heights[sq]
+        if height:
+            self.occupied |= 1 << sq
+            kind = self.stacks[sq] >> (2 * (height - 1))
+            if kind & 2:
+                walls[kind & 1] |= 1 << sq
+            else:
+                flats[kind & 1] |= 1 << sq
+        else:
+            self.occupied &= keep
+
+    def transfer(self, src: int, dst: int, count: int) -> None:
+        height = self.heights[src]
+        if count > height:
+            count = height
+        shift = 2 * (height - count)
+        moved = self.stacks[src] >> shift
+        dst_height = self.heights[dst]
+        src_base = src * ZOBRIST_MAX_HEIGHT + height - count
+        dst_base = dst * ZOBRIST_MAX_HEIGHT + dst_height
+        h = self.zobrist
+        for i in range(count):
+            kind = (moved >> (2 * i)) & 3
+            h ^= ZOBRIST_KEYS[(src_base + i) * 4 + kind]
+            h ^= ZOBRIST_KEYS[(dst_base + i) * 4 + kind]
+        self.zobrist = h
+        self.stacks[src] &= (1 << shift) - 1
+        self.heights[src] = height - count
+        self.stacks[dst] |= moved << (2 * dst_height)
+        self.heights[dst] = dst_height + count
+        self._refresh(src)
+        self._refresh(dst)
+
+    def place_piece(self, x: int, y: int, pieces: List[AIPiece]) -> None:
+        if 0 <= x < self.size and 0 <= y < self.size:
+            sq = x * self.size + y
+            for piece in pieces:
+                kind = piece_kind(piece)
+                self.zobrist ^= zobrist_key(sq, self.heights[sq], kind)
+                self.stacks[sq] |= kind << (2 * self.heights[sq])
+                self.heights[sq] += 1
+            self._refresh(sq)
+
+    def place_kind(self, sq: int, kind: int) -> None:
+        height = self.heights[sq]
+        self.zobrist ^= ZOBRIST_KEYS[(sq * ZOBRIST_MAX_HEIGHT + height) * 4 + kind]
+        self.stacks[sq] |= kind << (2 * height)
+        self.heights[sq] = height + 1
+        self._refresh(sq)
+
+    def remove_top(self, sq: int) -> None:
+        if self.heights[sq]:
+            self.heights[sq] -= 1
+            level = self.heights[sq]
+            self.zobrist ^= zobrist_key(sq, level, self.stacks[sq] >> (2 * level))
+            self.stacks[sq] &= (1 << (2 * level)) - 1
+            self._refresh(sq)
+
+    def undo_place_piece(self, x: int, y: int) -> None:
+        self.remove_top(x * self.size + y)
+
+    def packed_stacks(self) -> Tuple[List[int], List[int]]:
+        return list(self.stacks), list(self.heights)
+
+    def canonical(self, side: int = 0, colors: bool = False) -> Tuple[int, int]:
+        """(hash, symmetry) of the board's canonical form, see canonical_hash."""
+        return canonical_hash(self.stacks, self.heights, self.size, side, colors, self.zobrist)
+
+    def compute_zobrist(self) -> int:
+        """Hash the board from scratch; should always equal self.zobrist."""
+        h = 0
+        for sq in range(self.size * self.size):
+            for level in range(self.heights[sq]):
+                h ^= zobrist_key(sq, level, (self.stacks[sq] >> (2 * level)) & 3)
+        return h
+
+    def move_piece(
+        self, x: int, y: int, new_x: int, new_y: int, count: int = 1
+    ) -> None:
+        if (
+            0 <= x < self.size
+            and 0 <= y < self.size
+            and 0 <= new_x < self.size
+            and 0 <= new_y < self.size
+        ):
+            self.transfer(x * self.size + y, new_x * self.size + new_y, count)
+
+    def undo_move_piece(
+        self, x: int, y: int, new_x: int, new_y: int, count: int
+    ) -> None:
+        self.transfer(new_x * self.size + new_y, x * self.size + y, count)
+
+    def get_field(self, x: int, y: int) -> Field:
+        """Materialise the stack on (x, y) as a Field, for display and debugging."""
+        if 0 <= x < self.size and 0 <= y < self.size:
+            sq = x * self.size + y
+            field = Field()
+            field.add_piece(unpack_pieces(self.stacks[sq], self.heights[sq]))
+            return field
+        return None
+
+    def height(self, x: int, y: int) -> int:
+        return self.heights[x * self.size + y]
+
+    def top_color(self, x: int, y: int) -> Color:
+        bit = 1 << (x * self.size + y)
+        if (self.flats[0] | self.walls[0]) & bit:
+            return Color.BLACK
+        if (self.flats[1] | self.walls[1]) & bit:
+            return Color.WHITE
+        return None
+
+    def top_is_standing(self, x: int, y: int) -> bool:
+        return bool((self.walls[0] | self.walls[1]) >> (x * self.size + y) & 1)
+
+    def is_field_full(self, x: int, y: int, max_height: int) -> bool:
+        return self.heights[x * self.size + y] >= max_height
+
+    def count_flats(self, color: Color) -> int:
+        return self.flats[color.value].bit_count()
+
+    def display(self) -> None:
+        fixed_width = 6
+        print("  ", end="")
+        for x in range(self.size):
+            print(f"{x:^{fixed_width}}", end="")
+        print()
+
         for y in range(self.size):
-            if (
-                self.fields[0][y].get_piece_count() > 0
-                and self.fields[0][y].get_piece(1)[0].color.value == player_color.value
-            ):
-                if self.dfs(0, y, player_color, set(), "vertical"):
-                    return True
+            print(f"{y} ", end="")
+            for x in range(self.size):
+                pieces = self.get_field(x, y).pieces
+                if pieces:
+                    piece_display = "|".join(
+                        f"{'B' if piece.color == Color.BLACK else 'W'}{'H' if not piece.is_vertical else 'V'}"
+                        for piece in pieces
+                    )
+                    print(f"{piece_display:^{fixed_width}}", end="")
+                else:
+                    print(f"{'.':^{fixed_width}}", end="")
+            print()
+
+    def check_winner(self, turn: int, max_turn: int) -> Winner:
+        black_wins = self.check_full_path(Color.BLACK)
+        white_wins = self.check_full_path(Color.WHITE)
+
+        if black_wins and white_wins:
+            return Winner.DRAW
+
+        if black_wins:
+            return Winner.BLACK_WIN
+        if white_wins:
+            return Winner.WHITE_WIN
+        if turn >= max_turn:
+            return self.check_draw()
+        if self.is_full():
+            return self.check_draw()
+        return Winner.ONGOING
+
+    def check_draw(self) -> Winner:
+        black_horizontal_count = self.flats[0].bit_count()
+        white_horizontal_count = self.flats[1].bit_count()
+        if black_horizontal_count > white_horizontal_count:
+            return Winner.BLACK_WIN
+        elif white_horizontal_count > black_horizontal_count:
+            return Winner.WHITE_WIN
+        else:
+            return Winner.DRAW
 
+    def is_full(self) -> bool:
+        return self.occupied == self.full_mask
+
+    def connects(self, flats: int, seeds: int, target: int) -> bool:
+        """Flood-fill from seeds through flats, True once target is reached."""
+        size = self.size
+        reach = seeds & flats
+        while reach:
+            if reach & target:
+                return True
+            grown = (
+                reach
+                | ((reach << 1) & self.not_y0)
+                | ((reach >> 1) & self.not_y_last)
+                | (reach << size)
+                | (reach >> size)
+            ) & flats
+            if grown == reach:
+                return False
+            reach = grown
         return False
 
+    def check_full_path(self, player_color: Color) -> bool:
+        flats = self.flats[player_color.value]
+        cache = self.road_cache[player_color.value]
+        if cache[0] == flats:
+            return cache[1]
+        # From left to right, then from up to bottom
+        road = self.connects(
+            flats, self.edge_y0, self.edge_y_last
+        ) or self.connects(flats, self.edge_x0, self.edge_x_last)
+        cache[0] = flats
+        cache[1] = road
+        return road
+
 
 class Move:
     def __init__(
@@ -244,6 +757,53 @@ class Move:
         self.piece = piece  # ignore this when moving piece
         self.count = count
 
+    def key(self) -> tuple:
+        if self.is_placement:
+            return (self.x, self.y, True, self.piece.color.value, self.piece.is_vertical)
+        return (self.x, self.y, False, self.to_x, self.to_y, self.count)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Move) and self.key() == other.key()
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
+
+# Inside the search moves are packed into ints: square in bits 0-5, target
+# square in bits 6-11, count in bits 12-15 and the move type from bit 16.
+# The placed piece's colour is the side to move. AI.decode_move/encode_move
+# convert to and from Move.
+MOVE_PLACE_FLAT = 0
+MOVE_PLACE_STANDING = 1
+MOVE_STACK = 2
+
+
+def pack_move(sq: int, to_sq: int = 0, count: int = 0, move_type: int = MOVE_PLACE_FLAT) -> int:
+    return sq | (to_sq << 6) | (count << 12) | (move_type << 16)
+
+
+def transform_packed(move: int, symmetry: int, size: int) -> int:
+    """The packed move after symmetry (see SYMMETRIES). The colour swap needs no
+    change: a placement always places the mover's colour."""
+    table = symmetry_tables(size)[0][symmetry & 7]
+    if move >> 16 == MOVE_STACK:
+        return (move & ~4095) | table[move & 63] | (table[(move >> 6) & 63] << 6)
+    return (move & ~63) | table[move & 63]
+
+
+def transform_move(move: Move, symmetry: int, size: int) -> Move:
+    """The Move after symmetry, swapping the placed piece's colour with SYMMETRY_COLORS."""
+    table = symmetry_tables(size)[0][symmetry & 7]
+    x, y = divmod(table[move.x * size + move.y], size)
+    if move.is_placement:
+        piece = move.piece
+        if symmetry & SYMMETRY_COLORS:
+            other = Color.WHITE if piece.color == Color.BLACK else Color.BLACK
+            piece = AIPiece(other, piece.is_vertical)
+        return Move(x, y, True, piece=piece, count=move.count)
+    to_x, to_y = divmod(table[move.to_x * size + move.to_y], size)
+    return Move(x, y, False, to_x, to_y, count=move.count)
+
 
 class Difficulty(Enum):
     EASY = 0
@@ -258,6 +818,40 @@ depth_mapping: Dict[Difficulty, int] = {
 }
 
 
+# Weights of the features AI.evaluate compares between the two sides. A road
+# scores 1000, so the evaluation has to stay far below that.
+EVAL_WEIGHTS: Tuple[float, ...] = (
+    1.0,  # flat pieces on top, what decides a full board
+    0.5,  # squares in the largest connected group of flats, progress to a road
+    0.25,  # flats on the edge of the board, where every road starts and ends
+    0.3,  # pieces buried under stacks the side controls
+    0.1,  # pieces still in hand
+)
+# Every evaluation is a multiple of this, so scores closer than it are equal
+EVAL_GRAIN = 0.05
+
+# Limits of the quiescence search, per AI (see AI.quiesce)
+QUIESCENCE_DEPTH = 6
+QUIESCENCE_BUDGET = 50000
+
+# Iterative deepening searches each depth first in a window this far either
+# side of an earlier depth's score (see AI.iterative_deepening), about a flat
+ASPIRATION_WINDOW = 1.0
+
+
+class Engine(Enum):
+    MINIMAX = 0
+    MCTS = 1  # Monte Carlo Tree Search, see mcts.py
+
+
+# playouts per move for Engine.MCTS when neither playouts nor time_limit_ms is given
+playout_mapping: Dict[Difficulty, int] = {
+    Difficulty.EASY: 100,
+    Difficulty.MEDIUM: 500,
+    Difficulty.HARD: 2000,
+}
+
+
 class GameState:
     def __init__(
         self,
@@ -272,6 +866,9 @@ class GameState:
         self.num_white_piece = num_white_piece  # how many white pieces available
         self.turn = turn
         self.max_turn = max_turn
+        # Zobrist hash of the position: the board's incremental hash plus the
+        # side to move (turn parity). Updated by apply_move/undo_move.
+        self.hash = board.zobrist ^ (ZOBRIST_SIDE if turn & 1 else 0)
 
     def apply_move(self, move: Move, player: Color) -> None:
         if move.is_placement:
@@ -283,10 +880,11 @@ class GameState:
         else:
             self.board.move_piece(move.x, move.y, move.to_x, move.to_y, move.count)
         self.turn += 1
+        self.hash = self.board.zobrist ^ (ZOBRIST_SIDE if self.turn & 1 else 0)
 
     def undo_move(self, move: Move, player: Color) -> None:
         if move.is_placement:
-            self.board.fields[move.x][move.y].remove_piece(1)
+            self.board.undo_place_piece(move.x, move.y)
             if player == Color.BLACK:
                 self.num_black_piece += 1
             else:
@@ -294,6 +892,86 @@ class GameState:
         else:
             self.board.undo_move_piece(move.x, move.y, move.to_x, move.to_y, move.count)
         self.turn -= 1
+        self.hash = self.board.zobrist ^ (ZOBRIST_SIDE if self.turn & 1 else 0)
+
+    def apply_packed(self, move: int, player: Color) -> None:
+        """apply_move for a packed move (see pack_move)."""
+        move_type = move >> 16
+        if move_type == MOVE_STACK:
+            self.board.transfer(move & 63, (move >> 6) & 63, (move >> 12) & 15)
+        else:
+            self.board.place_kind(move & 63, player.value | (move_type << 1))
+            if player == Color.BLACK:
+                self.num_black_piece -= 1
+            else:
+                self.num_white_piece -= 1
+        self.turn += 1
+        self.hash = self.board.zobrist ^ (ZOBRIST_SIDE if self.turn & 1 else 0)
+
+    def undo_packed(self, move: int, player: Color) -> None:
+        """undo_move for a packed move (see pack_move)."""
+        if move >> 16 == MOVE_STACK:
+            self.board.transfer((move >> 6) & 63, move & 63, (move >> 12) & 15)
+        else:
+            self.board.remove_top(move & 63)
+            if player == Color.BLACK:
+                self.num_black_piece += 1
+            else:
+                self.num_white_piece += 1
+        self.turn -= 1
+        self.hash = self.board.zobrist ^ (ZOBRIST_SIDE if self.turn & 1 else 0)
+
+    def canonical(self, colors: bool = False) -> Tuple[int, int]:
+        """(key, symmetry): the hash of the position's canonical form, equal for
+        all its rotations and reflections (and colour swaps with colors), and
+        the symmetry that takes this position there. Turn moves into the
+        canonical frame with transform_packed(move, symmetry, size) and back
+        with inverse_symmetry(symmetry, size)."""
+        return self.board.canonical(self.turn & 1, colors)
+
+    def transformed(self, symmetry: int) -> "GameState":
+        """A copy of the position after symmetry, on a BitBoard. A colour swap
+        also swaps the hands and moves turn by one so the other side is to move."""
+        size, stacks, heights, num_black, num_white, turn, max_turn = self.snapshot()
+        squares = symmetry_tables(size)[0][symmetry & 7]
+        new_stacks = [0] * (size * size)
+        new_heights = [0] * (size * size)
+        for sq, to_sq in enumerate(squares):
+            new_stacks[to_sq] = stacks[sq]
+            new_heights[to_sq] = heights[sq]
+        if symmetry & SYMMETRY_COLORS:
+            new_stacks = [packed ^ COLOR_FLIPS[height] for packed, height in zip(new_stacks, new_heights)]
+            num_black, num_white = num_white, num_black
+            turn ^= 1
+        return GameState.from_snapshot(
+            (size, new_stacks, new_heights, num_black, num_white, turn, max_turn)
+        )
+
+    def snapshot(self) -> tuple:
+        """Compact, picklable copy of the position, for other processes.
+
+        (board size, packed stacks, heights, black pieces, white pieces, turn,
+        max turn) using the BitBoard stack packing; see from_snapshot.
+        """
+        stacks, heights = self.board.packed_stacks()
+        return (
+            self.board.size,
+            tuple(stacks),
+            tuple(heights),
+            self.num_black_piece,
+            self.num_white_piece,
+            self.turn,
+            self.max_turn,
+        )
+
+    @staticmethod
+    def from_snapshot(snapshot: tuple, use_bitboard: bool = True) -> "GameState":
+        size, stacks, heights, num_black, num_white, turn, max_turn = snapshot
+        board = BitBoard(size) if use_bitboard else AIBoard(size)
+        for sq, (packed, height) in enumerate(zip(stacks, heights)):
+            if height:
+                board.place_piece(sq // size, sq % size, unpack_pieces(packed, height))
+        return GameState(board, num_black, num_white, turn, max_turn)
 
 
 def map_color(color_str: str) -> "Color":
@@ -312,19 +990,17 @@ def converter(
     turn: int,
     max_turn: int = 200,
     board_size: int = 6,
+    use_bitboard: bool = False,
 ) -> GameState:
 
-    ai_board = AIBoard(size=board_size)
+    ai_board = BitBoard(size=board_size) if use_bitboard else AIBoard(size=board_size)
 
     for y in range(board_size):
         for x in range(board_size):
             stack = other_board.get_stack(x, y)
             if stack and not stack.is_empty():
-                ai_pieces = [
-                    AIPiece(color=map_color(piece.color), is_vertical=piece.standing)
-                    for piece in stack.stack
-                ]
-                ai_board.fields[x][y].add_piece(ai_pieces)
+                # Stack packs its pieces with the same kinds as the AI boards
+                ai_board.place_piece(x, y, unpack_pieces(stack.packed, stack.height))
 
     num_black_piece = player1.pieces_in_hand
     num_white_piece = player2.pieces_in_hand
@@ -340,6 +1016,127 @@ def converter(
     return game_state
 
 
+class Bound(Enum):
+    EXACT = 0
+    LOWER = 1  # score is at least this (search failed high)
+    UPPER = 2  # score is at most this (search failed low)
+
+
+class TranspositionTable:
+    """Fixed-size hash table of search results keyed by GameState.hash.
+
+    The number of slots is derived from max_memory_mb (rounded down to a power
+    of two). Each slot holds one (key, depth, score, bound, best_move,
+    generation) tuple. On a collision the new entry wins if the slot holds the
+    same position, an entry from an older search, or a shallower search;
+    otherwise the deeper entry from the current search is kept.
+
+    Scores are from the point of view of the side to move. The hash tells the
+    sides apart by turn parity (ZOBRIST_SIDE) but does not include the turn
+    number, so entries are shared between transpositions reached at
+    different turns with the same side to move.
+    """
+
+    ENTRY_BYTES = 160  # rough size of one stored entry
+
+    def __init__(self, max_memory_mb: float = 32) -> None:
+        capacity = max(1, int(max_memory_mb * 1024 * 1024) // self.ENTRY_BYTES)
+        self.capacity = 1 << (capacity.bit_length() - 1)
+        self.mask = self.capacity - 1
+        self.slots: List[tuple] = [None] * self.capacity
+        self.generation = 0
+        self.used = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self) -> None:
+        """Age existing entries so that the next search may overwrite them."""
+        self.generation += 1
+
+    def clear(self) -> None:
+        self.slots = [None] * self.capacity
+        self.used = 0
+
+    def probe(self, key: int) -> tuple:
+        self.probes += 1
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(
+        self, key: int, depth: int, score: float, bound: Bound, best_move: int
+    ) -> None:
+        index = key & self.mask
+        old = self.slots[index]
+        if old is None:
+            self.used += 1
+        elif old[0] != key and old[5] == self.generation and old[1] > depth:
+            return
+        self.slots[index] = (key, depth, score, bound, best_move, self.generation)
+
+
+class SearchStats:
+    """What one search of an instrumented AI did (see AI.analyze).
+
+    Times are in seconds. movegen_time, win_check_time and eval_time cover the
+    calls made in this process; with workers > 1 the other root moves are
+    searched elsewhere and only their nodes are counted.
+    """
+
+    def __init__(self) -> None:
+        self.move: Move = None
+        self.depth = 0
+        self.pv: List[Move] = []
+        self.time = 0.0
+        self.nodes = 0
+        self.qnodes = 0  # quiescence moves searched
+        self.leaf_evals = 0  # evaluate() calls
+        self.cutoffs = 0  # beta cutoffs
+        self.first_move_cutoffs = 0  # beta cutoffs by the first move searched
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+        self.movegen_time = 0.0
+        self.win_check_time = 0.0
+        self.eval_time = 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """How often the first move was good enough, a measure of move ordering."""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def tt_hit_rate(self) -> float:
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    @property
+    def nodes_per_sec(self) -> float:
+        return self.nodes / self.time if self.time else 0.0
+
+    def as_dict(self) -> dict:
+        """The numbers, plus move and pv as (x, y, to_x, to_y, count) tuples, e.g. for JSON."""
+        stats = {
+            name: value for name, value in vars(self).items() if name not in ("move", "pv")
+        }
+        stats.update(
+            first_move_cutoff_rate=self.first_move_cutoff_rate,
+            tt_hit_rate=self.tt_hit_rate,
+            nodes_per_sec=self.nodes_per_sec,
+            move=None if self.move is None else move_tuple(self.move),
+            pv=[move_tuple(move) for move in self.pv],
+        )
+        return stats
+
+
+def move_tuple(move: Move) -> tuple:
+    if move.is_placement:
+        return (move.x, move.y, move.piece.is_vertical)
+    return (move.x, move.y, move.to_x, move.to_y, move.count)
+
+
 class AI:
     def __init__(
         self,
@@ -348,6 +1145,16 @@ class AI:
         grid_rows: int,
         grid_columns: int,
         max_height: int = 5,
+        tt_memory_mb: float = 32,
+        time_limit_ms: float = None,
+        move_ordering: bool = True,
+        workers: int = 0,
+        engine: Engine = Engine.MINIMAX,
+        playouts: int = None,
+        opening_book=None,
+        quiescence: bool = True,
+        instrument: bool = False,
+        on_search: Callable[[SearchStats], None] = None,
     ) -> None:
         self.difficulty = difficulty
         self.player = player
@@ -356,29 +1163,597 @@ class AI:
         self.rows = grid_rows
         self.columns = grid_columns
         self.max_height = max_height  # max stack height for field
+        # shared by every search of this AI; tt_memory_mb=0 turns it off
+        self.tt = TranspositionTable(tt_memory_mb) if tt_memory_mb > 0 else None
+        # With a time limit get_best_move deepens 1, 2, 3... instead of using
+        # max_depth, and answers with the last iteration that finished in time.
+        self.time_limit_ms = time_limit_ms
+        self.deadline: float = None
+        # More limits for a time-limited search: iterative deepening stops
+        # after depth_limit, and past node_limit nodes it ends like at the deadline
+        self.depth_limit: int = None
+        self.node_limit = math.inf
+        self.timed_out = False
+        # Set by stop() from another thread; the running search then unwinds
+        # like a timeout. search() clears it when it starts.
+        self.stopped = False
+        # Counted per search (see reset_counters): nodes, and searches again
+        # after a null window or aspiration window failed
+        self.nodes = 0
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        # With instrument (or on_search) every search also times move
+        # generation, win checks and evaluation, and leaves a SearchStats in
+        # self.stats that is passed to on_search. Without, nothing is timed.
+        self.instrument = instrument or on_search is not None
+        self.on_search = on_search
+        self.stats: SearchStats = None
+        self.root_turn = 0
+        self.completed_depth = 0
+        self.pv: List[int] = []  # principal variation of the last finished search
+        self.pv_table: List[List[int]] = []
+        # Move ordering: TT move, PV move, road threats and captures, killer
+        # moves, then the history heuristic. Killers and history are kept
+        # between searches of this AI.
+        self.move_ordering = move_ordering
+        self.killers: List[List[int]] = []  # two moves per ply from the root
+        self.history: Dict[int, int] = {}  # move -> cutoff score
+        # Quiescence search at the horizon (see quiesce): at most
+        # quiescence_depth extra plies, and quiescence_budget nodes per search
+        # counted in qnodes, past which horizon positions are just evaluated.
+        self.quiescence = quiescence
+        self.quiescence_depth = QUIESCENCE_DEPTH
+        self.quiescence_budget = QUIESCENCE_BUDGET
+        self.qnodes = 0
+        # Moves are generated from tables built here: place_moves[sq] holds the
+        # (flat, standing) placements on sq and stack_moves[sq] one
+        # (target, moves by count) pair per direction. The search writes them
+        # into one reusable buffer per ply (see move_buffer).
+        self.neighbours: List[int] = []
+        self.place_moves: List[Tuple[int, int]] = []
+        self.stack_moves: List[List[Tuple[int, List[int]]]] = []
+        for x in range(grid_columns):
+            for y in range(grid_rows):
+                sq = x * grid_rows + y
+                mask = 0
+                targets = []
+                for direction in ["up", "down", "left", "right"]:
+                    nx, ny = self.calculate_new_position(x, y, direction)
+                    if self.is_within_bounds(nx, ny):
+                        to_sq = nx * grid_rows + ny
+                        mask |= 1 << to_sq
+                        by_count = [None] + [
+                            pack_move(sq, to_sq, count, MOVE_STACK)
+                            for count in range(1, max_height + 1)
+                        ]
+                        targets.append((to_sq, by_count))
+                self.neighbours.append(mask)
+                self.place_moves.append(
+                    (pack_move(sq), pack_move(sq, move_type=MOVE_PLACE_STANDING))
+                )
+                self.stack_moves.append(targets)
+        squares = grid_rows * grid_columns
+        # square masks for the flood fills of the evaluation and the road
+        # threat search, like BitBoard's
+        self.full_mask = (1 << squares) - 1
+        edge_y0 = edge_y_last = edge_x0 = edge_x_last = 0
+        for sq in range(squares):
+            x, y = divmod(sq, grid_rows)
+            if y == 0:
+                edge_y0 |= 1 << sq
+            if y == grid_rows - 1:
+                edge_y_last |= 1 << sq
+            if x == 0:
+                edge_x0 |= 1 << sq
+            if x == grid_columns - 1:
+                edge_x_last |= 1 << sq
+        self.road_edges = ((edge_y0, edge_y_last), (edge_x0, edge_x_last))
+        self.edge_mask = edge_y0 | edge_y_last | edge_x0 | edge_x_last
+        self.not_y0 = self.full_mask & ~edge_y0
+        self.not_y_last = self.full_mask & ~edge_y_last
+        self.column_starts = edge_y0  # the y == 0 square of every column
+        self.buffer_size = squares * (2 + 4 * max_height)  # most moves a position can have
+        self.move_buffers: List[List[int]] = []
+        self.move_list = [0] * self.buffer_size  # scratch buffer for legal_moves
+        # workers > 1 spreads the root moves over a process pool (see
+        # search_root_parallel); the pool starts on first use, close() stops it
+        self.workers = workers
+        self.tt_memory_mb = tt_memory_mb
+        self.pool: ProcessPoolExecutor = None
+        self.shared_alpha = None
+        # Set when a parallel search ends early; worker searches then unwind
+        self.shared_stop = None
+        self.engine = engine
+        self.mcts = None
+        if engine == Engine.MCTS:
+            from mcts import MCTS  # mcts imports this module
+
+            if playouts is None and time_limit_ms is None:
+                playouts = playout_mapping[difficulty]
+            self.mcts = MCTS(self, playouts=playouts, time_limit_ms=time_limit_ms)
+        # opening_book is an OpeningBook or the path of a book file (see
+        # opening_book.py); its moves are played without searching
+        self.book = None
+        self.book_hits = 0
+        if opening_book is not None:
+            from opening_book import OpeningBook  # opening_book imports this module
+
+            if not isinstance(opening_book, OpeningBook):
+                opening_book = OpeningBook(opening_book)
+            if opening_book.size != grid_columns:
+                raise ValueError(f"opening book is for {opening_book.size}x{opening_book.size} boards")
+            self.book = opening_book
 
     def get_best_move(self, game_state: GameState) -> Move:
-        all_moves = self.generate_all_moves(game_state, self.player)
+        move = self.find_best_move(game_state)
+        return None if move is None else self.decode_move(move, self.player)
+
+    def analyze(self, game_state: GameState) -> SearchStats:
+        """get_best_move, instrumented: the SearchStats of the search, with the
+        move in stats.move."""
+        instrument, self.instrument = self.instrument, True
+        try:
+            self.find_best_move(game_state)
+        finally:
+            self.instrument = instrument
+        return self.stats
+
+    def reset_counters(self) -> None:
+        self.nodes = 0
+        self.qnodes = 0
+        self.pvs_researches = 0
+        self.aspiration_researches = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+
+    @property
+    def principal_variation(self) -> List[Move]:
+        """self.pv as Move objects, starting with our move."""
+        players = (self.player, self.opponent)
+        return [self.decode_move(move, players[i & 1]) for i, move in enumerate(self.pv)]
+
+    def find_best_move(self, game_state: GameState) -> int:
+        """get_best_move, returning the packed move."""
+        if self.instrument:
+            return self.instrumented_search(game_state)
+        return self.search(game_state)
+
+    def instrumented_search(self, game_state: GameState) -> int:
+        """search() with move generation, win checks and evaluation timed.
+
+        The timing wrappers shadow those methods on this AI and on the board
+        for the length of the search, so an AI that is not instrumented runs
+        the plain methods.
+        """
+        stats = SearchStats()
+        clock = time.perf_counter
+        totals = [0.0, 0.0, 0.0, 0]  # movegen, win check, eval time, evals
+        generate_moves = self.generate_moves
+        evaluate = self.evaluate
+        board = game_state.board
+        check_winner = board.check_winner
+
+        def timed_generate_moves(state, player, buffer):
+            start = clock()
+            count = generate_moves(state, player, buffer)
+            totals[0] += clock() - start
+            return count
+
+        def timed_check_winner(turn, max_turn):
+            start = clock()
+            winner = check_winner(turn, max_turn)
+            totals[1] += clock() - start
+            return winner
+
+        def timed_evaluate(state):
+            start = clock()
+            score = evaluate(state)
+            totals[2] += clock() - start
+            totals[3] += 1
+            return score
+
+        self.generate_moves = timed_generate_moves
+        self.evaluate = timed_evaluate
+        board.check_winner = timed_check_winner
+        start = clock()
+        try:
+            move = self.search(game_state)
+        finally:
+            stats.time = clock() - start
+            del self.generate_moves, self.evaluate, board.check_winner
+        stats.movegen_time, stats.win_check_time, stats.eval_time, stats.leaf_evals = totals
+        stats.move = None if move is None else self.decode_move(move, self.player)
+        if move is not None and self.pv[:1] == [move]:
+            stats.pv = self.principal_variation
+        stats.depth = self.completed_depth
+        for name in (
+            "nodes",
+            "qnodes",
+            "cutoffs",
+            "first_move_cutoffs",
+            "tt_probes",
+            "tt_hits",
+            "pvs_researches",
+            "aspiration_researches",
+        ):
+            setattr(stats, name, getattr(self, name))
+        self.stats = stats
+        if self.on_search is not None:
+            self.on_search(stats)
+        return move
+
+    def search(self, game_state: GameState) -> int:
+        """find_best_move without instrumentation."""
+        self.stopped = False
+        all_moves = self.legal_moves(game_state, self.player)
         if self.difficulty == Difficulty.EASY:
+            self.reset_counters()
+            self.pv = []
+            self.completed_depth = 0
             return random.choice(all_moves)
+        if self.book is not None:
+            move = self.book.probe(game_state)
+            if move in all_moves:  # also guards against hash collisions
+                self.book_hits += 1
+                self.reset_counters()
+                self.pv = [move]
+                return move
+        self.reset_counters()
+        if self.mcts is not None:
+            return self.mcts.get_best_move(game_state)
+        if self.tt is not None:
+            self.tt.new_search()
+            entry = self.tt.probe(game_state.hash)
+            if entry is not None:
+                self.put_first(all_moves, len(all_moves), entry[4])
+        self.age_heuristics(game_state.turn)
+        self.root_turn = game_state.turn
+        self.timed_out = False
+        self.deadline = None
+        if self.time_limit_ms is None:
+            self.pv = []
+            best_score, best_move, _ = self.search_root(
+                game_state, all_moves, self.max_depth
+            )
+            # a stopped search has no finished depth, its move may be None
+            self.completed_depth = 0 if self.timed_out else self.max_depth
+            return best_move
+        return self.iterative_deepening(game_state, all_moves)
+
+    def iterative_deepening(self, game_state: GameState, all_moves: List[int]) -> int:
+        """Search depth 1, 2, 3... until the time limit, keeping the last full result.
+
+        From depth 3 on each depth is first searched with an aspiration window
+        of ASPIRATION_WINDOW around the score of two depths before: scores
+        swing between odd and even depths, as the last ply is ours or theirs.
+        If the best score falls outside the window, that side is opened up and
+        the depth searched again, counted in aspiration_researches.
+        """
+        start = time.perf_counter()
+        budget = self.time_limit_ms / 1000.0
+        max_depth = max(1, game_state.max_turn - game_state.turn)
+        if self.depth_limit is not None:
+            max_depth = min(max_depth, self.depth_limit)
+        self.pv = []
+        self.completed_depth = 0
+        best_move = all_moves[0]
+        depth_scores = []  # best score of each finished depth
+        depth = 1
+        while depth <= max_depth:
+            iteration_start = time.perf_counter()
+            # depth 1 always runs to completion (unless stopped) so there is a
+            # move to return
+            self.deadline = start + budget if depth > 1 else None
+            alpha, beta = -math.inf, math.inf
+            # (search_root_parallel always searches the full window)
+            if depth > 2 and self.workers <= 1:
+                alpha = depth_scores[-2] - ASPIRATION_WINDOW
+                beta = depth_scores[-2] + ASPIRATION_WINDOW
+            while True:
+                best_score, move, scores = self.search_root(
+                    game_state, all_moves, depth, alpha, beta
+                )
+                if self.timed_out or alpha < best_score < beta:
+                    break
+                self.aspiration_researches += 1
+                if best_score <= alpha:
+                    alpha = -math.inf
+                else:
+                    beta = math.inf
+            if self.timed_out:
+                break
+            best_move = move
+            self.completed_depth = depth
+            depth_scores.append(best_score)
+            if abs(best_score) >= 1000:
+                break  # forced result, deeper search cannot change it
+            # order the next iteration by this one: best move first, then by score
+            order = dict(scores)
+            all_moves.sort(key=lambda m: -order.get(m, -math.inf))
+            now = time.perf_counter()
+            if now - start + (now - iteration_start) > budget:
+                break  # the next iteration would not finish in time
+            depth += 1
+        self.deadline = None
+        return best_move
+
+    def search_root(
+        self,
+        game_state: GameState,
+        all_moves: List[int],
+        depth: int,
+        alpha: float = -math.inf,
+        beta: float = math.inf,
+    ):
+        """Search every root move to `depth`. Returns (best score, best move, [(move, score)]).
+
+        Like negamax, the first move gets the (alpha, beta) window and the
+        others a null window above the best score so far, so only moves that
+        beat it get an exact score. A best score outside (alpha, beta) is only
+        a bound, and the search stops at the first move that reaches beta.
+        """
+        if self.workers > 1 and depth > 1 and len(all_moves) > 1:
+            return self.search_root_parallel(game_state, all_moves, depth)
+        self.pv_table = [[] for _ in range(depth + 1)]
         best_score = -math.inf
         best_move = None
+        scores = []
         for move in all_moves:
-            game_state.apply_move(move, self.player)
-            score = self.minimax(
-                game_state,
-                self.max_depth - 1,
-                False,
-                -math.inf,
-                math.inf,
-                game_state.turn,
-                game_state.max_turn,
-            )
-            game_state.undo_move(move, self.player)
+            game_state.apply_packed(move, self.player)
+            floor = max(alpha, best_score)
+            if best_move is not None and beta - floor > EVAL_GRAIN:
+                score = -self.negamax(
+                    game_state, depth - 1, -floor - EVAL_GRAIN / 2, -floor, self.opponent
+                )
+                if floor < score < beta and not self.timed_out:
+                    self.pvs_researches += 1
+                    score = -self.negamax(game_state, depth - 1, -beta, -floor, self.opponent)
+            else:
+                score = -self.negamax(game_state, depth - 1, -beta, -floor, self.opponent)
+            game_state.undo_packed(move, self.player)
+            if self.timed_out:
+                return best_score, best_move, scores
+            scores.append((move, score))
             if score > best_score:
                 best_score = score
                 best_move = move
-        return best_move
+                self.pv_table[0] = [move] + self.pv_table[1]
+            if best_score >= beta:
+                break
+        self.pv = self.pv_table[0]
+        if self.tt is not None:
+            if best_score <= alpha:
+                bound = Bound.UPPER
+            elif best_score >= beta:
+                bound = Bound.LOWER
+            else:
+                bound = Bound.EXACT
+            self.tt.store(game_state.hash, depth, best_score, bound, best_move)
+        return best_score, best_move, scores
+
+    def search_root_parallel(
+        self, game_state: GameState, all_moves: List[int], depth: int
+    ):
+        """search_root with the root moves shared out to worker processes.
+
+        The first (best ordered) move is searched here to get a bound, then the
+        others go to the pool as GameState snapshots. Workers share the best
+        score found so far through shared memory and search just below it, so
+        every move that could be best gets its exact score. The best move is
+        then the first one in root order with the top score, the same move the
+        serial search picks.
+        """
+        self.pv_table = [[] for _ in range(depth + 1)]
+        first = all_moves[0]
+        game_state.apply_packed(first, self.player)
+        first_score = self.minimax(
+            game_state,
+            depth - 1,
+            False,
+            -math.inf,
+            math.inf,
+            game_state.turn,
+            game_state.max_turn,
+        )
+        game_state.undo_packed(first, self.player)
+        if self.timed_out:
+            return -math.inf, None, []
+        results = [(first_score, [first] + self.pv_table[1])]
+
+        pool = self.get_pool()
+        self.shared_alpha.value = first_score
+        self.shared_stop.value = 0
+        snapshot = game_state.snapshot()
+        # Wall-clock time, the same in every process. Each worker search
+        # converts it to its own perf_counter deadline when it starts.
+        deadline = None
+        if self.deadline is not None:
+            deadline = time.time() + (self.deadline - time.perf_counter())
+        futures = [
+            pool.submit(_search_root_move, snapshot, self.player, move, depth, deadline)
+            for move in all_moves[1:]
+        ]
+        # Wait in short steps so that the deadline, the node limit and stop()
+        # end the search here too: the queued moves are cancelled, the running
+        # ones see shared_stop and return None.
+        pending = set(futures)
+        while pending:
+            _, pending = wait(pending, timeout=0.01, return_when=FIRST_COMPLETED)
+            if pending and self.out_of_time():
+                self.shared_stop.value = 1
+                for future in pending:
+                    future.cancel()
+                wait(pending)
+                self.shared_stop.value = 0
+                self.timed_out = True
+                break
+        for future in futures:
+            result = None if future.cancelled() else future.result()
+            if result is None:
+                self.timed_out = True
+                continue
+            score, pv, nodes, researches = result
+            self.nodes += nodes
+            self.pvs_researches += researches
+            results.append((score, pv))
+        if self.timed_out:
+            return -math.inf, None, []
+
+        best_score = -math.inf
+        best_move = None
+        scores = []
+        for move, (score, pv) in zip(all_moves, results):
+            scores.append((move, score))
+            if score > best_score:
+                best_score = score
+                best_move = move
+                self.pv_table[0] = pv
+        self.pv = self.pv_table[0]
+        if self.tt is not None:
+            self.tt.store(game_state.hash, depth, best_score, Bound.EXACT, best_move)
+        return best_score, best_move, scores
+
+    def out_of_time(self) -> bool:
+        return self.stopped or (self.shared_stop is not None and self.shared_stop.value) or (
+            self.deadline is not None
+            and (time.perf_counter() >= self.deadline or self.nodes >= self.node_limit)
+        )
+
+    def stop(self) -> None:
+        """Ask a search running on another thread to give up soon.
+
+        get_best_move then returns whatever it has, possibly None.
+        """
+        self.stopped = True
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        if self.pool is None:
+            self.shared_alpha = multiprocessing.Value("d", -math.inf)
+            self.shared_stop = multiprocessing.Value("b", 0)
+            config = dict(
+                difficulty=self.difficulty,
+                player=self.player,
+                grid_rows=self.rows,
+                grid_columns=self.columns,
+                max_height=self.max_height,
+                tt_memory_mb=self.tt_memory_mb / self.workers,
+                move_ordering=self.move_ordering,
+                quiescence=self.quiescence,
+            )
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(config, self.shared_alpha, self.shared_stop),
+            )
+        return self.pool
+
+    def close(self) -> None:
+        """Stop the worker processes of the parallel search, if any."""
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    def reset(self) -> None:
+        """Forget everything learned from earlier searches, for a new game."""
+        if self.tt is not None:
+            self.tt.clear()
+        self.killers = []
+        self.history = {}
+        self.pv = []
+        self.root_turn = 0
+        self.completed_depth = 0
+        if self.mcts is not None:
+            self.mcts.root = None
+
+    def age_heuristics(self, turn: int) -> None:
+        """Carry killers and history over to a new search from `turn`."""
+        advanced = turn - self.root_turn
+        if 0 < advanced:
+            self.killers = self.killers[advanced:]
+        elif advanced < 0:
+            self.killers = []
+        for key in list(self.history):
+            self.history[key] >>= 1
+            if not self.history[key]:
+                del self.history[key]
+
+    def order_moves(
+        self,
+        game_state: GameState,
+        moves: List[int],
+        count: int,
+        player: Color,
+        ply: int,
+        tt_move: int,
+        pv_move: int,
+    ) -> List[int]:
+        """The first `count` entries of `moves`, best first."""
+        board = game_state.board
+        own_flats = board.flats[player.value]
+        opp_flats = board.flats[1 - player.value]
+        own_walls = board.walls[player.value]
+        heights = board.heights
+        neighbours = self.neighbours
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        history = self.history
+
+        def score(move: int) -> int:
+            if move == tt_move:
+                return 1000000
+            if move == pv_move:
+                return 900000
+            # gain: change in (our flats - their flats), ignoring what a stack
+            # move uncovers; bonus: neighbouring squares it joins to our roads
+            move_type = move >> 16
+            if move_type != MOVE_STACK:
+                dst = move & 63
+                gain = 1 - move_type  # a standing piece is not a flat
+            else:
+                src = move & 63
+                dst = (move >> 6) & 63
+                gain = 0 if own_walls >> src & 1 else 1
+                if gain and heights[src] == (move >> 12) & 15:
+                    gain = 0  # the flat only changes square
+            if opp_flats >> dst & 1:
+                gain += 1  # capture
+            elif own_flats >> dst & 1:
+                gain -= 1
+            if gain > 0:
+                bonus = (neighbours[dst] & own_flats).bit_count()
+                return 100000 + gain * 10000 + bonus * 1000
+            if move in killers:
+                return 90000 - killers.index(move)
+            return min(history.get(move, 0), 80000) + gain * 100000
+
+        ordered = moves[:count]
+        ordered.sort(key=score, reverse=True)
+        return ordered
+
+    def record_cutoff(self, move: int, ply: int, depth: int) -> None:
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        killers = self.killers[ply]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        self.history[move] = self.history.get(move, 0) + depth * depth
+
+    def put_first(self, moves: List[int], count: int, move: int) -> None:
+        """Move `move` to the front of moves[:count] if it is one of them."""
+        if move is None:
+            return
+        try:
+            index = moves.index(move, 0, count)
+        except ValueError:
+            return
+        moves[1 : index + 1] = moves[:index]
+        moves[0] = move
 
     def minimax(
         self,
@@ -390,133 +1765,416 @@ class AI:
         turn: int,
         max_turn: int,
     ) -> float:
-        winner = game_state.board.check_winner(turn, max_turn)
-        if winner == Winner.BLACK_WIN:
-            if self.player == Color.BLACK:
-                return 1000
-            else:
-                return -1000
-        elif winner == Winner.WHITE_WIN:
-            if self.player == Color.WHITE:
-                return 1000
-            else:
-                return -1000
-        elif winner == Winner.DRAW:
+        """negamax from our side: the score for self.player, with
+        is_maximizing set when we are to move. turn and max_turn are those of
+        game_state."""
+        if is_maximizing:
+            return self.negamax(game_state, depth, alpha, beta, self.player)
+        return -self.negamax(game_state, depth, -beta, -alpha, self.opponent)
+
+    def negamax(
+        self, game_state: GameState, depth: int, alpha: float, beta: float, player: Color
+    ) -> float:
+        """Score game_state for `player`, the side to move, `depth` plies deep.
+
+        Principal variation search: the first move gets the (alpha, beta)
+        window, every later one a null window just above alpha that only
+        proves it is no better. A move that fails high there is searched again
+        with the full window, counted in pvs_researches. Fail-soft: a score
+        outside (alpha, beta) is a bound on the true score, not the window edge.
+        """
+        self.nodes += 1
+        if self.timed_out or (self.nodes & 63 == 0 and self.out_of_time()):
+            self.timed_out = True
             return 0
 
+        ply = game_state.turn - self.root_turn
+        if ply < len(self.pv_table):
+            self.pv_table[ply] = []
+        winner = game_state.board.check_winner(game_state.turn, game_state.max_turn)
+        if winner != Winner.ONGOING:
+            return self.winner_score(winner, player)
+
         if depth == 0:
-            return self.evaluate(game_state)
+            if self.quiescence:
+                return self.quiesce(game_state, player, alpha, beta)
+            score = self.evaluate(game_state)
+            return score if player == self.player else -score
+
+        tt_move = None
+        if self.tt is not None:
+            self.tt_probes += 1
+            entry = self.tt.probe(game_state.hash)
+            if entry is not None:
+                self.tt_hits += 1
+                tt_move = entry[4]
+                if entry[1] >= depth:
+                    score, bound = entry[2], entry[3]
+                    if bound == Bound.EXACT:
+                        return score
+                    if bound == Bound.LOWER:
+                        alpha = max(alpha, score)
+                    else:
+                        beta = min(beta, score)
+                    if beta <= alpha:
+                        return score
+        alpha_orig, beta_orig = alpha, beta
+        best_move = None
+        pv_move = self.pv[ply] if ply < len(self.pv) else None
+
+        # The children of a depth 1 node are scored in the loop below by
+        # leaf_score, without a negamax call each
+        frontier = depth == 1
+        if frontier and ply + 1 < len(self.pv_table):
+            self.pv_table[ply + 1] = []
+
+        other = self.opponent if player == self.player else self.player
+        moves = self.move_buffer(ply)
+        count = self.generate_moves(game_state, player, moves)
+        if self.move_ordering and depth >= 2:
+            moves = self.order_moves(game_state, moves, count, player, ply, tt_move, pv_move)
+        else:
+            self.put_first(moves, count, pv_move)
+            self.put_first(moves, count, tt_move)
+
+        best = -math.inf
+        for i in range(count):
+            move = moves[i]
+            game_state.apply_packed(move, player)
+            if frontier:
+                score = -self.leaf_score(game_state, other, -beta, -alpha)
+            elif i and -math.inf < alpha and beta - alpha > EVAL_GRAIN:
+                # Scores are multiples of EVAL_GRAIN, so half a grain above
+                # alpha tells "better than alpha" from "no better"
+                score = -self.negamax(game_state, depth - 1, -alpha - EVAL_GRAIN / 2, -alpha, other)
+                if alpha < score < beta and not self.timed_out:
+                    self.pvs_researches += 1
+                    score = -self.negamax(game_state, depth - 1, -beta, -alpha, other)
+            else:
+                score = -self.negamax(game_state, depth - 1, -beta, -alpha, other)
+            game_state.undo_packed(move, player)
+            if self.timed_out:
+                return 0
+            if score > best:
+                best = score
+                best_move = move
+                self.update_pv(ply, move)
+            alpha = max(alpha, score)
+            if beta <= alpha:
+                self.cutoffs += 1
+                if not i:
+                    self.first_move_cutoffs += 1
+                if self.move_ordering:
+                    self.record_cutoff(move, ply, depth)
+                break
+
+        if self.tt is not None and best_move is not None:
+            if best <= alpha_orig:
+                bound = Bound.UPPER
+            elif best >= beta_orig:
+                bound = Bound.LOWER
+            else:
+                bound = Bound.EXACT
+            self.tt.store(game_state.hash, depth, best, bound, best_move)
+        return best
 
-        if is_maximizing:
-            max_eval = -math.inf
-            for move in self.generate_all_moves(game_state, self.player):
-                game_state.apply_move(move, self.player)
-                eval = self.minimax(
-                    game_state,
-                    depth - 1,
-                    False,
-                    alpha,
-                    beta,
-                    game_state.turn,
-                    game_state.max_turn,
-                )
-                game_state.undo_move(move, self.player)
-                max_eval = max(max_eval, eval)
-                alpha = max(alpha, eval)
+    def update_pv(self, ply: int, move: int) -> None:
+        if ply + 1 < len(self.pv_table):
+            self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+
+    def winner_score(self, winner: Winner, player: Color = None) -> float:
+        """The result for `player`, by default self.player."""
+        if winner == Winner.DRAW:
+            return 0
+        if player is None:
+            player = self.player
+        won = (winner == Winner.BLACK_WIN) == (player == Color.BLACK)
+        return 1000 if won else -1000
+
+    def leaf_score(
+        self, game_state: GameState, player: Color, alpha: float, beta: float
+    ) -> float:
+        """negamax at depth 0, without an inner node's TT and PV bookkeeping."""
+        self.nodes += 1
+        if self.nodes & 63 == 0 and self.out_of_time():
+            self.timed_out = True
+        winner = game_state.board.check_winner(game_state.turn, game_state.max_turn)
+        if winner != Winner.ONGOING:
+            return self.winner_score(winner, player)
+        if self.quiescence:
+            return self.quiesce(game_state, player, alpha, beta)
+        score = self.evaluate(game_state)
+        return score if player == self.player else -score
+
+    def quiesce(
+        self,
+        game_state: GameState,
+        player: Color,
+        alpha: float,
+        beta: float,
+        qply: int = 0,
+    ) -> float:
+        """Score a horizon position for `player`, the side to move, once its
+        road threats are played out.
+
+        The side to move wins if it can place a flat that completes a road. If
+        instead the other side can, the only moves searched are those that
+        cover a threat square or capture a square of the threatening roads,
+        and with none of them the position is lost. Without threats, or past
+        quiescence_depth plies or quiescence_budget nodes, the position is
+        quiet and evaluate() scores it.
+        """
+        board = game_state.board
+        other = self.opponent if player == self.player else self.player
+        if self.pieces_in_hand(game_state, player) and self.road_threats(board, player)[0]:
+            return 1000
+        threats = 0
+        if self.pieces_in_hand(game_state, other):
+            threats, roads = self.road_threats(board, other)
+        if (
+            not threats
+            or qply >= self.quiescence_depth
+            or self.qnodes >= self.quiescence_budget
+        ):
+            score = self.evaluate(game_state)
+            return score if player == self.player else -score
+
+        targets = threats | roads
+        moves = self.move_buffer(game_state.turn - self.root_turn)
+        count = self.generate_moves(game_state, player, moves)
+        best = -1000
+        for i in range(count):
+            move = moves[i]
+            dst = (move >> 6) & 63 if move >> 16 == MOVE_STACK else move & 63
+            if not targets >> dst & 1:
+                continue
+            self.qnodes += 1
+            game_state.apply_packed(move, player)
+            winner = board.check_winner(game_state.turn, game_state.max_turn)
+            if winner != Winner.ONGOING:
+                score = self.winner_score(winner, player)
+            else:
+                score = -self.quiesce(game_state, other, -beta, -alpha, qply + 1)
+            game_state.undo_packed(move, player)
+            if score > best:
+                best = score
+                alpha = max(alpha, score)
                 if beta <= alpha:
                     break
-            return max_eval
-        else:
-            min_eval = math.inf
-            for move in self.generate_all_moves(game_state, self.opponent):
-                game_state.apply_move(move, self.opponent)
-                eval = self.minimax(
-                    game_state,
-                    depth - 1,
-                    True,
-                    alpha,
-                    beta,
-                    game_state.turn,
-                    game_state.max_turn,
+        return best
+
+    def pieces_in_hand(self, game_state: GameState, player: Color) -> int:
+        return game_state.num_black_piece if player == Color.BLACK else game_state.num_white_piece
+
+    def road_threats(self, board, player: Color) -> Tuple[int, int]:
+        """(threats, roads): the empty squares where a flat of player would
+        complete a road, and player's flats in the groups it would join."""
+        flats = board.flats[player.value]
+        threats = roads = 0
+        rows = self.rows
+        columns = self.columns
+        # a road one square short covers all but one row (or column) already
+        in_rows = 0
+        in_columns = flats
+        for x in range(1, columns):
+            in_rows |= flats >> (x * rows)
+        for y in range(1, rows):
+            in_columns |= flats >> y
+        in_rows = ((in_rows | flats) & ((1 << rows) - 1)).bit_count()
+        in_columns = (in_columns & self.column_starts).bit_count()
+        if in_rows < rows - 1 and in_columns < columns - 1:
+            return threats, roads
+        walls = board.walls
+        full = self.full_mask
+        empty = full & ~(flats | board.flats[1 - player.value] | walls[0] | walls[1])
+        not_y0 = self.not_y0
+        not_y_last = self.not_y_last
+        for (first, last), covered, needed in zip(
+            self.road_edges, (in_rows, in_columns), (rows, columns)
+        ):
+            if covered < needed - 1:
+                continue
+            # flood from each edge through flats, then take the squares next
+            # to the flats reached (or on the edge itself)
+            reached = []
+            near = []
+            for edge in (first, last):
+                reach = flats & edge
+                while True:
+                    grown = (
+                        reach
+                        | ((reach << 1) & not_y0)
+                        | ((reach >> 1) & not_y_last)
+                        | (reach << rows)
+                        | (reach >> rows)
+                    ) & flats
+                    if grown == reach:
+                        break
+                    reach = grown
+                reached.append(reach)
+                near.append(
+                    edge
+                    | ((reach << 1) & not_y0)
+                    | ((reach >> 1) & not_y_last)
+                    | ((reach << rows) & full)
+                    | (reach >> rows)
                 )
-                game_state.undo_move(move, self.opponent)
-                min_eval = min(min_eval, eval)
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break
-            return min_eval
+            found = near[0] & near[1] & empty
+            if found:
+                threats |= found
+                roads |= reached[0] | reached[1]
+        return threats, roads
 
     def evaluate(self, game_state: GameState) -> float:
-        """The number of our flat pieces - number of other player's flat pieces"""
-        own_count = self.count_horizontal_pieces(game_state, self.player)
-        opp_count = self.count_horizontal_pieces(game_state, self.opponent)
-        return own_count - opp_count
+        """Our features minus the opponent's, weighted by EVAL_WEIGHTS.
 
-    def count_horizontal_pieces(self, game_state: GameState, player: Color) -> int:
-        count = 0
+        Same result as comparing features() of both sides, in one pass.
+        """
         board = game_state.board
-        for x in range(board.size):
-            for y in range(board.size):
-                field = board.get_field(x, y)
-                if field and not field.is_empty():
-                    top_piece = field.get_piece(1)[0]
-                    if not top_piece.is_vertical and top_piece.color == player:
-                        count += 1
-        return count
+        me = self.player.value
+        flats = board.flats
+        own_flats = flats[me]
+        opp_flats = flats[1 - me]
+        walls = board.walls
+        own_top = own_flats | walls[me]
+        heights = board.heights
+        # pieces under a top piece, for both sides; 0 until someone stacks
+        buried = sum(heights) - (own_top | opp_flats | walls[1 - me]).bit_count()
+        if buried:
+            own_buried = 0
+            for sq, height in enumerate(heights):
+                if height > 1 and own_top >> sq & 1:
+                    own_buried += height - 1
+            buried = 2 * own_buried - buried
+        reserves = game_state.num_black_piece - game_state.num_white_piece
+        if me:
+            reserves = -reserves
+        edge_mask = self.edge_mask
+        w_flats, w_group, w_edges, w_buried, w_reserves = EVAL_WEIGHTS
+        return (
+            w_flats * (own_flats.bit_count() - opp_flats.bit_count())
+            + w_group * (self.largest_group(own_flats) - self.largest_group(opp_flats))
+            + w_edges * ((own_flats & edge_mask).bit_count() - (opp_flats & edge_mask).bit_count())
+            + w_buried * buried
+            + w_reserves * reserves
+        )
+
+    def features(self, game_state: GameState, player: Color) -> Tuple[int, ...]:
+        """(flats, largest flat group, edge flats, buried pieces, pieces in hand)
+        of player, in the order of EVAL_WEIGHTS. Buried pieces are those under
+        the stacks player controls."""
+        board = game_state.board
+        flats = board.flats[player.value]
+        controlled = flats | board.walls[player.value]
+        buried = 0
+        for sq, height in enumerate(board.heights):
+            if height > 1 and controlled >> sq & 1:
+                buried += height - 1
+        reserves = (
+            game_state.num_black_piece if player == Color.BLACK else game_state.num_white_piece
+        )
+        return (
+            flats.bit_count(),
+            self.largest_group(flats),
+            (flats & self.edge_mask).bit_count(),
+            buried,
+            reserves,
+        )
+
+    def largest_group(self, flats: int) -> int:
+        """Size of the largest orthogonally connected group of squares in flats."""
+        rows = self.rows
+        not_y0 = self.not_y0
+        not_y_last = self.not_y_last
+        largest = 0
+        rest = flats
+        while rest:
+            group = rest & -rest
+            while True:
+                grown = (
+                    group
+                    | ((group << 1) & not_y0)
+                    | ((group >> 1) & not_y_last)
+                    | (group << rows)
+                    | (group >> rows)
+                ) & flats
+                if grown == group:
+                    break
+                group = grown
+            size = group.bit_count()
+            if size > largest:
+                largest = size
+            rest &= ~group
+        return largest
+
+    def count_horizontal_pieces(self, game_state: GameState, player: Color) -> int:
+        return game_state.board.count_flats(player)
 
     def generate_all_moves(self, game_state: GameState, player: Color) -> List[Move]:
-        moves = []
+        return [self.decode_move(move, player) for move in self.legal_moves(game_state, player)]
+
+    def legal_moves(self, game_state: GameState, player: Color) -> List[int]:
+        """The packed moves of generate_all_moves, in the same order."""
+        count = self.generate_moves(game_state, player, self.move_list)
+        return self.move_list[:count]
+
+    def move_buffer(self, ply: int) -> List[int]:
+        buffers = self.move_buffers
+        while len(buffers) <= ply:
+            buffers.append([0] * self.buffer_size)
+        return buffers[ply]
+
+    def generate_moves(self, game_state: GameState, player: Color, buffer: List[int]) -> int:
+        """Write the packed moves of `player` into buffer, return how many."""
         board = game_state.board
+        heights = board.heights
+        max_height = self.max_height
+        walls = board.walls
+        blocked = walls[0] | walls[1]  # nothing goes on top of a standing piece
+        count = 0
 
         # Place
-        for x in range(self.columns):
-            for y in range(self.rows):
-                field = board.get_field(x, y)
-                if not board.is_field_full(x, y, self.max_height):
-                    # cannot place upon vertical
-                    if field.is_empty() or (
-                        field.get_piece_count() > 0
-                        and not field.get_piece(1)[0].is_vertical
-                    ):
-                        # player still has piece
-                        if (
-                            player == Color.BLACK and game_state.num_black_piece > 0
-                        ) or (player == Color.WHITE and game_state.num_white_piece > 0):
-                            # place flat piece
-                            piece = AIPiece(player, is_vertical=False)
-                            move = Move(x, y, True, piece=piece)
-                            moves.append(move)
-                            # place vertical piece
-                            piece = AIPiece(player, is_vertical=True)
-                            move = Move(x, y, True, piece=piece)
-                            moves.append(move)
+        # player still has piece
+        if (player == Color.BLACK and game_state.num_black_piece > 0) or (
+            player == Color.WHITE and game_state.num_white_piece > 0
+        ):
+            for sq, (flat, standing) in enumerate(self.place_moves):
+                if heights[sq] < max_height and not blocked >> sq & 1:
+                    buffer[count] = flat
+                    buffer[count + 1] = standing
+                    count += 2
 
         # Move
-        for x in range(self.columns):
-            for y in range(self.rows):
-                field = board.get_field(x, y)
-                if not field.is_empty():
-                    top_piece = field.get_piece(1)[0]
-                    if top_piece.color.value == player.value:
-                        max_movable = field.get_piece_count()
-                        for count in range(1, max_movable + 1):
-                            for direction in ["up", "down", "left", "right"]:
-                                new_x, new_y = self.calculate_new_position(
-                                    x, y, direction
-                                )
-                                if (
-                                    self.is_within_bounds(new_x, new_y)
-                                    and (
-                                        board.get_field(new_x, new_y).get_piece_count()
-                                        + count
-                                    )
-                                    <= self.max_height
-                                ):
-                                    move = Move(
-                                        x, y, False, to_x=new_x, to_y=new_y, count=count
-                                    )
-                                    moves.append(move)
-        return moves
+        own = board.flats[player.value] | board.walls[player.value]
+        stack_moves = self.stack_moves
+        while own:
+            low = own & -own
+            own ^= low
+            sq = low.bit_length() - 1
+            targets = stack_moves[sq]
+            for moved in range(1, min(heights[sq], max_height) + 1):
+                for to_sq, by_count in targets:
+                    if heights[to_sq] + moved <= max_height and not blocked >> to_sq & 1:
+                        buffer[count] = by_count[moved]
+                        count += 1
+        return count
+
+    def encode_move(self, move: Move) -> int:
+        sq = move.x * self.rows + move.y
+        if move.is_placement:
+            if move.piece.is_vertical:
+                return pack_move(sq, move_type=MOVE_PLACE_STANDING)
+            return pack_move(sq)
+        return pack_move(sq, move.to_x * self.rows + move.to_y, move.count, MOVE_STACK)
+
+    def decode_move(self, move: int, player: Color) -> Move:
+        x, y = divmod(move & 63, self.rows)
+        move_type = move >> 16
+        if move_type == MOVE_STACK:
+            to_x, to_y = divmod((move >> 6) & 63, self.rows)
+            return Move(x, y, False, to_x=to_x, to_y=to_y, count=(move >> 12) & 15)
+        piece = AIPiece(player, is_vertical=move_type == MOVE_PLACE_STANDING)
+        return Move(x, y, True, piece=piece)
 
     def calculate_new_position(self, x: int, y: int, direction: str) -> (int, int):
         if direction == "up":
@@ -532,3 +2190,62 @@ class AI:
 
     def is_within_bounds(self, x: int, y: int) -> bool:
         return 0 <= x < self.columns and 0 <= y < self.rows
+
+
+# Parallel root search workers. Each process keeps one AI (with its own
+# transposition table and move ordering tables) between tasks.
+_worker_ai: AI = None
+_worker_alpha = None
+_worker_state: GameState = None
+_worker_snapshot: tuple = None
+
+
+def _init_worker(config: dict, shared_alpha, shared_stop) -> None:
+    global _worker_ai, _worker_alpha
+    _worker_ai = AI(**config)
+    _worker_ai.shared_stop = shared_stop  # checked by out_of_time
+    _worker_alpha = shared_alpha
+
+
+def _search_root_move(
+    snapshot: tuple, player: Color, move: int, depth: int, deadline: float
+):
+    """Score one root move. Returns (score, pv, nodes, pvs_researches), or None on timeout.
+
+    deadline is time.time() based, or None for no time limit.
+    """
+    global _worker_state, _worker_snapshot
+    ai = _worker_ai
+    if snapshot != _worker_snapshot:
+        _worker_state = GameState.from_snapshot(snapshot)
+        _worker_snapshot = snapshot
+        if ai.tt is not None:
+            ai.tt.new_search()
+        ai.age_heuristics(_worker_state.turn)
+        ai.root_turn = _worker_state.turn
+    game_state = _worker_state
+    ai.reset_counters()
+    ai.timed_out = False
+    ai.deadline = None if deadline is None else time.perf_counter() + (deadline - time.time())
+    ai.pv = []
+    ai.pv_table = [[] for _ in range(depth + 1)]
+    # Scores are multiples of EVAL_GRAIN, so searching half a grain below the
+    # best score so far still gives the exact score of any move that ties with it.
+    alpha = _worker_alpha.value - EVAL_GRAIN / 2
+    game_state.apply_packed(move, player)
+    score = ai.minimax(
+        game_state,
+        depth - 1,
+        False,
+        alpha,
+        math.inf,
+        game_state.turn,
+        game_state.max_turn,
+    )
+    game_state.undo_packed(move, player)
+    if ai.timed_out:
+        return None
+    with _worker_alpha.get_lock():
+        if score > _worker_alpha.value:
+            _worker_alpha.value = score
+    return score, [move] + ai.pv_table[1], ai.nodes, ai.pvs_researches
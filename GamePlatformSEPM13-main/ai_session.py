@@ -0,0 +1,80 @@
+from ai import (
+    AI,
+    BitBoard,
+    Color,
+    GameState,
+    MOVE_PLACE_FLAT,
+    MOVE_PLACE_STANDING,
+    MOVE_STACK,
+    Move,
+    ZOBRIST_SIDE,
+    converter,
+    map_color,
+    pack_move,
+    unpack_pieces,
+)
+from Board import Board
+from Stack import Stack
+
+""" An AI that stays with one game.
+
+session = AISession(AI(difficulty, Color.WHITE, 6, 6), max_turn=200)
+board.add_listener(session)       # every place_piece/move_piece is passed on
+move = session.get_best_move()    # no converter call, search state is kept
+
+The session keeps its own GameState (on a BitBoard) in step with the Board it
+listens to, so each turn costs one incremental move instead of a converter
+rebuild. The AI's transposition table, killer/history tables and MCTS tree
+carry over from turn to turn. Call reset() when a new game starts and listen
+to the new Board.
+"""
+
+
+class AISession:
+    def __init__(self, ai: AI, max_turn: int = 200, pieces_in_hand: int = 21) -> None:
+        self.ai = ai
+        self.max_turn = max_turn
+        self.pieces_in_hand = pieces_in_hand
+        self.game_state: GameState = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Start from an empty board and forget all search state."""
+        self.ai.reset()
+        self.game_state = GameState(
+            BitBoard(self.ai.columns),
+            self.pieces_in_hand,
+            self.pieces_in_hand,
+            turn=0,
+            max_turn=self.max_turn,
+        )
+
+    def sync(self, board: Board, player1, player2, turn: int) -> None:
+        """Rebuild the position with converter, for boards set up out of order.
+
+        Search state is kept; the TT is keyed by position so it stays valid.
+        """
+        self.game_state = converter(
+            board, player1, player2, turn, self.max_turn, self.ai.columns, use_bitboard=True
+        )
+
+    def get_best_move(self) -> Move:
+        return self.ai.get_best_move(self.game_state)
+
+    # Board listener
+
+    def on_place(self, x: int, y: int, place) -> None:
+        if not isinstance(place, Stack):
+            sq = x * self.ai.rows + y
+            move_type = MOVE_PLACE_STANDING if place.standing else MOVE_PLACE_FLAT
+            self.game_state.apply_packed(pack_move(sq, move_type=move_type), map_color(place.color))
+            return
+        # A whole Stack is setup, not a move: no turn passes, nothing leaves a hand
+        board = self.game_state.board
+        board.place_piece(x, y, unpack_pieces(place.packed, place.height))
+        self.game_state.hash = board.zobrist ^ (ZOBRIST_SIDE if self.game_state.turn & 1 else 0)
+
+    def on_move(self, x1: int, y1: int, x2: int, y2: int, count: int) -> None:
+        rows = self.ai.rows
+        move = pack_move(x1 * rows + y1, x2 * rows + y2, count, MOVE_STACK)
+        self.game_state.apply_packed(move, Color.BLACK)  # the colour only matters for placements
@@ -0,0 +1,139 @@
+import threading
+import time
+
+from ai import AI, Difficulty, GameState, Move
+from tracing import Tracer
+
+""" Runs AI.get_best_move on a background thread so the UI keeps drawing.
+
+worker = AIWorker()
+worker.start(ai, game_state)   # returns at once
+...
+move = worker.poll()           # each frame: the Move once it is ready, else None
+worker.cancel()                # on reset/surrender: stop the search, drop its move
+
+The AI and the GameState belong to the worker until the move is polled or the
+turn is cancelled, so don't use them from the UI in the meantime.
+
+Pondering: after the AI's move, worker.ponder(ai, game_state) keeps the AI
+busy on the opponent's time, working on a copy of game_state. Minimax
+searches the position after the reply its principal variation predicts; if
+the next start() is for that position the running search simply becomes the
+turn's search (a ponder hit), often already finished. MCTS grows its tree
+under every reply, and the next search reuses the subtree of the actual one.
+Otherwise start() stops the ponder search first.
+
+AIWorker(tracer) records each search and ponder search as a span on the
+worker thread's row of the tracer's timeline, with its depth and nodes.
+"""
+
+
+class AIWorker:
+    def __init__(self, tracer: Tracer = None) -> None:
+        self.tracer = tracer if tracer is not None else Tracer(enabled=False)
+        self.thread: threading.Thread = None
+        self.ai: AI = None
+        self.move: Move = None
+        self.error: BaseException = None
+        self.done = threading.Event()
+        self.started_at = 0.0
+        self.pondering = False
+        self.pondered: tuple = None  # (hash, turn) the minimax ponder search is for
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+
+    @property
+    def busy(self) -> bool:
+        """True from start() until the move is polled or the turn is cancelled."""
+        return self.thread is not None and not self.pondering
+
+    def thinking_time(self) -> float:
+        """Seconds since the current turn started, 0 when idle."""
+        return time.perf_counter() - self.started_at if self.busy else 0.0
+
+    def start(self, ai: AI, game_state: GameState) -> None:
+        if self.pondering:
+            self.pondering = False
+            pondered, self.pondered = self.pondered, None
+            if pondered == (game_state.hash, game_state.turn) and ai is self.ai:
+                self.ponder_hits += 1
+                self.tracer.instant("ponder hit", "ai")
+                self.started_at = time.perf_counter()
+                return
+            if pondered is not None:
+                self.ponder_misses += 1
+        self.cancel()
+        self._launch(ai, ai.get_best_move, game_state)
+
+    def ponder(self, ai: AI, game_state: GameState) -> None:
+        """Search on the opponent's time; game_state has the opponent to move."""
+        self.cancel()
+        if ai.difficulty == Difficulty.EASY:
+            return
+        state = GameState.from_snapshot(game_state.snapshot())
+        if ai.mcts is not None:
+            self.pondered = None
+            target = ai.mcts.ponder
+        else:
+            if len(ai.pv) < 2:
+                return
+            reply = ai.pv[1]
+            if reply not in ai.legal_moves(state, ai.opponent):
+                return
+            state.apply_packed(reply, ai.opponent)
+            self.pondered = (state.hash, state.turn)
+            target = ai.get_best_move
+        self._launch(ai, target, state, "ponder")
+        self.pondering = True
+
+    def _launch(self, ai: AI, target, game_state: GameState, name: str = "search") -> None:
+        self.ai = ai
+        self.move = None
+        self.error = None
+        self.done = threading.Event()
+        ai.stopped = False
+        self.started_at = time.perf_counter()
+        self.thread = threading.Thread(
+            target=self._run, args=(ai, target, game_state, self.done, name), daemon=True
+        )
+        self.thread.start()
+
+    def _run(self, ai: AI, target, game_state: GameState, done: threading.Event, name: str) -> None:
+        try:
+            with self.tracer.span(name, "ai", turn=game_state.turn) as args:
+                self.move = target(game_state)
+                args.update(depth=ai.completed_depth, nodes=ai.nodes, stopped=ai.stopped)
+        except BaseException as error:  # handed to the UI thread by poll()
+            self.error = error
+        finally:
+            done.set()
+
+    def poll(self) -> Move:
+        """The AI's move if the search has finished, else None. Returns it only once."""
+        if self.thread is None or self.pondering or not self.done.is_set():
+            return None
+        self.thread.join()
+        self.thread = None
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        return self.move
+
+    def wait(self, timeout: float = None) -> Move:
+        """Block until the move is ready (or timeout seconds pass), then poll()."""
+        self.done.wait(timeout)
+        return self.poll()
+
+    def cancel(self) -> None:
+        """Stop the running search or ponder search, if any, and forget its move."""
+        self.pondering = False
+        if self.thread is None:
+            return
+        # the search notices stop() within a few dozen nodes; it is repeated
+        # in case the search had not started yet, as search() clears it
+        while self.thread.is_alive():
+            self.ai.stop()
+            self.thread.join(0.05)
+        self.thread = None
+        self.move = None
+        self.error = None
@@ -0,0 +1,285 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from ai import AI, Color, Difficulty, converter
+from Board import Board
+from Piece import Piece
+from Player import Player
+
+""" Benchmarks for the AI on a fixed set of 6x6 positions.
+
+python benchmark.py                          # JSON report on stdout
+python benchmark.py --output new.json --compare old.json
+
+Every benchmark runs on each group of CORPUS (opening, midgame, endgame) and
+reports operations per second and the peak memory allocated by one pass over
+the group. get_best_move also reports nodes per second and milliseconds per
+move. --compare prints new/old ratios of ops_per_sec against an earlier report
+(above 1 is faster).
+"""
+
+# Rows are y = 0..5, cells x = 0..5. A cell lists its stack bottom to top:
+# b/w a flat black/white piece, B/W a standing one, "." an empty square.
+# Black is to move in every position.
+CORPUS: Dict[str, List[dict]] = {
+    "opening": [
+        dict(
+            rows=[
+                ". . . . B .",
+                ". . . . . .",
+                ". . . . . .",
+                "B . . . W .",
+                ". . . . . .",
+                ". . W . . w",
+            ],
+            black=19, white=18, turn=6,
+        ),
+        dict(
+            rows=[
+                ". . . . . W",
+                ". W . . . .",
+                ". B . . . .",
+                ". . . . . B",
+                "w . . . . .",
+                ". . b . . .",
+            ],
+            black=18, white=18, turn=6,
+        ),
+        dict(
+            rows=[
+                ". W B . . .",
+                ". b . . w .",
+                ". . . . . .",
+                "B . . . . .",
+                ". . . W . .",
+                ". . . . . .",
+            ],
+            black=18, white=18, turn=6,
+        ),
+    ],
+    "midgame": [
+        dict(
+            rows=[
+                ". . w . B B",
+                ". ww . . . .",
+                ". . B . W w",
+                "B B . wb . .",
+                ". B . w W .",
+                "B . W . B wB",
+            ],
+            black=11, white=11, turn=24,
+        ),
+        dict(
+            rows=[
+                "w w . . . W",
+                "W W . . w .",
+                "B B . ww . W",
+                "w B b . B B",
+                "w . . . . .",
+                ". . bB . . bbB",
+            ],
+            black=10, white=10, turn=24,
+        ),
+        dict(
+            rows=[
+                ". W B . . bw",
+                "B b b b w .",
+                "bwB . . . w W",
+                ". . . b . .",
+                ". . W W B .",
+                ". . . . . b",
+            ],
+            black=10, white=13, turn=24,
+        ),
+    ],
+    "endgame": [
+        dict(
+            rows=[
+                "B wW bB B w b",
+                "B WB W w . wb",
+                "w W bww B B W",
+                "W w w B W bW",
+                "W . B B B .",
+                "b B B W w B",
+            ],
+            black=1, white=1, turn=46,
+        ),
+        dict(
+            rows=[
+                "B wB b W b W",
+                "wbW w . B w b",
+                "w bb B bW w bW",
+                "w B w b B b",
+                "B W w . wW b",
+                "b w W W B .",
+            ],
+            black=1, white=1, turn=50,
+        ),
+    ],
+}
+
+BOARD_SIZE = 6
+MAX_MOVES = 200
+
+
+def build_position(position: dict):
+    """The UI Board and Players for a CORPUS entry."""
+    board = Board()
+    for y, row in enumerate(position["rows"]):
+        for x, cell in enumerate(row.split()):
+            if cell == ".":
+                continue
+            for char in cell:
+                color = "black" if char.lower() == "b" else "white"
+                board.place_piece(x, y, Piece(color, standing=char.isupper()))
+    black = Player("black")
+    white = Player("white")
+    black.pieces_in_hand = position["black"]
+    white.pieces_in_hand = position["white"]
+    return board, black, white
+
+
+def game_state(position: dict, use_bitboard: bool):
+    board, black, white = build_position(position)
+    return converter(
+        board, black, white, position["turn"], MAX_MOVES, BOARD_SIZE, use_bitboard=use_bitboard
+    )
+
+
+def measure(run: Callable[[], None], calls: int, min_time: float) -> dict:
+    """Time `run` (which makes `calls` operations) until min_time has passed,
+    then run it once more under tracemalloc for the peak memory."""
+    run()  # warm up
+    repeats = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        run()
+        repeats += 1
+        elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dict(ops_per_sec=repeats * calls / elapsed, peak_kb=peak / 1024)
+
+
+def bench_board_ops(results: dict, group: str, positions: List[dict], min_time: float) -> None:
+    ai = AI(Difficulty.MEDIUM, Color.BLACK, BOARD_SIZE, BOARD_SIZE)
+    for name, use_bitboard in (("aiboard", False), ("bitboard", True)):
+        states = [game_state(position, use_bitboard) for position in positions]
+        count = len(states)
+
+        def check_winner():
+            for state in states:
+                state.board.check_winner(state.turn, state.max_turn)
+
+        def generate_all_moves():
+            for state in states:
+                ai.generate_all_moves(state, Color.BLACK)
+
+        def legal_moves():
+            for state in states:
+                ai.legal_moves(state, Color.BLACK)
+
+        def evaluate():
+            for state in states:
+                ai.evaluate(state)
+
+        for label, run in (
+            ("check_winner", check_winner),
+            ("generate_all_moves", generate_all_moves),
+            ("legal_moves", legal_moves),
+            ("evaluate", evaluate),
+        ):
+            results[f"{label}/{name}/{group}"] = measure(run, count, min_time)
+
+        built = [build_position(position) for position in positions]
+
+        def convert():
+            for (board, black, white), position in zip(built, positions):
+                converter(board, black, white, position["turn"], MAX_MOVES, BOARD_SIZE, use_bitboard)
+
+        results[f"converter/{name}/{group}"] = measure(convert, count, min_time)
+
+
+def bench_search(results: dict, group: str, positions: List[dict]) -> None:
+    """One get_best_move per position and difficulty, each with a fresh AI."""
+    for difficulty in Difficulty:
+        elapsed = 0.0
+        nodes = 0
+        peak = 0
+        for position in positions:
+            state = game_state(position, use_bitboard=True)
+            ai = AI(difficulty, Color.BLACK, BOARD_SIZE, BOARD_SIZE)
+            start = time.perf_counter()
+            ai.get_best_move(state)
+            elapsed += time.perf_counter() - start
+            nodes += ai.nodes
+            ai = AI(difficulty, Color.BLACK, BOARD_SIZE, BOARD_SIZE)
+            tracemalloc.start()
+            ai.get_best_move(state)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        results[f"get_best_move/{difficulty.name.lower()}/{group}"] = dict(
+            ops_per_sec=len(positions) / elapsed,
+            ms_per_move=elapsed * 1000 / len(positions),
+            nodes=nodes,
+            nodes_per_sec=nodes / elapsed,
+            peak_kb=peak / 1024,
+        )
+
+
+def run_benchmarks(min_time: float = 0.2, search: bool = True) -> dict:
+    results = {}
+    for group, positions in CORPUS.items():
+        bench_board_ops(results, group, positions, min_time)
+        if search:
+            bench_search(results, group, positions)
+    return dict(
+        python=sys.version.split()[0],
+        platform=platform.platform(),
+        min_time=min_time,
+        results=results,
+    )
+
+
+def compare(report: dict, baseline: dict) -> Dict[str, float]:
+    """new/old ops_per_sec for every benchmark found in both reports."""
+    old = baseline["results"]
+    return {
+        name: stats["ops_per_sec"] / old[name]["ops_per_sec"]
+        for name, stats in report["results"].items()
+        if name in old and old[name]["ops_per_sec"]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the AI on a fixed set of positions.")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per benchmark")
+    parser.add_argument("--no-search", action="store_true", help="skip get_best_move")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.min_time, search=not args.no_search)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for name, ratio in sorted(compare(report, baseline).items()):
+            print(f"{name:45} {ratio:6.2f}x", file=sys.stderr if not args.output else sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import argparse
+import math
+import sys
+import threading
+import time
+from typing import Dict, List, TextIO
+
+from ai import AI, AIPiece, BitBoard, Color, Difficulty, GameState, Move, Winner, depth_mapping
+from benchmark import game_state as position_state
+
+""" The AI as a long-lived process, driven one line at a time over stdin/stdout.
+
+python engine.py --difficulty hard
+
+Commands, one per line:
+
+newgame [easy|medium|hard]    empty board and fresh AIs, optionally of another difficulty
+position startpos [moves M ...]
+position rows R/R/R/R/R/R black N white N turn T [moves M ...]
+                              set up a position: rows y = 0..5 in the notation of
+                              benchmark.CORPUS, with the cells of a row joined by ","
+move M                        play M for the side to move
+go [depth D] [movetime MS] [nodes N]
+                              search for the side to move in the background, then
+                              answer "info ..." and "bestmove M" ("bestmove none"
+                              when the game is over or there is no move)
+stop                          end the running search now; its bestmove follows
+stats                         "stats name value ..." for the last search and totals
+isready                       answered with "readyok"
+quit
+
+Moves are "x,y" (place a flat piece), "x,ys" (place a standing piece) and
+"x,y>x,y:count" (move count pieces, ":1" may be left out). Black moves on even
+turns. Searches deepen 1, 2, 3... up to depth D, the difficulty's depth for a
+plain "go", or until the movetime or nodes limit; after stop the bestmove is
+that of the last finished depth. A command that cannot
+be carried out is answered with "error ..." and the engine carries on. Only
+stop, stats, isready and quit are taken while a search runs.
+"""
+
+
+def format_move(move: Move) -> str:
+    if move.is_placement:
+        return f"{move.x},{move.y}{'s' if move.piece.is_vertical else ''}"
+    count = f":{move.count}" if move.count != 1 else ""
+    return f"{move.x},{move.y}>{move.to_x},{move.to_y}{count}"
+
+
+def parse_move(text: str, player: Color) -> Move:
+    """The Move written as `text` by player; ValueError if it is not a move."""
+    try:
+        if ">" in text:
+            source, target = text.split(">")
+            target, _, count = target.partition(":")
+            x, y = map(int, source.split(","))
+            to_x, to_y = map(int, target.split(","))
+            return Move(x, y, False, to_x=to_x, to_y=to_y, count=int(count) if count else 1)
+        standing = text.endswith("s")
+        x, y = map(int, text[:-1 if standing else None].split(","))
+        return Move(x, y, True, piece=AIPiece(player, standing))
+    except ValueError:
+        raise ValueError(f"not a move: {text}") from None
+
+
+class Engine:
+    BOARD_SIZE = 6
+    PIECES = 21
+    MAX_TURN = 200
+
+    def __init__(self, difficulty: Difficulty = Difficulty.HARD, output: TextIO = None, **ai_options) -> None:
+        self.output = output if output is not None else sys.stdout
+        self.ai_options = ai_options  # passed on to every AI, e.g. tt_memory_mb
+        self.lock = threading.Lock()  # for output, written by both threads
+        self.thread: threading.Thread = None
+        self.searching: AI = None
+        self.searches = 0
+        self.total_nodes = 0
+        self.last: Dict[str, float] = {}
+        self.new_game(difficulty)
+
+    def send(self, line: str) -> None:
+        with self.lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def new_game(self, difficulty: Difficulty) -> None:
+        self.difficulty = difficulty
+        size = self.BOARD_SIZE
+        self.ais = {color: AI(difficulty, color, size, size, **self.ai_options) for color in Color}
+        self.state = GameState(BitBoard(size), self.PIECES, self.PIECES, turn=0, max_turn=self.MAX_TURN)
+
+    def to_move(self) -> Color:
+        return Color.BLACK if self.state.turn % 2 == 0 else Color.WHITE
+
+    def run(self, lines: TextIO = None) -> None:
+        """Answer commands until quit or the end of the input."""
+        for line in lines if lines is not None else sys.stdin:
+            if not self.handle(line):
+                break
+        self.stop()
+
+    def handle(self, line: str) -> bool:
+        """Carry out one command line. False after quit."""
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        if command == "quit":
+            return False
+        try:
+            if command == "stop":
+                self.stop()
+            elif command == "isready":
+                self.send("readyok")
+            elif command == "stats":
+                self.send("stats " + " ".join(f"{name} {value}" for name, value in self.stats().items()))
+            elif self.busy():
+                raise ValueError(f"searching, {command} has to wait")
+            elif command == "newgame":
+                self.new_game(Difficulty[args[0].upper()] if args else self.difficulty)
+            elif command == "position":
+                self.set_position(args)
+            elif command == "move":
+                if len(args) != 1:
+                    raise ValueError("move takes one move")
+                self.play(args[0])
+            elif command == "go":
+                self.go(args)
+            else:
+                raise ValueError(f"unknown command {command}")
+        except (ValueError, KeyError, IndexError) as error:
+            self.send(f"error {error}")
+        return True
+
+    def set_position(self, args: List[str]) -> None:
+        moves = []
+        if "moves" in args:
+            index = args.index("moves")
+            args, moves = args[:index], args[index + 1 :]
+        if args == ["startpos"]:
+            state = GameState(
+                BitBoard(self.BOARD_SIZE), self.PIECES, self.PIECES, turn=0, max_turn=self.MAX_TURN
+            )
+        elif args and args[0] == "rows" and len(args) == 8:
+            values = dict(zip(args[2::2], args[3::2]))
+            rows = [row.replace(",", " ") for row in args[1].split("/")]
+            if [len(row.split()) for row in rows] != [self.BOARD_SIZE] * self.BOARD_SIZE:
+                raise ValueError(f"rows need {self.BOARD_SIZE} rows of {self.BOARD_SIZE} cells")
+            if set(values) != {"black", "white", "turn"}:
+                raise ValueError("rows need black, white and turn")
+            for cell in " ".join(rows).split():
+                if cell != "." and not set(cell) <= set("bwBW"):
+                    raise ValueError(f"bad cell {cell}, use . or pieces b w B W")
+            position = dict(rows=rows, **{name: int(value) for name, value in values.items()})
+            if position["turn"] < 0:
+                raise ValueError("turn must be 0 or more")
+            for color in ("black", "white"):
+                if not 0 <= position[color] <= self.PIECES:
+                    raise ValueError(f"{color} must be 0 to {self.PIECES} pieces")
+            state = position_state(position, use_bitboard=True)
+        else:
+            raise ValueError("position startpos or position rows ...")
+        previous, self.state = self.state, state
+        try:
+            for move in moves:
+                self.play(move)
+        except ValueError:
+            self.state = previous
+            raise
+
+    def play(self, text: str) -> None:
+        player = self.to_move()
+        move = parse_move(text, player)
+        ai = self.ais[player]
+        if self.state.board.check_winner(self.state.turn, self.state.max_turn) != Winner.ONGOING:
+            raise ValueError("the game is over")
+        if ai.encode_move(move) not in ai.legal_moves(self.state, player):
+            raise ValueError(f"illegal move {text}")
+        self.state.apply_move(move, player)
+
+    def go(self, args: List[str]) -> None:
+        if len(args) % 2:
+            raise ValueError(f"{args[-1]} needs a value")
+        limits = {}
+        for name, value in zip(args[::2], args[1::2]):
+            if name not in ("depth", "movetime", "nodes"):
+                raise ValueError(f"unknown limit {name}")
+            limits[name] = float(value) if name == "movetime" else int(value)
+            if limits[name] <= 0:
+                raise ValueError(f"{name} must be more than 0")
+        ai = self.ais[self.to_move()]
+        # Always iterative deepening, so that a stopped search still answers
+        # with its last finished depth (or the first move, stopped at depth 1)
+        ai.time_limit_ms = limits.get("movetime", math.inf)
+        ai.depth_limit = limits.get("depth")
+        if ai.depth_limit is None and "movetime" not in limits and "nodes" not in limits:
+            ai.depth_limit = depth_mapping[self.difficulty]
+        ai.node_limit = limits.get("nodes", math.inf)
+        ai.stopped = False
+        self.searching = ai
+        self.thread = threading.Thread(target=self._search, args=(ai,), daemon=True)
+        self.thread.start()
+
+    def _search(self, ai: AI) -> None:
+        state = self.state
+        start = time.perf_counter()
+        move = None
+        try:
+            over = state.board.check_winner(state.turn, state.max_turn) != Winner.ONGOING
+            if not over and ai.legal_moves(state, ai.player):
+                move = ai.get_best_move(state)
+        except Exception as error:  # reported, the engine keeps running
+            self.send(f"error {error!r}")
+        elapsed = time.perf_counter() - start
+        self.searches += 1
+        self.total_nodes += ai.nodes
+        self.last = dict(
+            depth=ai.completed_depth,
+            nodes=ai.nodes,
+            qnodes=ai.qnodes,
+            pvs_researches=ai.pvs_researches,
+            aspiration_researches=ai.aspiration_researches,
+            cutoffs=ai.cutoffs,
+            first_move_cutoffs=ai.first_move_cutoffs,
+            tt_probes=ai.tt_probes,
+            tt_hits=ai.tt_hits,
+            time_ms=round(elapsed * 1000),
+            nps=round(ai.nodes / elapsed) if elapsed else 0,
+        )
+        if move is not None:
+            pv = " ".join(format_move(pv_move) for pv_move in ai.principal_variation)
+            self.send(
+                f"info depth {ai.completed_depth} nodes {ai.nodes} time {self.last['time_ms']}"
+                + (f" pv {pv}" if pv else "")
+            )
+        self.searching = None
+        self.send(f"bestmove {format_move(move) if move is not None else 'none'}")
+
+    def busy(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def stop(self) -> None:
+        """Stop the running search, if any, and wait for its bestmove."""
+        if self.thread is None:
+            return
+        ai = self.searching
+        # repeated in case the search had not started yet, as search() clears it
+        while ai is not None and self.thread.is_alive():
+            ai.stop()
+            self.thread.join(0.05)
+        self.thread.join()
+        self.thread = None
+
+    def wait(self, timeout: float = None) -> None:
+        """Block until the running search, if any, has answered."""
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def stats(self) -> Dict[str, float]:
+        return dict(self.last, searches=self.searches, total_nodes=self.total_nodes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the AI as an engine over stdin/stdout.")
+    parser.add_argument("--difficulty", default="hard", choices=["easy", "medium", "hard"])
+    parser.add_argument("--tt", type=float, default=32, help="transposition table size in MB")
+    args = parser.parse_args()
+    Engine(Difficulty[args.difficulty.upper()], tt_memory_mb=args.tt).run()
+
+
+if __name__ == "__main__":
+    main()
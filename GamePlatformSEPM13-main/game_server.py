@@ -0,0 +1,407 @@
+import argparse
+import asyncio
+import collections
+import json
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Deque, Dict, List, Tuple
+
+from ai import AI, BitBoard, Color, Difficulty, GameState, depth_mapping
+from ai_session import AISession
+from Board import Board
+from engine import format_move, parse_move
+from Player import Player
+from selfplay import MAX_MOVES, apply_to_board, game_over, percentile
+
+""" Many games against the AI in one process, over a local socket.
+
+python game_server.py serve --port 7777 --workers 8
+python game_server.py load --port 7777 --games 300   # scripted players, latency report
+
+Every connection is a game session with its own Board and Players, as in UI.py.
+The client plays black and moves first, the AI answers as white. Lines:
+
+client: new [easy|medium|hard]   server: "game <id>", a fresh game
+client: move M                   server: "move M'", the AI's reply, with
+                                 " over <black|white|draw> <reason>" added if
+                                 that ended the game, or just "over ..." if M did
+client: stats                    server: "stats {json}", server wide counters
+client: quit
+
+Moves are written as in engine.py. A move that is not legal gets "error ...",
+and so does any move while the server's AI queue is full ("error busy, retry").
+That backpressure keeps the queue at most max_queue deep.
+
+AI turns run in a process pool of `workers` processes. Each session has at
+most one AI turn queued, and the queue is served in order, so sessions take
+turns. Each AI move has a deadline, move_time_ms after the client's move. The
+search gets the time that is left when it starts. A turn whose deadline passes
+in the queue gets a random legal move instead, counted in "expired".
+"""
+
+MOVE_TIME_MS = 1000
+MAX_QUEUE = 256
+
+
+_worker_ais: Dict[Difficulty, AI] = {}  # per difficulty, in a pool process
+
+
+def _think(snapshot: tuple, difficulty: Difficulty, time_limit_ms: float) -> Tuple[int, int]:
+    """The AI's (packed move, nodes) for white in snapshot, in a pool process."""
+    ai = _worker_ais.get(difficulty)
+    if ai is None:
+        ai = _worker_ais[difficulty] = AI(difficulty, Color.WHITE, 6, 6)
+    # deepen to the difficulty's depth, or less if time runs out
+    ai.time_limit_ms = time_limit_ms
+    ai.depth_limit = depth_mapping[difficulty]
+    move = ai.find_best_move(GameState.from_snapshot(snapshot))
+    return move, ai.nodes
+
+
+class Scheduler:
+    """Runs AI turns in an executor, at most `workers` at a time, first come first served."""
+
+    def __init__(self, executor: Executor, workers: int, max_queue: int = MAX_QUEUE) -> None:
+        self.executor = executor
+        self.max_queue = max_queue
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.tasks = [asyncio.ensure_future(self._dispatch()) for _ in range(workers)]
+        self.running = 0
+        self.nodes = 0
+        self.expired = 0
+        self.late = 0  # AI moves that came back after their deadline
+
+    def full(self) -> bool:
+        return self.queue.qsize() >= self.max_queue
+
+    async def think(self, session: "GameSession", deadline: float) -> int:
+        """The AI's packed move for session, or None if the deadline passes in the queue."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((session.state.snapshot(), session.difficulty, deadline, future))
+        return await future
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            snapshot, difficulty, deadline, future = await self.queue.get()
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                self.expired += 1
+                future.set_result(None)
+                continue
+            self.running += 1
+            try:
+                move, nodes = await loop.run_in_executor(
+                    self.executor, _think, snapshot, difficulty, remaining * 1000
+                )
+            except Exception as error:  # a broken pool fails the turn, not the server
+                if not future.done():
+                    future.set_exception(error)
+                continue
+            finally:
+                self.running -= 1
+            self.nodes += nodes
+            if time.perf_counter() > deadline:
+                self.late += 1
+            if not future.done():
+                future.set_result(move)
+
+    def close(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+
+
+class GameSession:
+    """One game: the UI's Board and Players, and the AI's view of it."""
+
+    def __init__(self, game_id: int, difficulty: Difficulty, max_moves: int = MAX_MOVES) -> None:
+        self.game_id = game_id
+        self.difficulty = difficulty
+        self.max_moves = max_moves
+        self.board = Board()
+        self.players = [Player("black"), Player("white")]
+        self.total_moves = 0
+        # follows the board for move checking and snapshots; no search here
+        self.ai_session = AISession(AI(difficulty, Color.BLACK, 6, 6, tt_memory_mb=0), max_turn=max_moves)
+        self.board.add_listener(self.ai_session)
+        self.result = None
+
+    @property
+    def state(self) -> GameState:
+        return self.ai_session.game_state
+
+    def legal_moves(self, color: Color) -> List[int]:
+        return self.ai_session.ai.legal_moves(self.state, color)
+
+    def play(self, move, color: Color) -> None:
+        """Play a Move for color on the board, if it is legal, and check for the end."""
+        if self.result is not None:
+            raise ValueError("the game is over")
+        if self.ai_session.ai.encode_move(move) not in self.legal_moves(color):
+            raise ValueError(f"illegal move {format_move(move)}")
+        apply_to_board(self.board, self.players[0 if color == Color.BLACK else 1], move)
+        self.total_moves += 1
+        self.result = game_over(self.board, self.players, self.total_moves, self.max_moves)
+
+
+class GameServer:
+    def __init__(
+        self,
+        workers: int = 2,
+        move_time_ms: float = MOVE_TIME_MS,
+        max_queue: int = MAX_QUEUE,
+        executor: Executor = None,
+    ) -> None:
+        self.workers = workers
+        self.move_time_ms = move_time_ms
+        self.max_queue = max_queue
+        self.executor = executor
+        self.own_executor = executor is None
+        self.scheduler: Scheduler = None
+        self.server: asyncio.AbstractServer = None
+        self.sessions: Dict[int, GameSession] = {}
+        self.next_id = 1
+        self.games = 0
+        self.moves = 0
+        self.rejected = 0
+        self.latencies: Deque[float] = collections.deque(maxlen=10000)  # seconds per AI move, latest
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0, path: str = None) -> None:
+        """Listen on host:port (port 0 picks one, see self.port) or on a unix socket path."""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.scheduler = Scheduler(self.executor, self.workers, self.max_queue)
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path=path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+        self.scheduler.close()
+        if self.own_executor:
+            self.executor.shutdown(cancel_futures=True)
+
+    def stats(self) -> dict:
+        latencies = list(self.latencies)
+        return dict(
+            sessions=len(self.sessions),
+            games=self.games,
+            moves=self.moves,
+            queued=self.scheduler.queue.qsize(),
+            running=self.scheduler.running,
+            nodes=self.scheduler.nodes,
+            rejected=self.rejected,
+            expired=self.scheduler.expired,
+            late=self.scheduler.late,
+            latency_ms={
+                name: percentile(latencies, p) * 1000
+                for name, p in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+            },
+        )
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session = None
+
+        async def send(line: str) -> None:
+            writer.write(line.encode() + b"\n")
+            await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                words = line.decode(errors="replace").split()  # bad bytes end up in an error reply
+                if not words:
+                    continue
+                command, args = words[0], words[1:]
+                if command == "quit":
+                    break
+                try:
+                    if command == "new":
+                        difficulty = Difficulty[args[0].upper()] if args else Difficulty.MEDIUM
+                        if session is not None:
+                            del self.sessions[session.game_id]
+                        session = GameSession(self.next_id, difficulty)
+                        self.sessions[session.game_id] = session
+                        self.next_id += 1
+                        self.games += 1
+                        await send(f"game {session.game_id}")
+                    elif command == "stats":
+                        await send("stats " + json.dumps(self.stats()))
+                    elif command == "move":
+                        if session is None:
+                            raise ValueError("no game, send new first")
+                        if len(args) != 1:
+                            raise ValueError("move takes one move")
+                        await send(await self.human_move(session, args[0]))
+                    else:
+                        raise ValueError(f"unknown command {command}")
+                except (ValueError, KeyError) as error:
+                    await send(f"error {error}")
+        except ConnectionError:
+            pass
+        finally:
+            if session is not None:
+                self.sessions.pop(session.game_id, None)
+            writer.close()
+
+    async def human_move(self, session: GameSession, text: str) -> str:
+        """Play the client's move and the AI's answer; the line to send back."""
+        start = time.perf_counter()
+        if self.scheduler.full():
+            self.rejected += 1
+            raise ValueError("busy, retry")
+        session.play(parse_move(text, Color.BLACK), Color.BLACK)
+        self.moves += 1
+        if session.result is not None:
+            return self.over(session)
+        if not session.legal_moves(Color.WHITE):
+            session.result = None, "no_moves"  # a draw, as in selfplay
+            return self.over(session)
+        move = await self.scheduler.think(session, start + self.move_time_ms / 1000)
+        if move is None:
+            move = random.choice(session.legal_moves(Color.WHITE))
+        ai_move = session.ai_session.ai.decode_move(move, Color.WHITE)
+        session.play(ai_move, Color.WHITE)
+        self.moves += 1
+        self.latencies.append(time.perf_counter() - start)
+        reply = f"move {format_move(ai_move)}"
+        if session.result is not None:
+            reply += " " + self.over(session)
+        return reply
+
+    def over(self, session: GameSession) -> str:
+        winner, reason = session.result
+        return f"over {winner or 'draw'} {reason}"
+
+
+async def play_client(
+    host: str, port: int, seed: int, difficulty: str = "easy", max_moves: int = MAX_MOVES
+) -> dict:
+    """One scripted player: random legal moves against the server until the
+    game ends. Returns its move latencies (seconds) and how the game ended."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def ask(line: str) -> str:
+        writer.write(line.encode() + b"\n")
+        await writer.drain()
+        return (await reader.readline()).decode().strip()
+
+    latencies = []
+    busy = 0
+    result = None
+    try:
+        await ask(f"new {difficulty}")
+        # the client's own copy of the game, to pick legal moves from
+        ai = AI(Difficulty.EASY, Color.BLACK, 6, 6, tt_memory_mb=0)
+        state = GameState(BitBoard(6), 21, 21, turn=0, max_turn=max_moves)
+        while result is None:
+            moves = ai.generate_all_moves(state, Color.BLACK)
+            if not moves:
+                result = "no_moves"
+                break
+            move = rng.choice(moves)
+            start = time.perf_counter()
+            reply = await ask(f"move {format_move(move)}")
+            if reply.startswith("error busy"):
+                busy += 1
+                await asyncio.sleep(0.01 * rng.random())
+                continue
+            if reply.startswith("error"):
+                raise RuntimeError(f"server refused {format_move(move)}: {reply}")
+            state.apply_move(move, Color.BLACK)
+            if reply.startswith("over"):
+                result = reply
+                break
+            latencies.append(time.perf_counter() - start)
+            words = reply.split()
+            state.apply_move(parse_move(words[1], Color.WHITE), Color.WHITE)
+            if len(words) > 2:
+                result = " ".join(words[2:])
+    finally:
+        writer.write(b"quit\n")
+        writer.close()
+    return dict(latencies=latencies, busy=busy, result=result)
+
+
+async def run_load(
+    host: str, port: int, games: int = 100, concurrency: int = 100, seed: int = 0, difficulty: str = "easy"
+) -> dict:
+    """Play `games` scripted games, `concurrency` at a time, and summarize the
+    move latencies the clients saw."""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> dict:
+        async with limit:
+            return await play_client(host, port, seed + index, difficulty)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one(index) for index in range(games)))
+    wall = time.perf_counter() - start
+    latencies = [latency for result in results for latency in result["latencies"]]
+    return dict(
+        games=games,
+        concurrency=concurrency,
+        wall_time=wall,
+        moves=len(latencies),
+        moves_per_sec=len(latencies) / wall if wall else 0.0,
+        busy=sum(result["busy"] for result in results),
+        latency_ms={
+            name: percentile(latencies, p) * 1000
+            for name, p in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+        },
+    )
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = GameServer(args.workers, args.move_time, args.max_queue)
+    await server.start(args.host, args.port, args.unix)
+    print(f"listening on {args.unix or f'{args.host}:{server.port}'}")
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve games against the AI, or load test a server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=7777)
+    serve_parser.add_argument("--unix", help="listen on this unix socket instead")
+    serve_parser.add_argument("--workers", type=int, default=2, help="AI processes")
+    serve_parser.add_argument("--move-time", type=float, default=MOVE_TIME_MS, help="AI move deadline in ms")
+    serve_parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="queued AI turns before clients get busy")
+    load_parser = commands.add_parser("load")
+    load_parser.add_argument("--host", default="127.0.0.1")
+    load_parser.add_argument("--port", type=int, default=7777)
+    load_parser.add_argument("--games", type=int, default=100)
+    load_parser.add_argument("--concurrency", type=int, default=100, help="games at once")
+    load_parser.add_argument("--difficulty", default="easy", choices=["easy", "medium", "hard"])
+    load_parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return
+    report = asyncio.run(
+        run_load(args.host, args.port, args.games, args.concurrency, args.seed, args.difficulty)
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
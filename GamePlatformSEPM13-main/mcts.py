@@ -0,0 +1,210 @@
+import math
+import random
+import time
+from typing import List
+
+from ai import AI, Color, GameState, Winner
+
+""" Monte Carlo Tree Search (UCT) backend for ai.AI.
+
+Used through the normal AI API:
+ai = AI(difficulty, player, rows, columns, engine=Engine.MCTS, playouts=2000)
+or with time_limit_ms=... instead of playouts. Keep the same AI object for the
+whole game so the search tree is carried over from one move to the next.
+"""
+
+EXPLORATION = math.sqrt(2)
+ROLLOUT_LIMIT = 60  # plies per playout before the flat count decides
+PONDER_PLAYOUTS = 50000  # most playouts ponder() adds, to bound the tree size
+
+
+class Node:
+    __slots__ = ("move", "parent", "player", "hash", "children", "untried", "visits", "wins")
+
+    def __init__(self, move: int, parent: "Node", player: Color, hash: int) -> None:
+        self.move = move  # packed move that led here from parent
+        self.parent = parent
+        self.player = player  # side to move in this position
+        self.hash = hash  # GameState.hash of this position
+        self.children: List[Node] = []
+        self.untried: List[int] = None  # generated on first visit
+        self.visits = 0
+        self.wins = 0.0  # for the player who played self.move
+
+
+def other(color: Color) -> Color:
+    return Color.WHITE if color == Color.BLACK else Color.BLACK
+
+
+class MCTS:
+    def __init__(self, ai: AI, playouts: int = None, time_limit_ms: float = None) -> None:
+        self.ai = ai
+        self.playouts = playouts
+        self.time_limit_ms = time_limit_ms
+        self.root: Node = None
+        self.rng = random.Random()
+        self.reused_visits = 0  # visits inherited from the previous tree
+
+    def get_best_move(self, game_state: GameState) -> int:
+        self.root = self.find_reusable_root(game_state)
+        self.reused_visits = self.root.visits
+        deadline = None
+        if self.time_limit_ms is not None:
+            deadline = time.perf_counter() + self.time_limit_ms / 1000.0
+        playouts = 0
+        while True:
+            if self.playouts is not None and playouts >= self.playouts:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if self.ai.stopped:
+                break
+            self.playout(game_state)
+            playouts += 1
+            if self.root.untried == [] and not self.root.children:
+                break  # no legal moves
+        self.ai.nodes = playouts
+        if not self.root.children:
+            moves = self.ai.legal_moves(game_state, self.ai.player)
+            return moves[0] if moves else None
+        best = max(self.root.children, key=lambda child: child.visits)
+        return best.move
+
+    def ponder(self, game_state: GameState) -> None:
+        """Grow the tree while the opponent (to move in game_state) thinks.
+
+        Runs until ai.stop() or PONDER_PLAYOUTS. The next get_best_move finds
+        the opponent's actual reply among the root's children.
+        """
+        self.root = self.find_reusable_root(game_state, self.ai.opponent)
+        playouts = 0
+        while not self.ai.stopped and playouts < PONDER_PLAYOUTS:
+            self.playout(game_state)
+            playouts += 1
+            if self.root.untried == [] and not self.root.children:
+                break  # no legal moves
+
+    def find_reusable_root(self, game_state: GameState, player: Color = None) -> Node:
+        """The subtree for this position from the last search, or a new root.
+
+        Looks up to two plies below the old root (our move, their reply).
+        `player` is the side to move, the AI by default.
+        """
+        if player is None:
+            player = self.ai.player
+        if self.root is not None:
+            frontier = [self.root]
+            for _ in range(3):
+                for node in frontier:
+                    if node.hash == game_state.hash and node.player == player:
+                        node.parent = None
+                        node.move = None
+                        return node
+                frontier = [child for node in frontier for child in node.children]
+        return Node(None, None, player, game_state.hash)
+
+    def playout(self, game_state: GameState) -> None:
+        """One selection, expansion, rollout and backpropagation pass."""
+        node = self.root
+        path = []
+
+        # Selection
+        while node.untried is not None and not node.untried and node.children:
+            node = self.select_child(node)
+            game_state.apply_packed(node.move, node.parent.player)
+            path.append(node)
+
+        # Expansion
+        winner = game_state.board.check_winner(game_state.turn, game_state.max_turn)
+        if winner == Winner.ONGOING:
+            if node.untried is None:
+                node.untried = self.ai.legal_moves(game_state, node.player)
+                self.rng.shuffle(node.untried)
+            if node.untried:
+                move = node.untried.pop()
+                game_state.apply_packed(move, node.player)
+                child = Node(move, node, other(node.player), game_state.hash)
+                node.children.append(child)
+                node = child
+                path.append(node)
+                winner = self.rollout(game_state, node.player)
+        elif node.untried is None:
+            node.untried = []
+
+        # Backpropagation
+        node.visits += 1
+        node.wins += self.reward(winner, other(node.player))
+        for step in reversed(path):
+            game_state.undo_packed(step.move, step.parent.player)
+            parent = step.parent
+            parent.visits += 1
+            if parent.parent is not None:
+                parent.wins += self.reward(winner, other(parent.player))
+
+    def select_child(self, node: Node) -> Node:
+        log_visits = math.log(node.visits)
+        best = None
+        best_value = -math.inf
+        for child in node.children:
+            value = child.wins / child.visits + EXPLORATION * math.sqrt(
+                log_visits / child.visits
+            )
+            if value > best_value:
+                best_value = value
+                best = child
+        return best
+
+    def reward(self, winner: Winner, player: Color) -> float:
+        if winner == Winner.DRAW or winner == Winner.ONGOING:
+            return 0.5
+        if (winner == Winner.BLACK_WIN) == (player == Color.BLACK):
+            return 1.0
+        return 0.0
+
+    def rollout(self, game_state: GameState, player: Color) -> Winner:
+        """Play random moves to the end (or ROLLOUT_LIMIT), then undo them all."""
+        played = []
+        winner = game_state.board.check_winner(game_state.turn, game_state.max_turn)
+        while winner == Winner.ONGOING and len(played) < ROLLOUT_LIMIT:
+            move = self.random_move(game_state, player)
+            if move is None:
+                break
+            game_state.apply_packed(move, player)
+            played.append((move, player))
+            player = other(player)
+            winner = game_state.board.check_winner(game_state.turn, game_state.max_turn)
+        if winner == Winner.ONGOING:
+            winner = game_state.board.check_draw()  # most flats on top wins
+        for move, mover in reversed(played):
+            game_state.undo_packed(move, mover)
+        return winner
+
+    def random_move(self, game_state: GameState, player: Color) -> int:
+        """Sample a legal move without generating them all.
+
+        Tries random squares: a placement (mostly flat) where allowed, otherwise
+        a stack move from an own square. Falls back to the full move list.
+        """
+        ai = self.ai
+        board = game_state.board
+        rng = self.rng
+        heights = board.heights
+        max_height = ai.max_height
+        walls = board.walls
+        blocked = walls[0] | walls[1]
+        own = board.flats[player.value] | walls[player.value]
+        in_hand = (
+            game_state.num_black_piece if player == Color.BLACK else game_state.num_white_piece
+        )
+        for _ in range(8):
+            sq = rng.randrange(len(heights))
+            if in_hand > 0 and rng.random() < 0.8:
+                if heights[sq] < max_height and not blocked >> sq & 1:
+                    return ai.place_moves[sq][1 if rng.random() < 0.15 else 0]
+            elif own >> sq & 1:
+                to_sq, by_count = rng.choice(ai.stack_moves[sq])
+                count = rng.randint(1, heights[sq])
+                if heights[to_sq] + count <= max_height and not blocked >> to_sq & 1:
+                    return by_count[count]
+        moves = ai.legal_moves(game_state, player)
+        return rng.choice(moves) if moves else None
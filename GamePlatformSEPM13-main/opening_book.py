@@ -0,0 +1,166 @@
+import argparse
+import mmap
+import struct
+import sys
+import time
+from typing import Dict, Tuple
+
+from ai import AI, BitBoard, Color, Difficulty, GameState, inverse_symmetry, transform_packed
+
+""" Opening book: the AI's moves for the first plies, looked up instead of searched.
+
+Build one offline (this runs a full search per position, so it takes a while):
+python opening_book.py --plies 4 --depth 3 --output opening_book.bin
+
+Then give it to the AI, which answers book positions without searching:
+ai = AI(Difficulty.HARD, Color.WHITE, 6, 6, opening_book="opening_book.bin")
+
+The book holds every position the AI can meet in its first plies when it plays
+its own book moves, for either colour, against any opponent moves. Positions are
+keyed by GameState.canonical(), so rotations and reflections of a position share
+one record, whose move is stored in the canonical frame. The file is a header
+followed by fixed-size records
+sorted by key. OpeningBook memory-maps it and binary-searches the records, so a
+lookup reads a few pages and the book is never loaded into memory as a whole.
+"""
+
+MAGIC = b"TAKBOOK2"
+HEADER = struct.Struct("<8sHHHHI")  # magic, board size, plies, pieces in hand, unused, record count
+RECORD = struct.Struct("<QII")  # canonical position hash, packed move in the canonical frame, search depth
+
+
+class OpeningBook:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size:
+            raise ValueError(f"{path} is not an opening book")
+        magic, self.size, self.plies, self.pieces, _, self.count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or len(self.map) != HEADER.size + self.count * RECORD.size:
+            raise ValueError(f"{path} is not an opening book")
+
+    def probe(self, game_state: GameState) -> int:
+        """The packed book move for game_state, or None."""
+        if not self.covers(game_state):
+            return None
+        key, symmetry = game_state.canonical()
+        move = self.lookup(key)
+        if move is None:
+            return None
+        return transform_packed(move, inverse_symmetry(symmetry, self.size), self.size)
+
+    def lookup(self, key: int) -> int:
+        """The packed move stored for canonical hash `key`, or None."""
+        data = self.map
+        unpack = RECORD.unpack_from
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) >> 1
+            record_key, move, _ = unpack(data, HEADER.size + middle * RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return move
+        return None
+
+    def covers(self, game_state: GameState) -> bool:
+        """True if the book may hold game_state: one of its first plies, in a game
+        that started with the book's pieces in hand."""
+        in_play = sum(game_state.board.heights) + game_state.num_black_piece + game_state.num_white_piece
+        return game_state.turn < self.plies and in_play == 2 * self.pieces
+
+    def close(self) -> None:
+        self.map.close()
+
+
+def write_book(
+    path: str, entries: Dict[int, Tuple[int, int]], size: int, plies: int, pieces: int
+) -> None:
+    """Write {canonical hash: (move, depth)} as a book file."""
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, size, plies, pieces, 0, len(entries)))
+        for key in sorted(entries):
+            move, depth = entries[key]
+            f.write(RECORD.pack(key, move, depth))
+
+
+def build_book(
+    plies: int = 4,
+    depth: int = 3,
+    time_limit_ms: float = None,
+    size: int = 6,
+    pieces: int = 21,
+    max_turn: int = 200,
+    progress=None,
+) -> Dict[int, Tuple[int, int]]:
+    """Search every book position, returning {canonical hash: (move in the canonical frame, depth)}.
+
+    For each colour, the book side plays its searched move and the other side
+    every legal move, down to `plies` plies from the empty board.
+    """
+    entries: Dict[int, Tuple[int, int]] = {}
+    ais = {}
+    for color in Color:
+        ai = AI(Difficulty.HARD, color, size, size, time_limit_ms=time_limit_ms)
+        ai.max_depth = depth
+        ais[color] = ai
+
+    def walk(state: GameState, book_color: Color) -> None:
+        if state.turn >= plies:
+            return
+        mover = Color.BLACK if state.turn % 2 == 0 else Color.WHITE
+        ai = ais[mover]
+        if mover == book_color:
+            key, symmetry = state.canonical()
+            if key in entries:
+                move = transform_packed(entries[key][0], inverse_symmetry(symmetry, size), size)
+            else:
+                move = ai.find_best_move(state)
+                entries[key] = (transform_packed(move, symmetry, size), ai.completed_depth)
+                if progress is not None:
+                    progress(len(entries))
+            moves = [move]
+        else:
+            moves = ai.legal_moves(state, mover)
+        for move in moves:
+            state.apply_packed(move, mover)
+            walk(state, book_color)
+            state.undo_packed(move, mover)
+
+    for color in Color:
+        walk(GameState(BitBoard(size), pieces, pieces, turn=0, max_turn=max_turn), color)
+    return entries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build an opening book for the AI.")
+    parser.add_argument("--output", default="opening_book.bin")
+    parser.add_argument("--plies", type=int, default=4, help="book moves for turns 0 .. plies-1")
+    parser.add_argument("--depth", type=int, default=3, help="search depth per position")
+    parser.add_argument("--time", type=float, help="search time per position in ms, instead of --depth")
+    parser.add_argument("--size", type=int, default=6)
+    parser.add_argument("--pieces", type=int, default=21, help="pieces in hand at the start")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    def progress(count: int) -> None:
+        print(f"\r{count} positions, {time.perf_counter() - start:.0f}s", end="", file=sys.stderr)
+
+    entries = build_book(
+        plies=args.plies,
+        depth=args.depth,
+        time_limit_ms=args.time,
+        size=args.size,
+        pieces=args.pieces,
+        progress=progress,
+    )
+    write_book(args.output, entries, args.size, args.plies, args.pieces)
+    print(f"\n{len(entries)} positions written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
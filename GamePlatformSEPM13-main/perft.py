@@ -0,0 +1,221 @@
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+from ai import AI, BitBoard, Color, Difficulty, GameState, MOVE_STACK
+from benchmark import BOARD_SIZE, CORPUS, MAX_MOVES, game_state
+
+""" Perft: count the move sequences AI.generate_moves allows, to check and time it.
+
+python perft.py --depth 3                               # every position, nodes/sec
+python perft.py --depth 2 --position midgame/1 --divide  # counts per root move
+python perft.py --depth 4 --workers 8 --check perft_reference.json
+python perft.py --depth 3 --write perft_reference.json
+
+perft(depth) is the number of positions `depth` plies after a position, one
+per legal move sequence. Play does not stop at a road or a full board, so the
+counts only depend on the move generator and apply/undo. A faster generator
+has to give the same counts as perft_reference.json; --divide shows which root
+moves differ.
+
+The positions are the empty board ("start") and benchmark.CORPUS ("opening/0",
+"midgame/1", ...), all with black to move.
+"""
+
+REFERENCE = "perft_reference.json"
+
+
+def positions() -> Dict[str, GameState]:
+    """Every perft position by name, as a BitBoard GameState."""
+    states = {"start": GameState(BitBoard(BOARD_SIZE), 21, 21, turn=0, max_turn=MAX_MOVES)}
+    for group, group_positions in CORPUS.items():
+        for index, position in enumerate(group_positions):
+            states[f"{group}/{index}"] = game_state(position, use_bitboard=True)
+    return states
+
+
+def perft(ai: AI, state: GameState, depth: int, player: Color, ply: int = 0) -> int:
+    """The number of positions `depth` plies after state, with player to move."""
+    if depth == 0:
+        return 1
+    moves = ai.move_buffer(ply)
+    count = ai.generate_moves(state, player, moves)
+    if depth == 1:
+        return count  # the leaves need not be played
+    other = Color.WHITE if player == Color.BLACK else Color.BLACK
+    nodes = 0
+    for i in range(count):
+        move = moves[i]
+        state.apply_packed(move, player)
+        nodes += perft(ai, state, depth - 1, other, ply + 1)
+        state.undo_packed(move, player)
+    return nodes
+
+
+def move_name(ai: AI, move: int, player: Color) -> str:
+    """"x,y flat", "x,y standing" or "x,y>x,y count"."""
+    decoded = ai.decode_move(move, player)
+    if move >> 16 == MOVE_STACK:
+        return f"{decoded.x},{decoded.y}>{decoded.to_x},{decoded.to_y} {decoded.count}"
+    kind = "standing" if decoded.piece.is_vertical else "flat"
+    return f"{decoded.x},{decoded.y} {kind}"
+
+
+_worker_ais: Dict[int, AI] = {}  # per board size, in a pool process
+
+
+def generator(size: int) -> AI:
+    """An AI to generate moves with; its search settings do not matter."""
+    return AI(Difficulty.MEDIUM, Color.BLACK, size, size, tt_memory_mb=0)
+
+
+def _perft_subtree(snapshot: tuple, move: int, depth: int, player: Color) -> int:
+    """perft(depth) after `move`, in a pool process."""
+    state = GameState.from_snapshot(snapshot)
+    size = state.board.size
+    if size not in _worker_ais:
+        _worker_ais[size] = generator(size)
+    state.apply_packed(move, player)
+    other = Color.WHITE if player == Color.BLACK else Color.BLACK
+    return perft(_worker_ais[size], state, depth - 1, other)
+
+
+def divide(
+    state: GameState, depth: int, player: Color, pool: ProcessPoolExecutor = None
+) -> List[Tuple[int, int]]:
+    """[(root move, perft(depth - 1) after it)] in generate_moves order, depth >= 1.
+
+    With a pool the root moves' subtrees are counted in its processes.
+    """
+    ai = generator(state.board.size)
+    moves = ai.legal_moves(state, player)
+    if pool is None:
+        other = Color.WHITE if player == Color.BLACK else Color.BLACK
+        counts = []
+        for move in moves:
+            state.apply_packed(move, player)
+            counts.append(perft(ai, state, depth - 1, other))
+            state.undo_packed(move, player)
+    else:
+        count = len(moves)
+        counts = list(
+            pool.map(_perft_subtree, [state.snapshot()] * count, moves, [depth] * count, [player] * count)
+        )
+    return list(zip(moves, counts))
+
+
+def run_perft(
+    depth: int, names: List[str] = None, workers: int = 0
+) -> Dict[str, dict]:
+    """perft(depth) of the named positions (all by default), with nodes/sec.
+
+    workers > 1 counts the root moves' subtrees in that many processes.
+    """
+    states = positions()
+    if names is None:
+        names = list(states)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    report = {}
+    try:
+        for name in names:
+            state = states[name]
+            start = time.perf_counter()
+            if pool is None:
+                nodes = perft(generator(state.board.size), state, depth, Color.BLACK)
+            else:
+                nodes = sum(count for _, count in divide(state, depth, Color.BLACK, pool))
+            seconds = time.perf_counter() - start
+            report[name] = dict(
+                depth=depth,
+                nodes=nodes,
+                seconds=seconds,
+                nodes_per_sec=nodes / seconds if seconds else 0.0,
+            )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return report
+
+
+def check(report: Dict[str, dict], reference: Dict[str, Dict[str, int]]) -> List[str]:
+    """One message per count in report that differs from reference, which maps
+    position name -> {depth: nodes}. Counts missing from reference are skipped."""
+    errors = []
+    for name, result in report.items():
+        expected = reference.get(name, {}).get(str(result["depth"]))
+        if expected is not None and expected != result["nodes"]:
+            errors.append(
+                f"{name}: perft({result['depth']}) is {result['nodes']}, expected {expected}"
+            )
+    return errors
+
+
+def load_reference(path: str = REFERENCE) -> Dict[str, Dict[str, int]]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count and time the AI's move generator.")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--position", action="append", help="position name, default all")
+    parser.add_argument("--workers", type=int, default=0, help="processes, 0 counts in this one")
+    parser.add_argument("--divide", action="store_true", help="print the count per root move")
+    parser.add_argument("--check", metavar="FILE", help="compare the counts with a reference file")
+    parser.add_argument("--write", metavar="FILE", help="add the counts to a reference file")
+    args = parser.parse_args()
+
+    states = positions()
+    names = args.position or list(states)
+    for name in names:
+        if name not in states:
+            parser.error(f"unknown position {name}, choose from {', '.join(states)}")
+
+    if args.divide:
+        ai = generator(BOARD_SIZE)
+        pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+        try:
+            for name in names:
+                print(name)
+                counts = divide(states[name], args.depth, Color.BLACK, pool)
+                for move, count in counts:
+                    print(f"  {move_name(ai, move, Color.BLACK):16} {count}")
+                print(f"  {'total':16} {sum(count for _, count in counts)}")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return
+
+    report = run_perft(args.depth, names, args.workers)
+    for name, result in report.items():
+        print(
+            f"{name:10} perft({result['depth']}) = {result['nodes']:>10}  "
+            f"{result['seconds']:7.2f}s  {result['nodes_per_sec']:10.0f} nodes/s"
+        )
+    nodes = sum(result["nodes"] for result in report.values())
+    seconds = sum(result["seconds"] for result in report.values())
+    print(f"{'total':10} {nodes:>20}  {seconds:7.2f}s  {nodes / seconds if seconds else 0:10.0f} nodes/s")
+
+    if args.write:
+        try:
+            reference = load_reference(args.write)
+        except FileNotFoundError:
+            reference = {}
+        for name, result in report.items():
+            reference.setdefault(name, {})[str(result["depth"])] = result["nodes"]
+        with open(args.write, "w") as f:
+            json.dump(reference, f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.check:
+        errors = check(report, load_reference(args.check))
+        for error in errors:
+            print(error, file=sys.stderr)
+        if errors:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
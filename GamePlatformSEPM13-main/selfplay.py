@@ -0,0 +1,273 @@
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from ai import AI, Color, Difficulty, Engine
+from ai_session import AISession
+from Board import Board
+from Player import Player
+
+""" Headless AI vs AI matches, no pygame needed.
+
+Games follow the same rules as UI.py: Board/Player do the moves, black starts,
+a road wins, a full board is decided by flat count and MAX_MOVES is a draw.
+
+From the command line:
+python selfplay.py --games 200 --workers 8 --a hard --b medium --b-engine mcts --b-time 300
+
+From Python:
+report = run_match(dict(difficulty=Difficulty.HARD), dict(difficulty=Difficulty.MEDIUM), games=20)
+
+A side is a dict of AI keyword arguments (difficulty, engine, time_limit_ms,
+playouts, tt_memory_mb, ...) plus an optional "depth" that overrides the
+search depth of the difficulty. Sides swap colours every game.
+"""
+
+BOARD_SIZE = 6
+MAX_MOVES = 200
+OPENING_PLIES = 2  # random moves at the start so that games differ
+
+
+def make_ai(side: dict, color: Color, seed: int) -> AI:
+    kwargs = dict(side)
+    depth = kwargs.pop("depth", None)
+    ai = AI(player=color, grid_rows=BOARD_SIZE, grid_columns=BOARD_SIZE, **kwargs)
+    if depth is not None:
+        ai.max_depth = depth
+    if ai.mcts is not None:
+        ai.mcts.rng.seed(seed)
+    return ai
+
+
+def apply_to_board(board: Board, player: Player, move) -> None:
+    """Play an ai.Move on the UI board, like UI.handle_ai_move."""
+    if move.is_placement:
+        board.place_piece(move.x, move.y, player.place_piece(move.piece.is_vertical))
+    else:
+        board.move_piece(move.x, move.y, move.to_x, move.to_y, move.count)
+
+
+def game_over(board: Board, players: List[Player], total_moves: int, max_moves: int):
+    """(winner colour or None, reason), or None while the game goes on. Same order as UI.switch_turns."""
+    for player in players:
+        if board.check_winning_condition(player.color):
+            return player.color, "road"
+    if total_moves >= max_moves:
+        return None, "max_moves"
+    flat_winner = board.check_flat_win_condition()
+    if flat_winner == "Draw":
+        return None, "flat"
+    if flat_winner:
+        return flat_winner, "flat"
+    return None
+
+
+def play_game(
+    black: dict,
+    white: dict,
+    seed: int = 0,
+    opening_plies: int = OPENING_PLIES,
+    max_moves: int = MAX_MOVES,
+) -> dict:
+    """Play one game. Returns the winner ("black", "white" or None), the reason,
+    the number of moves and per side lists of move latencies (seconds) and nodes."""
+    rng = random.Random(seed)
+    random.seed(seed)  # Difficulty.EASY picks with the random module
+    board = Board()
+    players = [Player("black"), Player("white")]
+    ais = [make_ai(black, Color.BLACK, seed), make_ai(white, Color.WHITE, seed + 1)]
+    sessions = [AISession(ai, max_turn=max_moves) for ai in ais]
+    for session in sessions:
+        board.add_listener(session)
+    latencies = {"black": [], "white": []}
+    nodes = {"black": [], "white": []}
+    total_moves = 0
+    result = None
+    try:
+        while result is None:
+            mover = total_moves & 1
+            player, ai = players[mover], ais[mover]
+            game_state = sessions[mover].game_state
+            if total_moves < opening_plies:
+                moves = ai.generate_all_moves(game_state, ai.player)
+                move = rng.choice(moves) if moves else None
+            else:
+                start = time.perf_counter()
+                move = ai.get_best_move(game_state) if ai.legal_moves(game_state, ai.player) else None
+                latencies[player.color].append(time.perf_counter() - start)
+                nodes[player.color].append(ai.nodes)
+            if move is None:
+                result = None, "no_moves"
+                break
+            try:
+                apply_to_board(board, player, move)
+            except (ValueError, IndexError):
+                # the board refused the move, the mover forfeits
+                result = players[1 - mover].color, "illegal"
+                break
+            total_moves += 1
+            result = game_over(board, players, total_moves, max_moves)
+    finally:
+        for ai in ais:
+            ai.close()
+    winner, reason = result
+    return dict(
+        winner=winner,
+        reason=reason,
+        moves=total_moves,
+        latencies=latencies,
+        nodes=nodes,
+    )
+
+
+def _play_pairing(a: dict, b: dict, index: int, seed: int, opening_plies: int, max_moves: int) -> dict:
+    """Game `index` of a match: side a is black in even games, white in odd ones."""
+    a_color = "black" if index % 2 == 0 else "white"
+    black, white = (a, b) if a_color == "black" else (b, a)
+    game = play_game(black, white, seed + index, opening_plies, max_moves)
+    game["a_color"] = a_color
+    return game
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile, 0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(games: List[dict]) -> Dict[str, dict]:
+    """Win/draw rates, game lengths, nodes/sec and latency percentiles per side."""
+    count = len(games)
+    lengths = [game["moves"] for game in games]
+    report = dict(
+        games=count,
+        draws=sum(1 for game in games if game["winner"] is None),
+        reasons={},
+        length=dict(
+            mean=sum(lengths) / count if count else 0.0,
+            min=min(lengths, default=0),
+            max=max(lengths, default=0),
+        ),
+    )
+    for game in games:
+        report["reasons"][game["reason"]] = report["reasons"].get(game["reason"], 0) + 1
+    report["draw_rate"] = report["draws"] / count if count else 0.0
+    for side in ("a", "b"):
+        wins = 0
+        latencies = []
+        nodes = 0
+        for game in games:
+            color = game["a_color"] if side == "a" else other_color(game["a_color"])
+            wins += game["winner"] == color
+            latencies += game["latencies"][color]
+            nodes += sum(game["nodes"][color])
+        search_time = sum(latencies)
+        report[side] = dict(
+            wins=wins,
+            win_rate=wins / count if count else 0.0,
+            moves=len(latencies),
+            nodes=nodes,
+            nodes_per_sec=nodes / search_time if search_time else 0.0,
+            latency_ms={
+                name: percentile(latencies, p) * 1000
+                for name, p in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100))
+            },
+        )
+    return report
+
+
+def other_color(color: str) -> str:
+    return "white" if color == "black" else "black"
+
+
+def run_match(
+    a: dict,
+    b: dict,
+    games: int = 10,
+    workers: int = 0,
+    seed: int = 0,
+    opening_plies: int = OPENING_PLIES,
+    max_moves: int = MAX_MOVES,
+) -> dict:
+    """Play `games` games of side a against side b and summarize them.
+
+    workers > 1 plays games in that many processes at once.
+    """
+    args = [(a, b, index, seed, opening_plies, max_moves) for index in range(games)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_play_pairing, *zip(*args)))
+    else:
+        results = [_play_pairing(*arg) for arg in args]
+    return summarize(results)
+
+
+def side_from_args(args: argparse.Namespace, name: str) -> dict:
+    side = dict(difficulty=Difficulty[getattr(args, name).upper()])
+    engine = getattr(args, f"{name}_engine")
+    side["engine"] = Engine[engine.upper()]
+    for option, key in (
+        ("depth", "depth"),
+        ("time", "time_limit_ms"),
+        ("playouts", "playouts"),
+        ("tt", "tt_memory_mb"),
+    ):
+        value = getattr(args, f"{name}_{option}")
+        if value is not None:
+            side[key] = value
+    return side
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play AI against AI without the UI.")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=0, help="processes, 0 plays in this one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--opening-plies", type=int, default=OPENING_PLIES)
+    parser.add_argument("--max-moves", type=int, default=MAX_MOVES)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    for name in ("a", "b"):
+        parser.add_argument(f"--{name}", default="medium", choices=["easy", "medium", "hard"])
+        parser.add_argument(f"--{name}-engine", default="minimax", choices=["minimax", "mcts"])
+        parser.add_argument(f"--{name}-depth", type=int)
+        parser.add_argument(f"--{name}-time", type=float, help="time limit per move in ms")
+        parser.add_argument(f"--{name}-playouts", type=int)
+        parser.add_argument(f"--{name}-tt", type=float, help="transposition table size in MB")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = run_match(
+        side_from_args(args, "a"),
+        side_from_args(args, "b"),
+        games=args.games,
+        workers=args.workers,
+        seed=args.seed,
+        opening_plies=args.opening_plies,
+        max_moves=args.max_moves,
+    )
+    report["wall_time"] = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{report['games']} games in {report['wall_time']:.1f}s")
+    for side in ("a", "b"):
+        stats = report[side]
+        latency = stats["latency_ms"]
+        print(
+            f"{side}: {stats['wins']} wins ({stats['win_rate']:.1%}), "
+            f"{stats['nodes_per_sec']:.0f} nodes/s, latency p50 {latency['p50']:.1f}ms "
+            f"p90 {latency['p90']:.1f}ms p99 {latency['p99']:.1f}ms max {latency['max']:.1f}ms"
+        )
+    length = report["length"]
+    print(f"draws: {report['draws']} ({report['draw_rate']:.1%}), by reason: {report['reasons']}")
+    print(f"game length: mean {length['mean']:.1f}, min {length['min']}, max {length['max']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import random
+import unittest
+from ai import AI, Color, Difficulty, Engine, converter
+from ai_session import AISession
+from Board import Board
+from Piece import Piece
+from Player import Player
+from Stack import Stack
+from selfplay import apply_to_board
+
+
+def play_random(board, players, session, rng, plies):
+    """Random legal moves on the Board, checking the session after each one."""
+    for turn in range(plies):
+        player = players[turn & 1]
+        color = Color.BLACK if player.color == "black" else Color.WHITE
+        moves = session.ai.generate_all_moves(session.game_state, color)
+        apply_to_board(board, player, rng.choice(moves))
+        yield turn + 1
+
+
+class TestAISession(unittest.TestCase):
+
+    def test_follows_the_board(self):
+        rng = random.Random(4)
+        board = Board()
+        players = [Player("black"), Player("white")]
+        session = AISession(AI(Difficulty.MEDIUM, Color.WHITE, 6, 6))
+        board.add_listener(session)
+        for turn in play_random(board, players, session, rng, 60):
+            expected = converter(board, players[0], players[1], turn, 200, 6, use_bitboard=True)
+            self.assertEqual(session.game_state.snapshot(), expected.snapshot())
+            self.assertEqual(session.game_state.hash, expected.hash)
+
+    def test_stack_setup_is_not_a_turn(self):
+        board = Board()
+        session = AISession(AI(Difficulty.MEDIUM, Color.WHITE, 6, 6))
+        board.add_listener(session)
+        stack = Stack()
+        stack.push(Piece("white"))
+        stack.push(Piece("black", standing=True))
+        board.place_piece(4, 1, stack)
+        expected = converter(board, Player("black"), Player("white"), 0, 200, 6, use_bitboard=True)
+        self.assertEqual(session.game_state.snapshot(), expected.snapshot())
+        self.assertEqual(session.game_state.hash, expected.hash)
+
+    def test_search_state_kept_between_turns_and_reset(self):
+        rng = random.Random(1)
+        board = Board()
+        players = [Player("black"), Player("white")]
+        session = AISession(AI(Difficulty.HARD, Color.WHITE, 6, 6))
+        board.add_listener(session)
+        for turn in play_random(board, players, session, rng, 9):
+            pass
+        session.get_best_move()
+        used = session.ai.tt.used
+        self.assertEqual(session.game_state.max_turn, 200)
+        for turn in play_random(board, players, session, rng, 2):
+            pass
+        session.get_best_move()
+        self.assertGreater(session.ai.tt.used, used)
+        self.assertTrue(session.ai.history)
+        session.reset()
+        self.assertEqual(session.ai.tt.used, 0)
+        self.assertEqual(session.ai.history, {})
+        self.assertEqual(session.game_state.turn, 0)
+        self.assertEqual(session.game_state.board.occupied, 0)
+
+    def test_mcts_tree_kept_between_turns(self):
+        rng = random.Random(2)
+        board = Board()
+        players = [Player("black"), Player("white")]
+        session = AISession(AI(Difficulty.HARD, Color.WHITE, 6, 6, engine=Engine.MCTS, playouts=300))
+        board.add_listener(session)
+        for turn in play_random(board, players, session, rng, 5):
+            pass
+        move = session.get_best_move()
+        apply_to_board(board, players[1], move)
+        played = [c for c in session.ai.mcts.root.children if c.move == session.ai.encode_move(move)][0]
+        reply = max(played.children, key=lambda child: child.visits)
+        apply_to_board(board, players[0], session.ai.decode_move(reply.move, Color.BLACK))
+        session.get_best_move()
+        self.assertIs(session.ai.mcts.root, reply)
+        self.assertGreater(session.ai.mcts.reused_visits, 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,119 @@
+import time
+import unittest
+from ai import AI, Color, Difficulty, Engine
+from ai_worker import AIWorker
+from test_search import midgame_state
+
+
+class TestAIWorker(unittest.TestCase):
+
+    def test_move_arrives_in_background(self):
+        state = midgame_state()
+        worker = AIWorker()
+        worker.start(AI(Difficulty.MEDIUM, Color.BLACK, 6, 6), state)
+        self.assertTrue(worker.busy)
+        move = worker.wait(10)
+        self.assertFalse(worker.busy)
+        expected = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6).get_best_move(midgame_state())
+        self.assertEqual(move, expected)
+        self.assertIsNone(worker.poll())  # handed out only once
+
+    def test_cancel_stops_a_long_search(self):
+        for engine in (Engine.MINIMAX, Engine.MCTS):
+            state = midgame_state()
+            before = state.snapshot()
+            ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, engine=engine, playouts=10 ** 6)
+            ai.max_depth = 6  # far too deep to finish during the test
+            worker = AIWorker()
+            worker.start(ai, state)
+            time.sleep(0.1)
+            start = time.perf_counter()
+            worker.cancel()
+            self.assertLess(time.perf_counter() - start, 0.5)
+            self.assertFalse(worker.busy)
+            self.assertIsNone(worker.poll())
+            self.assertEqual(state.snapshot(), before)
+
+    def test_restart_after_cancel(self):
+        state = midgame_state()
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6)
+        worker = AIWorker()
+        worker.start(ai, state)
+        worker.cancel()
+        worker.start(ai, state)
+        self.assertIsNotNone(worker.wait(10))
+
+    def test_errors_reach_the_caller(self):
+        worker = AIWorker()
+        worker.start(AI(Difficulty.MEDIUM, Color.BLACK, 6, 6), None)
+        with self.assertRaises(AttributeError):
+            worker.wait(10)
+        self.assertFalse(worker.busy)
+
+
+
+class TestPondering(unittest.TestCase):
+
+    def after_our_move(self, ai):
+        state = midgame_state()
+        move = ai.get_best_move(state)
+        state.apply_move(move, Color.BLACK)
+        return state
+
+    def test_ponder_hit_answers_at_once(self):
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6)
+        state = self.after_our_move(ai)
+        predicted = ai.pv[1]
+        worker = AIWorker()
+        worker.ponder(ai, state)
+        self.assertFalse(worker.busy)
+        worker.done.wait(10)  # the player takes longer than the search
+        state.apply_packed(predicted, Color.WHITE)
+        worker.start(ai, state)
+        self.assertEqual(worker.ponder_hits, 1)
+        move = worker.poll()
+        self.assertIn(move, ai.generate_all_moves(state, Color.BLACK))
+
+    def test_ponder_miss_searches_the_real_position(self):
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6)
+        state = self.after_our_move(ai)
+        predicted = ai.pv[1]
+        worker = AIWorker()
+        worker.ponder(ai, state)
+        reply = [m for m in ai.legal_moves(state, Color.WHITE) if m != predicted][0]
+        state.apply_packed(reply, Color.WHITE)
+        before = state.snapshot()
+        worker.start(ai, state)
+        self.assertEqual(worker.ponder_misses, 1)
+        move = worker.wait(10)
+        self.assertIn(move, ai.generate_all_moves(state, Color.BLACK))
+        self.assertEqual(state.snapshot(), before)
+
+    def test_mcts_ponder_grows_the_reply_subtree(self):
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, engine=Engine.MCTS, playouts=200)
+        state = self.after_our_move(ai)
+        worker = AIWorker()
+        worker.ponder(ai, state)
+        deadline = time.perf_counter() + 10
+        while time.perf_counter() < deadline and not (ai.mcts.root and ai.mcts.root.children):
+            time.sleep(0.05)
+        time.sleep(0.2)
+        worker.cancel()  # the tree stays; read it once the ponder thread is done
+        reply = max(ai.mcts.root.children, key=lambda child: child.visits).move
+        state.apply_packed(reply, Color.WHITE)
+        worker.start(ai, state)
+        worker.wait(10)
+        self.assertGreater(ai.mcts.reused_visits, 0)
+
+    def test_cancel_stops_pondering(self):
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, engine=Engine.MCTS, playouts=200)
+        state = self.after_our_move(ai)
+        worker = AIWorker()
+        worker.ponder(ai, state)
+        worker.cancel()
+        self.assertIsNone(worker.thread)
+        self.assertIsNone(worker.poll())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
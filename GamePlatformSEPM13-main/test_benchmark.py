@@ -0,0 +1,30 @@
+import unittest
+from ai import Winner
+from benchmark import CORPUS, compare, game_state, run_benchmarks
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_corpus_positions_are_playable(self):
+        for group, positions in CORPUS.items():
+            for position in positions:
+                self.assertEqual([len(row.split()) for row in position["rows"]], [6] * 6)
+                legacy = game_state(position, use_bitboard=False)
+                packed = game_state(position, use_bitboard=True)
+                self.assertEqual(legacy.hash, packed.hash)
+                self.assertEqual(position["turn"] % 2, 0)  # black to move
+                self.assertEqual(packed.board.check_winner(packed.turn, packed.max_turn), Winner.ONGOING)
+
+    def test_report_and_compare(self):
+        report = run_benchmarks(min_time=0.001, search=False)
+        results = report["results"]
+        for name in ("check_winner/aiboard/opening", "converter/bitboard/endgame", "evaluate/bitboard/midgame"):
+            self.assertGreater(results[name]["ops_per_sec"], 0)
+            self.assertIn("peak_kb", results[name])
+        ratios = compare(report, report)
+        self.assertEqual(set(ratios), set(results))
+        self.assertTrue(all(ratio == 1 for ratio in ratios.values()))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
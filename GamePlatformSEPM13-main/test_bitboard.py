@@ -0,0 +1,218 @@
+import random
+import unittest
+from ai import (
+    AI,
+    AIBoard,
+    AIPiece,
+    BitBoard,
+    Color,
+    Difficulty,
+    GameState,
+    Move,
+    inverse_symmetry,
+    transform_move,
+    transform_packed,
+)
+
+
+def random_states(seed, plies=40):
+    """Play the same random game on an AIBoard and a BitBoard, yielding both states per ply."""
+    rng = random.Random(seed)
+    legacy = GameState(AIBoard(6), 21, 21)
+    packed = GameState(BitBoard(6), 21, 21)
+    ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6)
+    player = Color.BLACK
+    for _ in range(plies):
+        moves = ai.generate_all_moves(legacy, player)
+        if not moves:
+            return
+        move = rng.choice(moves)
+        legacy.apply_move(move, player)
+        packed.apply_move(move, player)
+        yield legacy, packed, player
+        player = Color.WHITE if player == Color.BLACK else Color.BLACK
+
+
+def move_key(move):
+    vertical = move.piece.is_vertical if move.is_placement else None
+    return (move.x, move.y, move.is_placement, move.to_x, move.to_y, vertical, move.count)
+
+
+class TestBitBoard(unittest.TestCase):
+
+    def test_masks_follow_tops(self):
+        b = BitBoard(6)
+        b.place_piece(1, 2, [AIPiece(Color.WHITE, False), AIPiece(Color.BLACK, True)])
+        sq = 1 << (1 * 6 + 2)
+        self.assertEqual(b.standing, sq)
+        self.assertEqual(b.occupied, sq)
+        self.assertEqual(b.top_color(1, 2), Color.BLACK)
+        b.move_piece(1, 2, 1, 3, 1)
+        self.assertEqual(b.white_flat, sq)
+        self.assertEqual(b.standing, sq << 1)
+        b.undo_move_piece(1, 2, 1, 3, 1)
+        self.assertEqual(b.standing, sq)
+        self.assertEqual(b.white_flat, 0)
+        b.undo_place_piece(1, 2)
+        self.assertEqual(b.white_flat, sq)
+
+    def test_road_detection(self):
+        b = BitBoard(6)
+        for y in range(6):
+            b.place_piece(2, y, [AIPiece(Color.BLACK, False)])
+        self.assertTrue(b.check_full_path(Color.BLACK))
+        self.assertFalse(b.check_full_path(Color.WHITE))
+        b.place_piece(2, 3, [AIPiece(Color.BLACK, True)])
+        self.assertFalse(b.check_full_path(Color.BLACK))
+
+    def test_no_wrap_between_columns(self):
+        b = BitBoard(6)
+        # (0, 5) and (1, 0) are adjacent bits but not adjacent squares
+        for x, y in [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (1, 0)]:
+            b.place_piece(x, y, [AIPiece(Color.WHITE, False)])
+        self.assertFalse(b.check_full_path(Color.WHITE))
+
+    def test_matches_aiboard_in_random_games(self):
+        ai = AI(Difficulty.MEDIUM, Color.WHITE, 6, 6)
+        for seed in range(20):
+            for legacy, packed, player in random_states(seed):
+                for x in range(6):
+                    for y in range(6):
+                        self.assertEqual(
+                            [(p.color, p.is_vertical) for p in legacy.board.get_field(x, y).pieces],
+                            [(p.color, p.is_vertical) for p in packed.board.get_field(x, y).pieces],
+                        )
+                self.assertEqual(
+                    legacy.board.check_winner(legacy.turn, legacy.max_turn),
+                    packed.board.check_winner(packed.turn, packed.max_turn),
+                )
+                self.assertEqual(ai.evaluate(legacy), ai.evaluate(packed))
+                self.assertEqual(
+                    [move_key(m) for m in ai.generate_all_moves(legacy, player)],
+                    [move_key(m) for m in ai.generate_all_moves(packed, player)],
+                )
+
+    def test_same_best_move_as_aiboard(self):
+        for legacy, packed, player in random_states(7, plies=12):
+            pass
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6)
+        self.assertEqual(
+            move_key(ai.get_best_move(legacy)), move_key(ai.get_best_move(packed))
+        )
+
+    def test_undo_restores_position(self):
+        state = GameState(BitBoard(6), 21, 21)
+        state.apply_move(Move(0, 0, True, piece=AIPiece(Color.BLACK, False)), Color.BLACK)
+        before = (list(state.board.stacks), list(state.board.heights), state.board.occupied)
+        move = Move(0, 0, False, to_x=1, to_y=0, count=1)
+        state.apply_move(move, Color.BLACK)
+        state.undo_move(move, Color.BLACK)
+        self.assertEqual(
+            before, (list(state.board.stacks), list(state.board.heights), state.board.occupied)
+        )
+
+
+def reference_moves(state, player):
+    """Moves in generate_all_moves order, worked out square by square."""
+    board = state.board
+    moves = []
+    in_hand = state.num_black_piece if player == Color.BLACK else state.num_white_piece
+    if in_hand > 0:
+        for x in range(6):
+            for y in range(6):
+                if not board.is_field_full(x, y, 5) and not board.top_is_standing(x, y):
+                    moves.append((x, y, True, -1, -1, False, 1))
+                    moves.append((x, y, True, -1, -1, True, 1))
+    for x in range(6):
+        for y in range(6):
+            if board.top_color(x, y) == player:
+                for count in range(1, board.height(x, y) + 1):
+                    for to_x, to_y in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+                        if (
+                            0 <= to_x < 6
+                            and 0 <= to_y < 6
+                            and board.height(to_x, to_y) + count <= 5
+                            and not board.top_is_standing(to_x, to_y)
+                        ):
+                            moves.append((x, y, False, to_x, to_y, None, count))
+    return moves
+
+
+class TestPackedMoves(unittest.TestCase):
+
+    def test_generator_matches_reference(self):
+        ai = AI(Difficulty.MEDIUM, Color.WHITE, 6, 6)
+        for seed in range(10):
+            for legacy, packed, player in random_states(seed):
+                for state in (legacy, packed):
+                    self.assertEqual(
+                        [move_key(m) for m in ai.generate_all_moves(state, player)],
+                        reference_moves(state, player),
+                    )
+
+    def test_encode_decode_round_trip(self):
+        ai = AI(Difficulty.MEDIUM, Color.WHITE, 6, 6)
+        for _, state, player in random_states(4):
+            for move in ai.legal_moves(state, player):
+                decoded = ai.decode_move(move, player)
+                self.assertEqual(ai.encode_move(decoded), move)
+
+    def test_apply_packed_matches_apply_move(self):
+        ai = AI(Difficulty.MEDIUM, Color.WHITE, 6, 6)
+        for legacy, packed, player in random_states(9, plies=30):
+            for state in (legacy, packed):
+                other = GameState.from_snapshot(state.snapshot())
+                before = state.snapshot()
+                for move in ai.legal_moves(state, player):
+                    state.apply_packed(move, player)
+                    other.apply_move(ai.decode_move(move, player), player)
+                    self.assertEqual(state.snapshot(), other.snapshot())
+                    self.assertEqual(state.hash, other.hash)
+                    state.undo_packed(move, player)
+                    other.undo_move(ai.decode_move(move, player), player)
+                self.assertEqual(state.snapshot(), before)
+
+
+class TestSymmetry(unittest.TestCase):
+
+    def test_transforms_share_the_canonical_hash(self):
+        for legacy, packed, _ in random_states(4, plies=24):
+            key, symmetry = packed.canonical(colors=True)
+            self.assertEqual(legacy.canonical(colors=True), (key, symmetry))
+            self.assertEqual(packed.transformed(symmetry).hash, key)
+            for other in range(16):
+                state = packed.transformed(other)
+                self.assertEqual(state.board.compute_zobrist(), state.board.zobrist)
+                self.assertEqual(state.canonical(colors=True)[0], key)
+            if symmetry < 8:
+                self.assertEqual(packed.canonical(), (key, symmetry))
+
+    def test_moves_follow_the_board(self):
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6)
+        for _, state, player in random_states(5, plies=20):
+            mover = Color.WHITE if player == Color.BLACK else Color.BLACK
+            moves = ai.legal_moves(state, mover)
+            for symmetry in range(16):
+                other = state.transformed(symmetry)
+                other_mover = player if symmetry & 8 else mover
+                self.assertEqual(
+                    sorted(transform_packed(move, symmetry, 6) for move in moves),
+                    sorted(ai.legal_moves(other, other_mover)),
+                )
+                inverse = inverse_symmetry(symmetry, 6)
+                for move in moves[:10]:
+                    self.assertEqual(transform_packed(transform_packed(move, symmetry, 6), inverse, 6), move)
+
+    def test_transform_move(self):
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6)
+        place = Move(1, 0, True, piece=AIPiece(Color.BLACK, True))
+        self.assertEqual(transform_move(place, 1, 6), Move(4, 0, True, piece=AIPiece(Color.BLACK, True)))
+        self.assertEqual(transform_move(place, 4 | 8, 6), Move(0, 1, True, piece=AIPiece(Color.WHITE, True)))
+        slide = Move(2, 3, False, 2, 4, count=2)
+        for symmetry in range(8):
+            packed = transform_packed(ai.encode_move(slide), symmetry, 6)
+            self.assertEqual(transform_move(slide, symmetry, 6), ai.decode_move(packed, Color.BLACK))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,127 @@
+import io
+import os
+import subprocess
+import sys
+import time
+import unittest
+from ai import AI, Color, Difficulty, GameState, BitBoard
+from engine import Engine, format_move, parse_move
+
+
+class TestEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.output = io.StringIO()
+        self.engine = Engine(Difficulty.MEDIUM, output=self.output)
+
+    def command(self, line):
+        """Run one command (a go or stop to the end) and return the lines it wrote."""
+        start = len(self.output.getvalue())
+        self.engine.handle(line)
+        if line.startswith(("go", "stop")):
+            self.engine.wait(30)
+        return self.output.getvalue()[start:].splitlines()
+
+    def test_moves_round_trip(self):
+        ai = AI(Difficulty.MEDIUM, Color.WHITE, 6, 6)
+        state = GameState(BitBoard(6), 21, 21, turn=1)
+        state.apply_move(parse_move("2,2", Color.BLACK), Color.BLACK)
+        for move in ai.generate_all_moves(state, Color.WHITE):
+            self.assertEqual(parse_move(format_move(move), Color.WHITE), move)
+        self.assertEqual(format_move(parse_move("1,2>1,3:3", Color.WHITE)), "1,2>1,3:3")
+        with self.assertRaises(ValueError):
+            parse_move("1;2", Color.BLACK)
+
+    def test_go_answers_a_legal_move(self):
+        self.command("position startpos moves 2,2 3,3s 2,3")
+        self.assertEqual(self.engine.to_move(), Color.WHITE)
+        lines = self.command("go depth 2")
+        self.assertTrue(lines[0].startswith("info depth 2 "))
+        best = lines[-1].split()
+        self.assertEqual(best[0], "bestmove")
+        self.assertEqual(self.command(f"move {best[1]}"), [])
+        self.assertEqual(self.engine.state.turn, 4)
+
+    def test_position_rows(self):
+        empty = ",".join(". . . . . .".split())
+        rows = "/".join([empty] * 5) + "/b,.,.,.,.,wW"
+        self.assertEqual(self.command(f"position rows {rows} black 20 white 19 turn 2 moves 0,0"), [])
+        state = self.engine.state
+        self.assertEqual((state.turn, state.num_black_piece, state.board.height(5, 5)), (3, 19, 2))
+        self.assertEqual(self.command("position rows ./. black 1 white 1 turn 0")[0][:5], "error")
+        empty_rows = "/".join([empty] * 6)
+        for line in (
+            "position rows x,.,.,.,.,./" + "/".join([empty] * 5) + " black 20 white 19 turn 2",
+            "position rows b.,.,.,.,.,./" + "/".join([empty] * 5) + " black 20 white 19 turn 2",
+            f"position rows {empty_rows} black 22 white 19 turn 2",
+            f"position rows {empty_rows} black 20 white -1 turn 2",
+            f"position rows {empty_rows} black 20 white 19 turn -3",
+        ):
+            self.assertTrue(self.command(line)[0].startswith("error"), line)
+        self.assertEqual(self.engine.state.turn, 3)
+
+    def test_errors_leave_the_position(self):
+        self.command("position startpos moves 1,1")
+        for line in ("move 1,1>1,2", "move 9,9", "position startpos moves 0,0s 0,0", "go depth", "go depth 0",
+                     "go nodes -5", "go movetime 0", "fly"):
+            self.assertTrue(self.command(line)[0].startswith("error"), line)
+        self.assertEqual(self.engine.state.turn, 1)
+
+    def test_node_limit(self):
+        self.command("position startpos moves 2,2 3,3 2,3 3,4")
+        self.command("go nodes 2000")
+        stats = self.command("stats")[0].split()[1:]
+        stats = dict(zip(stats[::2], map(int, stats[1::2])))
+        self.assertLess(stats["nodes"], 2064)
+        self.assertEqual((stats["searches"], stats["total_nodes"]), (1, stats["nodes"]))
+
+    def test_stop(self):
+        self.engine.handle("go movetime 60000")
+        time.sleep(0.2)
+        self.assertTrue(self.command("move 0,0")[0].startswith("error searching"))
+        start = time.perf_counter()
+        lines = self.command("stop")
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertTrue(lines[-1].startswith("bestmove ") and lines[-1] != "bestmove none")
+        self.command("position startpos moves 2,2 3,3 2,3 3,4")
+        for delay in (0.05, 1.5):
+            self.engine.handle("go depth 6")
+            time.sleep(delay)
+            lines = self.command("stop")
+            self.assertTrue(lines[-1].startswith("bestmove ") and lines[-1] != "bestmove none", delay)
+
+    def test_game_over(self):
+        moves = " ".join(f"0,{y} 5,{y}" for y in range(5))
+        self.assertEqual(self.command(f"position startpos moves {moves} 0,5"), [])  # black road
+        self.assertEqual(self.command("go"), ["bestmove none"])
+
+
+class TestEngineProcess(unittest.TestCase):
+
+    def test_protocol_over_pipes(self):
+        engine = subprocess.Popen(
+            [sys.executable, "engine.py", "--difficulty", "medium"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            engine.stdin.write("isready\nposition startpos moves 0,0\ngo depth 1\n")
+            engine.stdin.flush()
+            self.assertEqual(engine.stdout.readline(), "readyok\n")
+            while True:
+                line = engine.stdout.readline()
+                if line.startswith("bestmove"):
+                    break
+            engine.stdin.write("quit\n")
+            engine.stdin.flush()
+            self.assertEqual(engine.wait(10), 0)
+        finally:
+            engine.kill()
+            engine.stdin.close()
+            engine.stdout.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
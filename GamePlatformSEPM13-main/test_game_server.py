@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+from ai import Color, Difficulty
+from engine import parse_move
+from game_server import GameServer, GameSession, run_load
+
+
+class TestGameSession(unittest.TestCase):
+
+    def test_rules(self):
+        session = GameSession(1, Difficulty.EASY)
+        session.play(parse_move("2,2s", Color.BLACK), Color.BLACK)
+        for text in ("2,2", "2,3>2,2"):  # onto a standing piece, and from an empty square
+            with self.assertRaises(ValueError):
+                session.play(parse_move(text, Color.WHITE), Color.WHITE)
+        self.assertEqual(session.total_moves, 1)
+        for y in range(5):
+            session.play(parse_move(f"5,{y}", Color.WHITE), Color.WHITE)
+            self.assertIsNone(session.result)
+            session.play(parse_move(f"0,{y}", Color.BLACK), Color.BLACK)
+        session.play(parse_move("5,5", Color.WHITE), Color.WHITE)
+        self.assertEqual(session.result, ("white", "road"))
+        self.assertEqual(session.players[1].pieces_in_hand, 15)
+
+
+class TestGameServer(unittest.TestCase):
+
+    def run_server(self, test, **options):
+        async def main():
+            server = GameServer(**options)
+            await server.start(port=0)
+            try:
+                return await test(server)
+            finally:
+                await server.close()
+
+        return asyncio.run(main())
+
+    def test_load(self):
+        async def test(server):
+            report = await run_load("127.0.0.1", server.port, games=4, concurrency=4)
+            return report, server.stats()
+
+        report, stats = self.run_server(test, workers=1)
+        self.assertEqual((report["games"], stats["games"]), (4, 4))
+        self.assertGreater(report["moves"], 0)
+        self.assertGreaterEqual(stats["moves"], 2 * report["moves"])
+        self.assertGreater(report["latency_ms"]["p99"], 0)
+        self.assertEqual(stats["rejected"], 0)
+
+    def test_backpressure_and_deadlines(self):
+        async def test(server):
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+
+            async def ask(line):
+                writer.write(line.encode() + b"\n")
+                await writer.drain()
+                return (await reader.readline()).decode().split()
+
+            replies = [await ask("new medium"), await ask("move 9,9"), await ask("move 0,0")]
+            server.scheduler.max_queue = 0
+            replies.append(await ask("move 1,1"))
+            writer.write(b"quit\n")
+            writer.close()
+            return replies, server.stats()
+
+        replies, stats = self.run_server(test, workers=1, move_time_ms=0)
+        self.assertEqual(replies[0], ["game", "1"])
+        self.assertEqual(replies[1][:3], ["error", "illegal", "move"])
+        self.assertEqual(replies[2][0], "move")  # a random move, the deadline had passed
+        self.assertEqual(replies[3], ["error", "busy,", "retry"])
+        self.assertEqual((stats["expired"], stats["rejected"], stats["moves"]), (1, 1, 2))
+
+    def test_invalid_utf8(self):
+        async def test(server):
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            replies = []
+            for line in (b"\xff\xfe\n", b"move \xff\n", b"new easy\n"):
+                writer.write(line)
+                await writer.drain()
+                replies.append((await reader.readline()).decode().split())
+            writer.write(b"quit\n")
+            writer.close()
+            return replies
+
+        replies = self.run_server(test, workers=1)
+        self.assertEqual([reply[0] for reply in replies], ["error", "error", "game"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
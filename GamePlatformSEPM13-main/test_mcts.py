@@ -0,0 +1,45 @@
+import unittest
+from ai import AI, AIPiece, BitBoard, Color, Difficulty, Engine, GameState
+from test_bitboard import random_states
+
+
+class TestMCTS(unittest.TestCase):
+
+    def test_returns_legal_move_and_restores_state(self):
+        for _, state, _ in random_states(5, plies=14):
+            pass
+        before = state.snapshot()
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, engine=Engine.MCTS, playouts=200)
+        move = ai.get_best_move(state)
+        self.assertIn(move, ai.generate_all_moves(state, Color.BLACK))
+        self.assertEqual(state.snapshot(), before)
+        self.assertEqual(ai.mcts.root.visits, 200)
+
+    def test_completes_road(self):
+        board = BitBoard(6)
+        for y in range(5):
+            board.place_piece(2, y, [AIPiece(Color.WHITE, False)])
+        board.place_piece(0, 0, [AIPiece(Color.BLACK, False)])
+        state = GameState(board, 15, 15, turn=11)
+        ai = AI(Difficulty.HARD, Color.WHITE, 6, 6, engine=Engine.MCTS, playouts=1500)
+        move = ai.get_best_move(state)
+        self.assertEqual((move.x, move.y, move.is_placement), (2, 5, True))
+        self.assertFalse(move.piece.is_vertical)
+
+    def test_tree_is_reused_after_reply(self):
+        for _, state, _ in random_states(6, plies=14):
+            pass
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, engine=Engine.MCTS, playouts=300)
+        move = ai.get_best_move(state)
+        old_root = ai.mcts.root
+        state.apply_move(move, Color.BLACK)
+        replies = [child for child in old_root.children if child.move == ai.encode_move(move)][0].children
+        reply = max(replies, key=lambda child: child.visits)
+        state.apply_packed(reply.move, Color.WHITE)
+        ai.get_best_move(state)
+        self.assertIs(ai.mcts.root, reply)
+        self.assertGreater(ai.mcts.reused_visits, 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+from ai import AI, BitBoard, Color, Difficulty, GameState, pack_move, transform_packed
+from opening_book import OpeningBook, build_book, write_book
+
+
+class TestOpeningBook(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.entries = build_book(plies=2, depth=1)
+        handle, cls.path = tempfile.mkstemp(suffix=".bin")
+        os.close(handle)
+        write_book(cls.path, cls.entries, size=6, plies=2, pieces=21)
+        cls.book = OpeningBook(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.book.close()
+        os.remove(cls.path)
+
+    def test_covers_both_colours(self):
+        # the empty board for black, and every first black move up to symmetry for white
+        state = GameState(BitBoard(6), 21, 21)
+        replies = set()
+        for move in AI(Difficulty.HARD, Color.BLACK, 6, 6).legal_moves(state, Color.BLACK):
+            state.apply_packed(move, Color.BLACK)
+            replies.add(state.canonical()[0])
+            state.undo_packed(move, Color.BLACK)
+        self.assertEqual(len(replies), 12)  # 6 squares up to symmetry, flat or standing
+        self.assertEqual(len(self.entries), 1 + len(replies))
+        self.assertEqual(self.book.count, len(self.entries))
+
+    def test_lookup_matches_entries(self):
+        for key, (move, _) in self.entries.items():
+            self.assertEqual(self.book.lookup(key), move)
+        self.assertIsNone(self.book.lookup(12345))
+        self.assertIsNone(self.book.lookup(2 ** 64 - 1))
+
+    def test_symmetric_positions_get_symmetric_moves(self):
+        state = GameState(BitBoard(6), 21, 21)
+        state.apply_packed(pack_move(7), Color.BLACK)
+        move = self.book.probe(state)
+        for symmetry in range(8):
+            self.assertEqual(self.book.probe(state.transformed(symmetry)), transform_packed(move, symmetry, 6))
+
+    def test_ai_plays_book_moves_without_searching(self):
+        state = GameState(BitBoard(6), 21, 21)
+        black = AI(Difficulty.HARD, Color.BLACK, 6, 6, opening_book=self.path)
+        move = black.find_best_move(state)
+        self.assertEqual(move, self.book.probe(state))
+        self.assertEqual((black.nodes, black.book_hits), (0, 1))
+        state.apply_packed(move, Color.BLACK)
+        white = AI(Difficulty.HARD, Color.WHITE, 6, 6, opening_book=self.book)
+        self.assertEqual(white.find_best_move(state), self.book.probe(state))
+        self.assertEqual(white.book_hits, 1)
+
+    def test_searches_outside_the_book(self):
+        state = GameState(BitBoard(6), 21, 21, turn=2)
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6, opening_book=self.book)
+        self.assertIsNotNone(ai.get_best_move(state))
+        self.assertEqual(ai.book_hits, 0)
+        self.assertGreater(ai.nodes, 0)
+
+    def test_rejects_other_files(self):
+        with self.assertRaises(ValueError):
+            OpeningBook(__file__)
+        with self.assertRaises(ValueError):
+            AI(Difficulty.HARD, Color.BLACK, 5, 5, opening_book=self.book)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
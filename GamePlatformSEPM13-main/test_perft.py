@@ -0,0 +1,73 @@
+import os
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from ai import AI, Color, Difficulty
+from benchmark import CORPUS, build_position, game_state
+from perft import REFERENCE, check, divide, load_reference, perft, positions, run_perft
+
+
+def ui_moves(board, player, in_hand):
+    """The moves UI.handle_click accepts from `player`, as (x, y, ...) keys."""
+    moves = set()
+    for x in range(6):
+        for y in range(6):
+            stack = board.get_stack(x, y)
+            if in_hand and (stack.is_empty() or not (stack.is_full() or stack.top().standing)):
+                moves.add((x, y, True, False))
+                moves.add((x, y, True, True))
+            if stack.is_empty() or stack.top().color != player:
+                continue
+            for to_x, to_y in ((x, y - 1), (x, y + 1), (x - 1, y), (x + 1, y)):
+                if not (0 <= to_x < 6 and 0 <= to_y < 6):
+                    continue
+                target = board.get_stack(to_x, to_y)
+                if not target.is_empty() and target.top().standing:
+                    continue
+                for count in range(1, min(stack.size(), 5) + 1):
+                    if target.size() + count <= 5:
+                        moves.add((x, y, False, to_x, to_y, count))
+    return moves
+
+
+class TestPerft(unittest.TestCase):
+
+    def test_start_position(self):
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6)
+        state = positions()["start"]
+        self.assertEqual(perft(ai, state, 1, Color.BLACK), 72)
+        # white can place anywhere but on a standing piece
+        self.assertEqual(perft(ai, state, 2, Color.BLACK), 36 * 72 + 36 * 70)
+
+    def test_moves_follow_the_ui_rules(self):
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6)
+        for group_positions in CORPUS.values():
+            for position in group_positions:
+                board, black, _ = build_position(position)
+                generated = set()
+                for move in ai.generate_all_moves(game_state(position, use_bitboard=True), Color.BLACK):
+                    if move.is_placement:
+                        generated.add((move.x, move.y, True, move.piece.is_vertical))
+                    else:
+                        generated.add((move.x, move.y, False, move.to_x, move.to_y, move.count))
+                self.assertEqual(generated, ui_moves(board, "black", black.pieces_in_hand))
+
+    def test_divide(self):
+        state = positions()["midgame/1"]
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6)
+        counts = divide(state, 2, Color.BLACK)
+        self.assertEqual(len(counts), perft(ai, state, 1, Color.BLACK))
+        self.assertEqual(sum(count for _, count in counts), perft(ai, state, 2, Color.BLACK))
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            self.assertEqual(divide(state, 2, Color.BLACK, pool), counts)
+
+    def test_matches_reference(self):
+        reference = load_reference(os.path.join(os.path.dirname(os.path.abspath(__file__)), REFERENCE))
+        report = run_perft(2)
+        self.assertEqual(set(report), set(reference))
+        self.assertEqual(check(report, reference), [])
+        report["start"]["nodes"] += 1
+        self.assertEqual(check(report, reference), ["start: perft(2) is 5113, expected 5112"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,71 @@
+import copy
+import pickle
+import unittest
+from ai import AIPiece, Color, PIECE_KINDS, converter
+from Board import Board
+from Piece import Piece, PIECES
+from Player import Player
+from Stack import Stack
+
+
+class TestPieces(unittest.TestCase):
+
+    def test_pieces_are_shared(self):
+        self.assertIs(Piece('black'), Piece('black', standing=False))
+        self.assertIsNot(Piece('black'), Piece('black', standing=True))
+        self.assertIs(AIPiece(Color.WHITE, True), PIECE_KINDS[3])
+        self.assertIs(pickle.loads(pickle.dumps(Piece('white', True))), Piece('white', True))
+        self.assertIs(copy.deepcopy(AIPiece(Color.BLACK, False)), PIECE_KINDS[0])
+        with self.assertRaises(AttributeError):
+            Piece('black').standing = True
+
+    def test_kinds_match_the_ai(self):
+        for kind, piece in enumerate(PIECES):
+            ai_piece = PIECE_KINDS[kind]
+            self.assertEqual(piece.kind, kind)
+            self.assertEqual((piece.color, piece.standing), (ai_piece.color.name.lower(), ai_piece.is_vertical))
+
+    def test_stack_push_and_pop(self):
+        stack = Stack()
+        pieces = [Piece('white'), Piece('black', True), Piece('black'), Piece('white')]
+        for piece in pieces:
+            stack.push(piece)
+        self.assertEqual(stack.stack, tuple(pieces))
+        self.assertIs(stack.top(), pieces[-1])
+        moved = stack.pop(2)
+        self.assertEqual((moved.stack, stack.stack), (tuple(pieces[2:]), tuple(pieces[:2])))
+        self.assertIs(stack.pop(), pieces[1])
+        other = Stack()
+        other.push(Piece('black'))
+        other.push(moved)
+        self.assertEqual(other.stack, (Piece('black'),) + tuple(pieces[2:]))
+        other.push(stack)
+        other.push(Piece('white'))
+        self.assertTrue(other.is_full())
+        with self.assertRaises(ValueError):
+            other.push(Piece('white'))
+        with self.assertRaises(IndexError):
+            stack.pop(2)
+
+    def test_copy_is_independent(self):
+        stack = Stack()
+        stack.push(Piece('black'))
+        copied = stack.copy()
+        copied.push(Piece('white'))
+        self.assertEqual((stack.size(), copied.size()), (1, 2))
+        restored = pickle.loads(pickle.dumps(copied))
+        self.assertEqual(restored.stack, copied.stack)
+
+    def test_converter_reads_packed_stacks(self):
+        board = Board()
+        board.place_piece(1, 2, Piece('white'))
+        board.place_piece(1, 2, Piece('black', standing=True))
+        state = converter(board, Player('black'), Player('white'), 2)
+        self.assertEqual(
+            [(p.color, p.is_vertical) for p in state.board.get_field(1, 2).pieces],
+            [(Color.WHITE, False), (Color.BLACK, True)],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,68 @@
+import random
+import unittest
+from Board import Board
+from Piece import Piece
+from RoadTracker import RoadTracker
+
+
+def dfs_road(b, color):
+    """Reference road check: flood fill from every edge square."""
+    def road_square(x, y):
+        top = b.get_stack(x, y).top()
+        return top is not None and top.color == color and not top.is_standing()
+
+    for starts, done in (
+        ([(x, 0) for x in range(6)], lambda x, y: y == 5),
+        ([(0, y) for y in range(6)], lambda x, y: x == 5),
+    ):
+        seen = set()
+        todo = [s for s in starts if road_square(*s)]
+        while todo:
+            x, y = todo.pop()
+            if (x, y) in seen:
+                continue
+            seen.add((x, y))
+            if done(x, y):
+                return True
+            for nx, ny in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if 0 <= nx < 6 and 0 <= ny < 6 and road_square(nx, ny):
+                    todo.append((nx, ny))
+    return False
+
+
+class TestRoadTracker(unittest.TestCase):
+
+    def test_removing_a_square_splits_the_road(self):
+        t = RoadTracker(3)
+        for y in range(3):
+            t.set_top(1 * 3 + y, 'white')
+        self.assertTrue(t.has_road('white'))
+        t.set_top(1 * 3 + 1, 'black')
+        self.assertFalse(t.has_road('white'))
+        self.assertFalse(t.has_road('black'))
+        t.set_top(1 * 3 + 1, 'white')
+        self.assertTrue(t.has_road('white'))
+
+    def test_matches_dfs_on_random_games(self):
+        rng = random.Random(13)
+        for _ in range(30):
+            b = Board()
+            for _ in range(120):
+                x, y = rng.randrange(6), rng.randrange(6)
+                stack = b.get_stack(x, y)
+                if rng.random() < 0.6 or stack.is_empty():
+                    if not stack.is_full() and (stack.is_empty() or not stack.top().standing):
+                        b.place_piece(x, y, Piece(rng.choice(['black', 'white']), standing=rng.random() < 0.2))
+                else:
+                    nx, ny = rng.choice([(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)])
+                    if 0 <= nx < 6 and 0 <= ny < 6:
+                        try:
+                            b.move_piece(x, y, nx, ny, rng.randint(1, stack.size()))
+                        except ValueError:
+                            pass
+                for color in ('black', 'white'):
+                    self.assertEqual(b.check_winning_condition(color), dfs_road(b, color))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
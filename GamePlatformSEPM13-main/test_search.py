@@ -0,0 +1,311 @@
+import json
+import math
+import threading
+import time
+import unittest
+from unittest import mock
+from ai import AI, AIPiece, BitBoard, Color, Difficulty, EVAL_GRAIN, EVAL_WEIGHTS, GameState
+from test_bitboard import random_states
+
+
+def midgame_state(seed=1, plies=14):
+    for _, state, _ in random_states(seed, plies=plies):
+        pass
+    return state
+
+
+class TestIterativeDeepening(unittest.TestCase):
+
+    def test_respects_time_limit(self):
+        state = midgame_state()
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, time_limit_ms=150)
+        start = time.perf_counter()
+        move = ai.get_best_move(state)
+        elapsed = time.perf_counter() - start
+        self.assertIn(move, ai.generate_all_moves(state, Color.BLACK))
+        self.assertGreaterEqual(ai.completed_depth, 1)
+        self.assertLess(elapsed, 0.5)
+
+    def test_position_is_restored_after_timeout(self):
+        state = midgame_state()
+        before = (list(state.board.stacks), state.hash, state.turn)
+        AI(Difficulty.HARD, Color.BLACK, 6, 6, time_limit_ms=50).get_best_move(state)
+        self.assertEqual(before, (list(state.board.stacks), state.hash, state.turn))
+
+    def test_stop_only_ends_the_running_search(self):
+        state = midgame_state()
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6)
+        ai.max_depth = 6  # far too deep to finish during the test
+        threading.Timer(0.1, ai.stop).start()
+        ai.find_best_move(state)
+        self.assertEqual(ai.completed_depth, 0)
+        ai.max_depth = 3
+        self.assertIsNotNone(ai.find_best_move(state))  # not stopped again
+        self.assertGreater(ai.nodes, 64)
+        self.assertEqual(ai.completed_depth, 3)
+
+    def test_returns_head_of_principal_variation(self):
+        state = midgame_state(seed=2)
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6, time_limit_ms=400)
+        move = ai.get_best_move(state)
+        self.assertGreaterEqual(ai.completed_depth, 2)
+        self.assertEqual(len(ai.pv), ai.completed_depth)
+        self.assertEqual(ai.principal_variation[0], move)
+
+
+class TestMoveOrdering(unittest.TestCase):
+
+    def search(self, state, **kwargs):
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, **kwargs)
+        move = ai.get_best_move(state)
+        state.apply_move(move, Color.BLACK)
+        score = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6, tt_memory_mb=0).minimax(
+            state, 2, False, -math.inf, math.inf, state.turn, state.max_turn
+        )
+        state.undo_move(move, Color.BLACK)
+        return ai.nodes, score
+
+    def test_fewer_nodes_same_score(self):
+        for seed in (0, 3):
+            state = midgame_state(seed)
+            plain_nodes, plain_score = self.search(state, tt_memory_mb=0, move_ordering=False)
+            nodes, score = self.search(state)
+            self.assertEqual(score, plain_score)
+            self.assertLess(nodes, plain_nodes)
+
+    def test_heuristics_kept_between_searches(self):
+        state = midgame_state()
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6)
+        ai.get_best_move(state)
+        self.assertTrue(ai.history)
+        self.assertTrue(any(ai.killers))
+        before = dict(ai.history)
+        ai.get_best_move(state)
+        self.assertTrue(all(ai.history.get(key, 0) >= value >> 1 for key, value in before.items()))
+
+
+class TestPrincipalVariationSearch(unittest.TestCase):
+
+    def test_minimax_is_negamax(self):
+        state = midgame_state(2)
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, tt_memory_mb=0)
+        score = ai.negamax(state, 2, -math.inf, math.inf, Color.WHITE)
+        self.assertEqual(ai.minimax(state, 2, False, -math.inf, math.inf, state.turn, state.max_turn), -score)
+
+    def test_fail_soft_bounds(self):
+        for seed in (0, 3):
+            state = midgame_state(seed)
+            exact = AI(Difficulty.HARD, Color.BLACK, 6, 6).negamax(state, 3, -math.inf, math.inf, Color.BLACK)
+            for alpha in (exact - 1, exact, exact + 1):
+                beta = alpha + EVAL_GRAIN / 2
+                ai = AI(Difficulty.HARD, Color.BLACK, 6, 6)
+                score = ai.negamax(state, 3, alpha, beta, Color.BLACK)
+                if exact <= alpha:
+                    self.assertTrue(exact <= score <= alpha)
+                else:
+                    self.assertTrue(beta <= score <= exact)
+
+    def test_root_window(self):
+        state = midgame_state(1)
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, tt_memory_mb=0)
+        moves = ai.legal_moves(state, Color.BLACK)
+        score, move, _ = ai.search_root(state, list(moves), 2)
+        self.assertEqual(ai.search_root(state, list(moves), 2, score - 1, score + 1)[:2], (score, move))
+        self.assertLessEqual(ai.search_root(state, list(moves), 2, score + 1, score + 2)[0], score + 1)
+        self.assertGreaterEqual(ai.search_root(state, list(moves), 2, score - 2, score - 1)[0], score - 1)
+
+    def test_aspiration_researches(self):
+        def search(window):
+            state = midgame_state(3)
+            state.max_turn = state.turn + 3  # iterative deepening stops at depth 3
+            ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, time_limit_ms=60000)
+            with mock.patch('ai.ASPIRATION_WINDOW', window):
+                move = ai.find_best_move(state)
+            return move, ai.pv, ai.aspiration_researches
+
+        move, pv, researches = search(math.inf)
+        self.assertEqual(researches, 0)
+        narrow = search(EVAL_GRAIN)
+        self.assertEqual(narrow[:2], (move, pv))
+        self.assertGreater(narrow[2], 0)
+
+
+class TestSearchStats(unittest.TestCase):
+
+    def test_analyze(self):
+        state = midgame_state(1, plies=16)
+        move = AI(Difficulty.HARD, Color.BLACK, 6, 6).get_best_move(state)
+        ai = AI(Difficulty.HARD, Color.BLACK, 6, 6)
+        stats = ai.analyze(state)
+        self.assertEqual(stats.move, move)
+        self.assertEqual((stats.pv[0], len(stats.pv), stats.depth), (move, 3, 3))
+        self.assertEqual(stats.nodes, ai.nodes)
+        self.assertGreater(stats.leaf_evals, 0)
+        self.assertTrue(0 < stats.first_move_cutoffs <= stats.cutoffs)
+        self.assertTrue(0 < stats.tt_hits <= stats.tt_probes)
+        self.assertTrue(0 < stats.first_move_cutoff_rate <= 1)
+        self.assertTrue(0 < stats.movegen_time + stats.win_check_time + stats.eval_time < stats.time)
+        self.assertEqual(json.loads(json.dumps(stats.as_dict()))["nodes"], stats.nodes)
+        # the timing wrappers are gone again
+        self.assertFalse({'generate_moves', 'evaluate'} & set(vars(ai)))
+        self.assertNotIn('check_winner', vars(state.board))
+        self.assertFalse(ai.instrument)
+
+    def test_callback(self):
+        state = midgame_state(2)
+        seen = []
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6, on_search=seen.append)
+        ai.get_best_move(state)
+        ai.get_best_move(state)
+        self.assertEqual(len(seen), 2)
+        self.assertIs(ai.stats, seen[-1])
+        self.assertEqual(seen[-1].nodes, ai.nodes)
+        self.assertIsNone(AI(Difficulty.MEDIUM, Color.BLACK, 6, 6).stats)
+
+
+class TestParallelSearch(unittest.TestCase):
+
+    def test_snapshot_round_trip(self):
+        state = midgame_state()
+        copy = GameState.from_snapshot(state.snapshot())
+        self.assertEqual(copy.hash, state.hash)
+        self.assertEqual(copy.snapshot(), state.snapshot())
+        legacy = GameState.from_snapshot(state.snapshot(), use_bitboard=False)
+        self.assertEqual(legacy.snapshot(), state.snapshot())
+
+    def test_matches_serial_search(self):
+        for seed in (0, 2):
+            state = midgame_state(seed)
+            serial = AI(Difficulty.HARD, Color.BLACK, 6, 6)
+            parallel = AI(Difficulty.HARD, Color.BLACK, 6, 6, workers=2)
+            try:
+                self.assertEqual(parallel.get_best_move(state), serial.get_best_move(state))
+                self.assertEqual(parallel.pv, serial.pv)
+            finally:
+                parallel.close()
+
+    def test_respects_time_limit(self):
+        parallel = AI(Difficulty.HARD, Color.BLACK, 6, 6, workers=2, time_limit_ms=1000)
+        try:
+            parallel.get_pool()  # process start-up is not part of the budget
+            for seed in (0, 1):
+                state = midgame_state(seed)
+                start = time.perf_counter()
+                move = parallel.get_best_move(state)
+                self.assertLess(time.perf_counter() - start, 1.0 + 0.2)
+                self.assertIn(move, parallel.generate_all_moves(state, Color.BLACK))
+                self.assertGreaterEqual(parallel.completed_depth, 2)
+        finally:
+            parallel.close()
+
+    def test_stop_reaches_the_workers(self):
+        parallel = AI(Difficulty.HARD, Color.BLACK, 6, 6, workers=2, time_limit_ms=60000)
+        try:
+            parallel.get_pool()
+            threading.Timer(1.0, parallel.stop).start()  # mostly the workers are searching by then
+            start = time.perf_counter()
+            move = parallel.get_best_move(midgame_state())
+            self.assertLess(time.perf_counter() - start, 1.0 + 0.2)
+            self.assertIsNotNone(move)
+        finally:
+            parallel.close()
+
+
+class TestEvaluation(unittest.TestCase):
+
+    def test_matches_weighted_features(self):
+        for seed in (0, 1, 4):
+            state = midgame_state(seed, plies=30)
+            for color in Color:
+                ai = AI(Difficulty.MEDIUM, color, 6, 6)
+                own = ai.features(state, ai.player)
+                opp = ai.features(state, ai.opponent)
+                expected = sum(w * (a - b) for w, a, b in zip(EVAL_WEIGHTS, own, opp))
+                self.assertAlmostEqual(ai.evaluate(state), expected)
+            black = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6).evaluate(state)
+            self.assertAlmostEqual(AI(Difficulty.MEDIUM, Color.WHITE, 6, 6).evaluate(state), -black)
+
+    def test_features(self):
+        board = BitBoard(6)
+        for x, y in ((0, 0), (0, 1), (0, 2), (3, 3), (3, 4)):
+            board.place_piece(x, y, [AIPiece(Color.BLACK, False)])
+        board.place_piece(3, 3, [AIPiece(Color.WHITE, True)])
+        state = GameState(board, 15, 20)
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6)
+        self.assertEqual(ai.features(state, Color.BLACK), (4, 3, 3, 0, 15))
+        self.assertEqual(ai.features(state, Color.WHITE), (0, 0, 0, 1, 20))
+
+    def test_frontier_scores_like_depth_zero(self):
+        state = midgame_state(3)
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6, tt_memory_mb=0, move_ordering=False)
+        best = -math.inf
+        for move in ai.legal_moves(state, Color.BLACK):
+            state.apply_packed(move, Color.BLACK)
+            best = max(best, ai.minimax(state, 0, False, -math.inf, math.inf, state.turn, state.max_turn))
+            state.undo_packed(move, Color.BLACK)
+        self.assertEqual(ai.minimax(state, 1, True, -math.inf, math.inf, state.turn, state.max_turn), best)
+
+
+class TestQuiescence(unittest.TestCase):
+
+    def threat_position(self):
+        # black has (2, 0) .. (2, 4) and needs (2, 5) for a road
+        board = BitBoard(6)
+        for y in range(5):
+            board.place_piece(2, y, [AIPiece(Color.BLACK, False)])
+        for x, y in ((0, 0), (5, 5), (4, 1), (0, 3)):
+            board.place_piece(x, y, [AIPiece(Color.WHITE, False)])
+        return GameState(board, 16, 17, turn=9)
+
+    def test_road_threats(self):
+        ai = AI(Difficulty.MEDIUM, Color.WHITE, 6, 6)
+        state = self.threat_position()
+        threats, roads = ai.road_threats(state.board, Color.BLACK)
+        self.assertEqual(threats, 1 << (2 * 6 + 5))
+        self.assertEqual(roads, sum(1 << (2 * 6 + y) for y in range(5)))
+        self.assertEqual(ai.road_threats(state.board, Color.WHITE), (0, 0))
+
+    def test_road_threats_match_placing_a_flat(self):
+        ai = AI(Difficulty.MEDIUM, Color.BLACK, 6, 6)
+        for seed in (0, 5):
+            for _, state, _ in random_states(seed, plies=40):
+                board = state.board
+                for color in Color:
+                    expected = 0
+                    for sq in range(36):
+                        if not board.occupied >> sq & 1:
+                            board.place_kind(sq, color.value)
+                            if board.check_full_path(color):
+                                expected |= 1 << sq
+                            board.remove_top(sq)
+                    self.assertEqual(ai.road_threats(board, color)[0], expected)
+
+    def test_blocks_a_road_at_depth_one(self):
+        def black_threats_after(ai):
+            state = self.threat_position()
+            state.apply_move(ai.get_best_move(state), Color.WHITE)
+            return ai.road_threats(state.board, Color.BLACK)[0]
+
+        ai = AI(Difficulty.MEDIUM, Color.WHITE, 6, 6)
+        ai.max_depth = 1
+        self.assertEqual(black_threats_after(ai), 0)
+
+    def test_sees_its_own_threat(self):
+        state = self.threat_position()
+        state.turn = 10  # black to move
+        ai = AI(Difficulty.MEDIUM, Color.WHITE, 6, 6)
+        self.assertEqual(ai.quiesce(state, Color.BLACK, -math.inf, math.inf), 1000)
+        no_pieces = GameState(state.board, 0, 17, turn=10)
+        self.assertNotEqual(ai.quiesce(no_pieces, Color.BLACK, -math.inf, math.inf), 1000)
+
+    def test_searches_the_defences(self):
+        state = self.threat_position()  # white to move
+        ai = AI(Difficulty.MEDIUM, Color.WHITE, 6, 6)
+        self.assertGreater(ai.quiesce(state, Color.WHITE, -math.inf, math.inf), -1000)
+        self.assertGreater(ai.qnodes, 0)
+        ai.quiescence_budget = 0
+        self.assertEqual(ai.quiesce(state, Color.WHITE, -math.inf, math.inf), ai.evaluate(state))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,45 @@
+import unittest
+from ai import Difficulty
+from selfplay import percentile, play_game, run_match
+
+
+class TestSelfPlay(unittest.TestCase):
+
+    def test_game_ends_with_a_result(self):
+        game = play_game(dict(difficulty=Difficulty.EASY), dict(difficulty=Difficulty.EASY), seed=3)
+        self.assertIn(game["winner"], ("black", "white", None))
+        self.assertGreater(game["moves"], 0)
+        self.assertEqual(len(game["latencies"]["black"]) + len(game["latencies"]["white"]), game["moves"] - 2)
+
+    def test_move_limit_is_a_draw(self):
+        game = play_game(dict(difficulty=Difficulty.EASY), dict(difficulty=Difficulty.EASY), max_moves=6)
+        self.assertEqual((game["winner"], game["reason"], game["moves"]), (None, "max_moves", 6))
+
+    def test_match_report(self):
+        report = run_match(
+            dict(difficulty=Difficulty.MEDIUM, depth=1),
+            dict(difficulty=Difficulty.EASY),
+            games=4,
+        )
+        self.assertEqual(report["games"], 4)
+        self.assertEqual(report["a"]["wins"] + report["b"]["wins"] + report["draws"], 4)
+        self.assertGreater(report["a"]["nodes_per_sec"], 0)
+        self.assertLessEqual(report["a"]["latency_ms"]["p50"], report["a"]["latency_ms"]["max"])
+
+    def test_same_seed_same_games(self):
+        sides = (dict(difficulty=Difficulty.MEDIUM), dict(difficulty=Difficulty.EASY))
+        first = run_match(*sides, games=2, seed=5)
+        second = run_match(*sides, games=2, seed=5)
+        self.assertEqual(first["length"], second["length"])
+        self.assertEqual(first["a"]["nodes"], second["a"]["nodes"])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+from ai import AI, Color, Difficulty
+from ai_worker import AIWorker
+from test_search import midgame_state
+from tracing import Tracer
+
+
+class TestTracer(unittest.TestCase):
+
+    def test_spans_nest(self):
+        tracer = Tracer()
+        with tracer.span("frame", frame=3):
+            with tracer.span("draw_board") as args:
+                args["cells"] = 36
+        draw, frame = tracer.events
+        self.assertEqual((frame["name"], frame["ph"], frame["args"]), ("frame", "X", {"frame": 3}))
+        self.assertEqual(draw["args"], {"cells": 36})
+        self.assertLessEqual(frame["ts"], draw["ts"])
+        self.assertGreaterEqual(frame["ts"] + frame["dur"], draw["ts"] + draw["dur"])
+
+    def test_ring_buffer_and_disabled(self):
+        tracer = Tracer(capacity=3)
+        for i in range(5):
+            tracer.instant("tick", i=i)
+        self.assertEqual([event["args"]["i"] for event in tracer.events], [2, 3, 4])
+        tracer = Tracer(enabled=False)
+        with tracer.span("frame"):
+            tracer.instant("tick")
+        self.assertEqual(len(tracer.events), 0)
+
+    def test_span_kept_on_error(self):
+        tracer = Tracer()
+        with self.assertRaises(KeyError):
+            with tracer.span("apply"):
+                raise KeyError
+        self.assertEqual(tracer.events[0]["name"], "apply")
+
+    def test_dump(self):
+        tracer = Tracer()
+        with tracer.span("frame"):
+            pass
+        thread = threading.Thread(target=tracer.instant, args=("ponder hit", "ai"), name="worker")
+        thread.start()
+        thread.join()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            self.assertEqual(tracer.dump(path), 4)
+            with open(path) as f:
+                trace = json.load(f)
+        names = {event["args"]["name"] for event in trace["traceEvents"] if event["ph"] == "M"}
+        self.assertEqual(names, {threading.current_thread().name, "worker"})
+        self.assertEqual([event["name"] for event in trace["traceEvents"][2:]], ["frame", "ponder hit"])
+
+    def test_dump_at_exit(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            script = (
+                "import sys; from tracing import Tracer; tracer = Tracer(); "
+                f"tracer.dump_at_exit({path!r}); tracer.instant('quit'); sys.exit(0)"
+            )
+            subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+            with open(path) as f:
+                self.assertEqual(json.load(f)["traceEvents"][-1]["name"], "quit")
+
+    def test_worker_search_spans(self):
+        tracer = Tracer()
+        worker = AIWorker(tracer)
+        worker.start(AI(Difficulty.MEDIUM, Color.BLACK, 6, 6), midgame_state())
+        self.assertIsNotNone(worker.wait(10))
+        search = tracer.events[0]
+        self.assertEqual((search["name"], search["cat"]), ("search", "ai"))
+        self.assertGreater(search["args"]["nodes"], 0)
+        self.assertNotEqual(search["tid"], threading.get_ident())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,77 @@
+import math
+import unittest
+from ai import AI, AIPiece, BitBoard, Bound, Color, Difficulty, GameState, Move, TranspositionTable
+from test_bitboard import random_states
+
+
+class TestZobrist(unittest.TestCase):
+
+    def test_incremental_hash_matches_full_rehash(self):
+        for seed in range(10):
+            for legacy, packed, _ in random_states(seed):
+                self.assertEqual(legacy.board.zobrist, legacy.board.compute_zobrist())
+                self.assertEqual(packed.board.zobrist, packed.board.compute_zobrist())
+                self.assertEqual(legacy.hash, packed.hash)
+
+    def test_undo_restores_hash(self):
+        state = GameState(BitBoard(6), 21, 21)
+        start = state.hash
+        first = Move(2, 2, True, piece=AIPiece(Color.BLACK, False))
+        second = Move(2, 2, False, to_x=2, to_y=3, count=1)
+        state.apply_move(first, Color.BLACK)
+        state.apply_move(second, Color.BLACK)
+        state.undo_move(second, Color.BLACK)
+        state.undo_move(first, Color.BLACK)
+        self.assertEqual(state.hash, start)
+
+    def test_move_orders_transpose(self):
+        a = Move(0, 0, True, piece=AIPiece(Color.BLACK, False))
+        b = Move(5, 5, True, piece=AIPiece(Color.WHITE, False))
+        c = Move(3, 1, True, piece=AIPiece(Color.BLACK, True))
+        one = GameState(BitBoard(6), 21, 21)
+        two = GameState(BitBoard(6), 21, 21)
+        for move in (a, b, c):
+            one.apply_move(move, move.piece.color)
+        for move in (c, b, a):
+            two.apply_move(move, move.piece.color)
+        self.assertEqual(one.hash, two.hash)
+
+
+class TestTranspositionTable(unittest.TestCase):
+
+    def test_capacity_follows_memory_cap(self):
+        tt = TranspositionTable(max_memory_mb=1)
+        self.assertLessEqual(tt.capacity * tt.ENTRY_BYTES, 1024 * 1024)
+        self.assertEqual(tt.capacity & (tt.capacity - 1), 0)
+
+    def test_deeper_entry_survives_within_search(self):
+        tt = TranspositionTable(max_memory_mb=0.001)
+        key = 5
+        other = key + tt.capacity  # same slot, different position
+        tt.store(key, 4, 1.0, Bound.EXACT, None)
+        tt.store(other, 2, 2.0, Bound.EXACT, None)
+        self.assertEqual(tt.probe(key)[1], 4)
+        self.assertIsNone(tt.probe(other))
+        tt.new_search()
+        tt.store(other, 2, 2.0, Bound.EXACT, None)
+        self.assertEqual(tt.probe(other)[2], 2.0)
+
+    def test_same_result_with_and_without_table(self):
+        for seed in (3, 4):
+            for _, state, _ in random_states(seed, plies=14):
+                pass
+            scores = []
+            for memory in (0, 8):
+                ai = AI(Difficulty.HARD, Color.BLACK, 6, 6, tt_memory_mb=memory)
+                move = ai.get_best_move(state)
+                state.apply_move(move, Color.BLACK)
+                reference = AI(Difficulty.HARD, Color.BLACK, 6, 6, tt_memory_mb=0)
+                scores.append(
+                    reference.minimax(state, 2, False, -math.inf, math.inf, state.turn, state.max_turn)
+                )
+                state.undo_move(move, Color.BLACK)
+            self.assertEqual(scores[0], scores[1])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
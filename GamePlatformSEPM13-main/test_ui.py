@@ -0,0 +1,66 @@
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # no window needed
+import pygame
+import UI
+from Piece import Piece
+
+
+class TestDrawFrame(unittest.TestCase):
+
+    def setUp(self):
+        UI.reset_game()
+        UI.draw_frame()
+
+    def frame(self):
+        """Draw one frame and return the rects passed to pygame.display.update."""
+        with mock.patch.object(pygame.display, "update") as update:
+            UI.draw_frame()
+        if not update.called:
+            return []
+        self.assertEqual(update.call_count, 1)
+        return list(update.call_args[0][0])
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.frame(), [])
+
+    def test_placement(self):
+        piece = UI.player1.place_piece(False)
+        UI.board.place_piece(2, 3, piece)
+        self.assertEqual(self.frame(), [UI.cell_rect(3, 2), UI.HAND_REGION])
+        rect = UI.cell_rect(3, 2)
+        self.assertEqual(UI.screen.get_at((rect.centerx, rect.bottom - 5))[:3], UI.BLACK)
+        self.assertEqual(self.frame(), [])
+
+    def test_selection(self):
+        UI.selected_row, UI.selected_col = 1, 4
+        self.assertEqual(self.frame(), [UI.cell_rect(1, 4)])
+        UI.selected_row, UI.selected_col = -1, -1
+        self.assertEqual(self.frame(), [UI.cell_rect(1, 4)])
+
+    def test_error_and_turn(self):
+        UI.error_message = "Invalid action."
+        self.assertEqual(self.frame(), [UI.ERROR_REGION])
+        UI.player1.toggle_turn()
+        UI.player2.toggle_turn()
+        self.assertEqual(self.frame(), [UI.TURN_REGION])
+
+    def test_invalidate_screen(self):
+        UI.invalidate_screen()
+        rects = self.frame()
+        self.assertEqual(rects[0], UI.screen.get_rect())
+        self.assertEqual(len(rects), 1 + UI.BOARD_SIZE ** 2 + 4)  # every cell and text region
+        self.assertEqual(self.frame(), [])
+
+    def test_cell_surfaces_are_cached(self):
+        UI.board.place_piece(0, 0, Piece("white", standing=True))
+        self.frame()
+        key = UI.cell_key(0, 0)
+        self.assertIs(UI.cell_surface(key), UI.cell_cache[key])
+        self.assertIs(UI.render_text("x", 36, UI.BLACK), UI.render_text("x", 36, UI.BLACK))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
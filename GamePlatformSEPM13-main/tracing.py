@@ -0,0 +1,111 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+""" A timeline of what the UI and the AI spent their time on, for chrome://tracing.
+
+tracer = Tracer()
+with tracer.span("frame", frame=n):      # nested spans show up nested
+    with tracer.span("draw_board"):
+        ...
+tracer.instant("ponder hit")
+tracer.dump("trace.json")                # or tracer.dump_at_exit("trace.json")
+
+Spans are kept in a ring buffer of the last `capacity` events, so a long
+session keeps its last few minutes. Any thread may record; each thread is a
+row of the timeline. Open the dump in chrome://tracing or ui.perfetto.dev.
+The args of a span are the keyword arguments of span() plus whatever the
+with block adds to the dict it gets, e.g. the nodes a search visited.
+
+A disabled tracer records nothing, its span() costs one attribute check.
+"""
+
+DEFAULT_CAPACITY = 50000
+
+
+class Tracer:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.events: deque = deque(maxlen=capacity)
+        self.thread_names: Dict[int, str] = {}
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+
+    def now(self) -> float:
+        """Microseconds since the tracer was made, the trace's time unit."""
+        return (time.perf_counter_ns() - self.origin) / 1000
+
+    def _thread(self) -> int:
+        thread = threading.current_thread()
+        tid = thread.ident
+        if tid not in self.thread_names:
+            self.thread_names[tid] = thread.name
+        return tid
+
+    @contextmanager
+    def span(self, name: str, category: str = "ui", **args) -> Iterator[dict]:
+        """Record the time the with block takes as a complete ("X") event."""
+        if not self.enabled:
+            yield args
+            return
+        start = self.now()
+        try:
+            yield args
+        finally:
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": start,
+                "dur": self.now() - start,
+                "pid": self.pid,
+                "tid": self._thread(),
+            }
+            if args:
+                event["args"] = args
+            self.events.append(event)  # deque.append is atomic, no lock needed
+
+    def instant(self, name: str, category: str = "ui", **args) -> None:
+        """Record a point in time, e.g. a dropped frame or a ponder hit."""
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "i",
+            "s": "t",
+            "ts": self.now(),
+            "pid": self.pid,
+            "tid": self._thread(),
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def clear(self) -> None:
+        self.events.clear()
+
+    def trace_events(self) -> List[dict]:
+        """The buffered events plus thread names, in trace-event format."""
+        events = list(self.events)
+        names = [
+            {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+            for tid, name in list(self.thread_names.items())
+        ]
+        return names + events
+
+    def dump(self, path: str) -> int:
+        """Write the buffer to path as Chrome trace-event JSON; the number of events."""
+        events = self.trace_events()
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+    def dump_at_exit(self, path: str) -> None:
+        """Dump to path when the interpreter exits, also through sys.exit()."""
+        atexit.register(self.dump, path)